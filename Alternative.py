@@ -1,15 +1,52 @@
+import json
 import sys
-from PyQt5.QtCore import QUrl, Qt
-from PyQt5.QtWidgets import QMainWindow, QApplication, QToolBar, QAction, QLineEdit, QStatusBar, QTabWidget, QTextEdit, QMessageBox, QProgressBar
-from PyQt5.QtWebEngineWidgets import QWebEngineView
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-import re
-import socket
-import ssl
-import whois
-from datetime import datetime
+import threading
+from PyQt5.QtCore import QUrl, Qt, QThread, QTimer, pyqtSignal
+from PyQt5.QtWidgets import QMainWindow, QApplication, QToolBar, QAction, QLineEdit, QStatusBar, QTabWidget, QTextEdit, QMessageBox, QProgressBar, QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QPushButton, QLabel, QAbstractItemView
+import history
+
+PENDING = "Loading..."
+NO_HTTPS = "Not checked (the site does not use HTTPS)"
+TRUNCATED = " (only partly read, the page was too large or too slow)"
+HOME_URL = "http://www.google.com"
+NOT_REPORTED = "Not reported by the browser"
+# The browser's own record of how the page on screen was loaded, as JSON.
+NAVIGATION_TIMING_JS = "JSON.stringify(performance.getEntriesByType('navigation')[0] || null)"
+# After the window is up, the analysis modules are imported in the background.
+WARM_UP_DELAY_MS = 200
+
+def load_engine():
+    # requests, urllib3, whois and the probes behind them take longer to import than the window takes
+    # to build, so they load on first use (or in the background once the window shows), not at startup.
+    import engine
+    return engine
+
+def load_service():
+    # Analyses go through the analysis service when one is configured and running; this imports the
+    # engine too. The warm-up thread also finds out whether the service is there.
+    import service
+    return service
+
+class AnalysisWorker(QThread):
+    stage_ready = pyqtSignal(int, str, object)
+    analysis_done = pyqtSignal(int, object, object)
+    analysis_failed = pyqtSignal(int, object)
+
+    def __init__(self, analysis_id, analysis, parent=None):
+        super(AnalysisWorker, self).__init__(parent)
+        self.analysis_id = analysis_id
+        self.analysis = analysis
+
+    def run(self):
+        try:
+            result = self.analysis.run(on_update=lambda stage, updates: self.stage_ready.emit(self.analysis_id, stage, updates))
+            saved_id = None
+            # A result the service handed out again is already in the history.
+            if not self.analysis.cancelled and result['details'].get('service') != 'cached':
+                saved_id = history.remember(result)
+            self.analysis_done.emit(self.analysis_id, result, saved_id)
+        except Exception as e:
+            self.analysis_failed.emit(self.analysis_id, e)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -20,10 +57,15 @@ class MainWindow(QMainWindow):
         self.central_widget = QTabWidget()
         self.setCentralWidget(self.central_widget)
 
-        self.browser_tab = QWebEngineView()
-        self.browser_tab.setUrl(QUrl("http://google.com"))
-        self.browser_tab.urlChanged.connect(self.update_urlbar)
-        self.browser_tab.loadFinished.connect(self.update_title)
+        # Chromium starts the first time the Browser tab is used, not with the window.
+        self.web_view = None
+        self.page_loading = False
+        self.browser_tab = QWidget()
+        self.browser_layout = QVBoxLayout(self.browser_tab)
+        self.browser_layout.setContentsMargins(0, 0, 0, 0)
+        self.browser_placeholder = QLabel("Type a website address above and press Enter, or press Home, to start browsing.")
+        self.browser_placeholder.setAlignment(Qt.AlignCenter)
+        self.browser_layout.addWidget(self.browser_placeholder)
         self.central_widget.addTab(self.browser_tab, "Browser")
 
         self.overview_text = QTextEdit()
@@ -44,6 +86,30 @@ class MainWindow(QMainWindow):
         self.whois_ssl_text.setFontPointSize(12)
         self.central_widget.addTab(self.whois_ssl_text, "WHOIS & SSL")
 
+        self.history_tab = QWidget()
+        history_layout = QVBoxLayout(self.history_tab)
+        self.history_list = QListWidget()
+        self.history_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.history_list.itemDoubleClicked.connect(self.open_saved)
+        history_layout.addWidget(self.history_list)
+        history_buttons = QHBoxLayout()
+        open_btn = QPushButton("Open")
+        open_btn.clicked.connect(self.open_saved)
+        history_buttons.addWidget(open_btn)
+        compare_btn = QPushButton("Compare with Earlier")
+        compare_btn.clicked.connect(self.compare_saved)
+        history_buttons.addWidget(compare_btn)
+        compare_two_btn = QPushButton("Compare Two")
+        compare_two_btn.clicked.connect(self.compare_two)
+        history_buttons.addWidget(compare_two_btn)
+        history_buttons.addStretch()
+        history_layout.addLayout(history_buttons)
+        self.changes_text = QTextEdit()
+        self.changes_text.setReadOnly(True)
+        self.changes_text.setMaximumHeight(150)
+        history_layout.addWidget(self.changes_text)
+        self.central_widget.addTab(self.history_tab, "History")
+
         self.status = QStatusBar()
         self.setStatusBar(self.status)
         self.status.showMessage("Created by GabeProInc, September 08, 2025")
@@ -58,17 +124,17 @@ class MainWindow(QMainWindow):
 
         back_btn = QAction("Back", self)
         back_btn.setStatusTip("Back to previous page")
-        back_btn.triggered.connect(self.browser_tab.back)
+        back_btn.triggered.connect(self.go_back)
         navtb.addAction(back_btn)
 
         next_btn = QAction("Forward", self)
         next_btn.setStatusTip("Forward to next page")
-        next_btn.triggered.connect(self.browser_tab.forward)
+        next_btn.triggered.connect(self.go_forward)
         navtb.addAction(next_btn)
 
         reload_btn = QAction("Reload", self)
         reload_btn.setStatusTip("Reload page")
-        reload_btn.triggered.connect(self.browser_tab.reload)
+        reload_btn.triggered.connect(self.reload_page)
         navtb.addAction(reload_btn)
 
         home_btn = QAction("Home", self)
@@ -81,6 +147,17 @@ class MainWindow(QMainWindow):
         analyze_btn.triggered.connect(self.analyze_url)
         navtb.addAction(analyze_btn)
 
+        self.cancel_btn = QAction("Cancel", self)
+        self.cancel_btn.setStatusTip("Stop the running analysis and keep what it found so far")
+        self.cancel_btn.triggered.connect(self.cancel_analysis)
+        self.cancel_btn.setEnabled(False)
+        navtb.addAction(self.cancel_btn)
+
+        self.page_weight_btn = QAction("Page Weight", self)
+        self.page_weight_btn.setStatusTip("Also check the size of every image, script, stylesheet and font the page loads")
+        self.page_weight_btn.setCheckable(True)
+        navtb.addAction(self.page_weight_btn)
+
         navtb.addSeparator()
 
         self.urlbar = QLineEdit()
@@ -90,7 +167,7 @@ class MainWindow(QMainWindow):
 
         stop_btn = QAction("Stop", self)
         stop_btn.setStatusTip("Stop loading current page")
-        stop_btn.triggered.connect(self.browser_tab.stop)
+        stop_btn.triggered.connect(self.stop_loading)
         navtb.addAction(stop_btn)
 
         self.setStyleSheet("""
@@ -103,18 +180,64 @@ class MainWindow(QMainWindow):
             QAction { font-size: 14px; }
         """)
 
+        self.analysis_id = 0
+        self.analysis = None
+        self.result = None
+        self.workers = set()
+        self.store = history.shared_store()
+        self.saved = []
+        self.refresh_history()
+        QTimer.singleShot(WARM_UP_DELAY_MS, lambda: threading.Thread(target=lambda: load_service().available(), daemon=True).start())
+
+    def browser(self):
+        if self.web_view is None:
+            from PyQt5.QtWebEngineWidgets import QWebEngineView
+            self.web_view = QWebEngineView()
+            self.web_view.urlChanged.connect(self.update_urlbar)
+            self.web_view.loadStarted.connect(self.on_load_started)
+            self.web_view.loadFinished.connect(self.on_load_finished)
+            self.browser_layout.removeWidget(self.browser_placeholder)
+            self.browser_placeholder.deleteLater()
+            self.browser_layout.addWidget(self.web_view)
+        return self.web_view
+
+    def go_back(self):
+        if self.web_view is not None:
+            self.web_view.back()
+
+    def go_forward(self):
+        if self.web_view is not None:
+            self.web_view.forward()
+
+    def reload_page(self):
+        if self.web_view is not None:
+            self.web_view.reload()
+
+    def stop_loading(self):
+        if self.web_view is not None:
+            self.web_view.stop()
+
+    def on_load_started(self):
+        self.page_loading = True
+
+    def on_load_finished(self, ok):
+        self.page_loading = False
+        self.update_title()
+
     def update_title(self):
-        title = self.browser_tab.page().title()
+        title = self.web_view.page().title()
         self.setWindowTitle(f"{title} - Epic Browser & Analyzer")
 
     def navigate_home(self):
-        self.browser_tab.setUrl(QUrl("http://www.google.com"))
+        self.browser().setUrl(QUrl(HOME_URL))
+        self.central_widget.setCurrentWidget(self.browser_tab)
 
     def navigate_to_url(self):
         q = QUrl(self.urlbar.text())
         if q.scheme() == "":
             q.setScheme("http")
-        self.browser_tab.setUrl(q)
+        self.browser().setUrl(q)
+        self.central_widget.setCurrentWidget(self.browser_tab)
 
     def update_urlbar(self, q):
         self.urlbar.setText(q.toString())
@@ -125,139 +248,159 @@ class MainWindow(QMainWindow):
         if not url:
             self.show_error("E001", "No URL entered. Please type a website address, like example.com.")
             return
+        if self.web_view is not None and not self.page_loading and url == self.web_view.url().toString():
+            self.analyze_loaded_page(url)
+        else:
+            self.start_analysis(url)
+
+    def analyze_loaded_page(self, url):
+        # The page on screen is analyzed as the browser has it, scripts included, instead of being
+        # downloaded again. Both calls answer asynchronously on the GUI thread.
+        page = self.web_view.page()
+        requested = self.analysis_id
+
+        def with_timing(html, navigation_json):
+            if self.analysis_id != requested or self.web_view.url().toString() != url:
+                return
+            try:
+                navigation = json.loads(navigation_json) if navigation_json else None
+            except ValueError:
+                navigation = None
+            self.start_analysis(url, html=html, navigation=navigation)
+
+        self.status.showMessage("Reading the page from the browser...", 5000)
+        page.toHtml(lambda html: page.runJavaScript(NAVIGATION_TIMING_JS, lambda navigation_json: with_timing(html, navigation_json)))
 
+    def start_analysis(self, url, html=None, navigation=None):
         self.status.showMessage("Analyzing website... 🌐", 5000)
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
         self.clear_results()
 
         try:
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-
-            result = {
-                'url': url,
-                'timestamp': datetime.now().isoformat(),
-                'details': {}
-            }
+            analysis = load_service().new_analysis(url, html=html, navigation=navigation, audit_assets=self.page_weight_btn.isChecked())
+        except Exception as e:
+            self.report_failure(e)
+            return
 
-            parsed_url = urlparse(url)
-            result['details']['scheme'] = parsed_url.scheme
-            result['details']['hostname'] = parsed_url.hostname
-            self.progress_bar.setValue(20)
+        if self.analysis is not None:
+            # Nobody will see the results of the analysis this one replaces.
+            self.analysis.cancel()
+        self.analysis_id += 1
+        self.analysis = analysis
+        self.cancel_btn.setEnabled(True)
+        self.result = {'url': analysis.url, 'timestamp': analysis.result['timestamp'], 'details': dict(analysis.result['details'])}
+        self.progress_bar.setMaximum(len(analysis.stages))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.display_results(self.result)
+
+        worker = AnalysisWorker(self.analysis_id, analysis, self)
+        worker.stage_ready.connect(self.on_stage_ready)
+        worker.analysis_done.connect(self.on_analysis_done)
+        worker.analysis_failed.connect(self.on_analysis_failed)
+        worker.finished.connect(lambda: self.workers.discard(worker))
+        self.workers.add(worker)
+        worker.start()
+
+    def closeEvent(self, event):
+        # A QThread destroyed while running takes the process down with it, so every worker is
+        # cancelled and waited for; a cancelled analysis returns within moments.
+        if self.analysis is not None:
+            self.analysis.cancel()
+        for worker in list(self.workers):
+            worker.wait()
+        super(MainWindow, self).closeEvent(event)
+
+    def cancel_analysis(self):
+        if self.analysis is not None:
+            self.analysis.cancel()
+            self.status.showMessage("Cancelling...", 5000)
+
+    def finish_analysis(self):
+        self.analysis = None
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.setVisible(False)
 
-            try:
-                ip_address = socket.gethostbyname(parsed_url.hostname)
-                geo_response = requests.get(f"http://ip-api.com/json/{ip_address}", timeout=5)
-                geo_response.raise_for_status()
-                geo_data = geo_response.json()
-                result['details']['location'] = {
-                    'city': geo_data.get('city', 'N/A'),
-                    'country': geo_data.get('country', 'N/A'),
-                    'isp': geo_data.get('isp', 'N/A')
-                }
-            except Exception as e:
-                result['details']['location'] = f"Unable to determine location: {str(e)}"
-
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            self.progress_bar.setValue(40)
-
-            result['details']['http_status'] = response.status_code
-            result['details']['response_time'] = response.elapsed.total_seconds()
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-            result['details']['title'] = soup.title.string.strip() if soup.title else 'No title found'
-
-            meta_author = soup.find('meta', attrs={'name': re.compile(r'author', re.I)})
-            meta_og_site = soup.find('meta', attrs={'property': re.compile(r'og:site_name', re.I)})
-            result['details']['creator'] = meta_author['content'] if meta_author and meta_author.get('content') else (
-                meta_og_site['content'] if meta_og_site and meta_og_site.get('content') else 'Unknown')
-
-            meta_desc = soup.find('meta', attrs={'name': re.compile(r'description', re.I)})
-            result['details']['meta_description'] = meta_desc['content'] if meta_desc and meta_desc.get('content') else 'No description found'
-
-            favicon = soup.find('link', rel=re.compile(r'icon', re.I))
-            result['details']['favicon'] = favicon['href'] if favicon and favicon.get('href') else 'No favicon found'
+    def on_stage_ready(self, analysis_id, stage, updates):
+        if analysis_id != self.analysis_id:
+            return
+        self.result['details'].update(updates)
+        # After the stages, run() also merges 'unfinished', 'timings' and such; those are not progress.
+        if self.analysis is not None and stage in self.analysis.stages:
+            self.progress_bar.setValue(min(self.progress_bar.maximum(), self.progress_bar.value() + 1))
+        self.display_results(self.result)
+
+    def on_analysis_done(self, analysis_id, result, saved_id):
+        if analysis_id != self.analysis_id:
+            return
+        self.finish_analysis()
+        self.result = result
+        self.display_results(self.result)
+        unfinished = result['details'].get('unfinished') or {}
+        if 'cancelled' in unfinished.values():
+            self.status.showMessage("Analysis cancelled, showing what finished", 5000)
+        elif unfinished:
+            self.status.showMessage("Analysis complete, but some checks timed out", 5000)
+        else:
+            self.status.showMessage("Analysis complete! Check the tabs for details! 🎉", 5000)
+        self.refresh_history()
+        # Only a run that was saved has a snapshot to compare; a cancelled one was not.
+        if saved_id is not None:
+            self.show_changes(self.store.summary(saved_id))
 
-            try:
-                robots_response = requests.get(f"{parsed_url.scheme}://{parsed_url.hostname}/robots.txt", headers=headers, timeout=5)
-                result['details']['robots_txt'] = 'Available' if robots_response.status_code == 200 else 'Not found'
-            except:
-                result['details']['robots_txt'] = 'Not found'
-            try:
-                sitemap_response = requests.get(f"{parsed_url.scheme}://{parsed_url.hostname}/sitemap.xml", headers=headers, timeout=5)
-                result['details']['sitemap'] = 'Available' if sitemap_response.status_code == 200 else 'Not found'
-            except:
-                result['details']['sitemap'] = 'Not found'
-            self.progress_bar.setValue(60)
-
-            links = {'internal': [], 'external': []}
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                try:
-                    if href.startswith(('http://', 'https://')):
-                        link_host = urlparse(href).hostname
-                        if link_host == parsed_url.hostname:
-                            links['internal'].append(href)
-                        else:
-                            links['external'].append(href)
-                    elif href.startswith('/'):
-                        links['internal'].append(url + href)
-                    else:
-                        links['internal'].append(url + '/' + href)
-                except:
-                    continue
-            result['details']['links'] = links
-
-            result['details']['image_count'] = len([img for img in soup.find_all('img') if img.get('src')])
-
-            text = soup.get_text()
-            words = re.findall(r'\w+', text)
-            result['details']['word_count'] = len(words)
-            self.progress_bar.setValue(80)
-
-            if parsed_url.scheme == 'https':
-                try:
-                    context = ssl.create_default_context()
-                    with socket.create_connection((parsed_url.hostname, 443)) as sock:
-                        with context.wrap_socket(sock, server_hostname=parsed_url.hostname) as ssock:
-                            cert = ssock.getpeercert()
-                            result['details']['ssl_info'] = {
-                                'issuer': cert.get('issuer', 'N/A'),
-                                'notAfter': cert.get('notAfter', 'N/A')
-                            }
-                except Exception as e:
-                    result['details']['ssl_info'] = f"Unable to check security certificate: {str(e)}"
+    def on_analysis_failed(self, analysis_id, error):
+        if analysis_id != self.analysis_id:
+            return
+        self.finish_analysis()
+        self.report_failure(error)
+
+    def refresh_history(self):
+        self.history_list.clear()
+        self.saved = self.store.recent() if self.store is not None else []
+        for summary in self.saved:
+            self.history_list.addItem(history.describe(summary))
+
+    def selected_saved(self):
+        row = self.history_list.currentRow()
+        if row < 0:
+            self.show_error("E005", "No saved analysis selected. Pick one from the list first.")
+            return None
+        return self.saved[row]
+
+    def open_saved(self):
+        summary = self.selected_saved()
+        if summary is None:
+            return
+        # Straight from the history file: no network at all. A running analysis is stopped, its updates dropped.
+        if self.analysis is not None:
+            self.analysis.cancel()
+        self.analysis_id += 1
+        self.finish_analysis()
+        self.result = self.store.load(summary['id'])
+        self.display_results(self.result)
+        self.show_changes(summary)
+        self.status.showMessage(f"Showing the saved analysis from {summary['timestamp'][:19].replace('T', ' ')}", 5000)
+        self.central_widget.setCurrentWidget(self.overview_text)
+
+    def compare_saved(self):
+        summary = self.selected_saved()
+        if summary is not None:
+            self.show_changes(summary)
+
+    def compare_two(self):
+        rows = sorted(index.row() for index in self.history_list.selectedIndexes())
+        if len(rows) != 2:
+            self.show_error("E005", "Select exactly two saved analyses to compare (hold Ctrl to pick the second one).")
+            return
+        older, newer = history.by_age(self.saved[rows[0]], self.saved[rows[1]])
+        self.show_changes(newer, older)
 
-            try:
-                whois_info = whois.whois(parsed_url.hostname)
-                result['details']['whois'] = {
-                    'domain_name': whois_info.domain_name or 'N/A',
-                    'registrar': whois_info.registrar or 'N/A',
-                    'organization': whois_info.org or 'N/A',
-                    'creation_date': str(whois_info.creation_date) or 'N/A',
-                    'expiration_date': str(whois_info.expiration_date) or 'N/A'
-                }
-                if result['details']['creator'] == 'Unknown' and whois_info.org:
-                    result['details']['creator'] = whois_info.org
-            except Exception as e:
-                result['details']['whois'] = f"Unable to get domain info: {str(e)}"
-            self.progress_bar.setValue(100)
-
-            self.display_results(result)
-            self.status.showMessage("Analysis complete! Check the tabs for details! 🎉", 5000)
-            self.progress_bar.setVisible(False)
+    def show_changes(self, summary, previous=None):
+        self.changes_text.setText(f"{summary['url']}\n{history.describe_changes(self.store, summary, previous)}")
 
-        except requests.exceptions.RequestException as e:
-            self.show_error("E002", f"Couldn’t connect to the website: {str(e)}. Check the URL or your internet connection.")
-            self.status.showMessage("Analysis failed 😞", 5000)
-            self.progress_bar.setVisible(False)
-        except Exception as e:
-            self.show_error("E003", f"Something went wrong: {str(e)}. Try again or check the URL.")
-            self.status.showMessage("Analysis failed 😞", 5000)
-            self.progress_bar.setVisible(False)
+    def report_failure(self, error):
+        self.show_error(*load_service().describe_error(error))
+        self.status.showMessage("Analysis failed 😞", 5000)
+        self.progress_bar.setVisible(False)
 
     def show_error(self, code, message):
         QMessageBox.critical(self, "Error", f"Error {code}: {message}")
@@ -268,57 +411,129 @@ class MainWindow(QMainWindow):
         self.whois_ssl_text.clear()
 
     def display_results(self, result):
-        self.overview_text.setText(
+        # Called again every time a stage lands, so anything not in details yet is shown as pending.
+        details = result['details']
+
+        overview_text = (
             f"Website: {result['url']}\n"
-            f"Analyzed on: {result['timestamp']}\n\n"
-            f"Title: {result['details']['title']}\n"
-            f"Description: {result['details']['meta_description']}\n"
-            f"Creator/Organization: {result['details']['creator']}\n"
-            f"Server Location: {result['details']['location']['city']}, {result['details']['location']['country']} (ISP: {result['details']['location']['isp']})"
-            if isinstance(result['details']['location'], dict) else f"Server Location: {result['details']['location']}\n"
-            f"Status Code: {result['details']['http_status']} (OK if 200)\n"
-            f"Response Time: {result['details']['response_time']:.3f} seconds\n"
-            f"Word Count: {result['details']['word_count']} words\n"
-            f"Images: {result['details']['image_count']} images\n"
-            f"Favicon: {result['details']['favicon']}\n"
-            f"Robots.txt: {result['details']['robots_txt']}\n"
-            f"Sitemap: {result['details']['sitemap']}\n"
+            f"Analyzed on: {result['timestamp']}\n"
         )
-
-        links_text = f"Internal Links ({len(result['details']['links']['internal'])}):\n"
-        for link in result['details']['links']['internal'][:10]:
-            links_text += f" - {link}\n"
-        if len(result['details']['links']['internal']) > 10:
-            links_text += f"... and {len(result['details']['links']['internal']) - 10} more\n"
-        links_text += f"\nExternal Links ({len(result['details']['links']['external'])}):\n"
-        for link in result['details']['links']['external'][:10]:
-            links_text += f" - {link}\n"
-        if len(result['details']['links']['external']) > 10:
-            links_text += f"... and {len(result['details']['links']['external']) - 10} more\n"
+        if details.get('source') == 'browser':
+            overview_text += "Read from: the page as loaded in the browser\n"
+        if 'service' in details:
+            overview_text += f"Served by: {load_service().SERVED_BY.get(details['service'], details['service'])}\n"
+        # Stages the analysis stopped waiting for; the page's own fields then say so instead of loading.
+        unfinished = details.get('unfinished') or {}
+        if unfinished:
+            labels = load_engine().STAGE_LABELS
+            overview_text += f"Not Finished: {', '.join(f'{labels.get(stage, stage)} ({reason})' for stage, reason in unfinished.items())}\n"
+        page_pending = f"Not checked ({unfinished['page']})" if 'page' in unfinished else PENDING
+        overview_text += "\n"
+        if 'title' in details:
+            overview_text += (
+                f"Title: {details['title']}\n"
+                f"Description: {details['meta_description']}\n"
+                f"Creator/Organization: {details['creator']}\n"
+            )
+        else:
+            overview_text += f"Title: {page_pending}\n"
+        location = details.get('location', PENDING)
+        if isinstance(location, dict):
+            overview_text += f"Server Location: {location['city']}, {location['country']} (ISP: {location['isp']})\n"
+        else:
+            overview_text += f"Server Location: {location}\n"
+        ip_addresses = details.get('ip_addresses', PENDING)
+        overview_text += f"IP Addresses: {', '.join(ip_addresses) if isinstance(ip_addresses, list) else ip_addresses}\n"
+        if 'http_status' in details:
+            # A page read from the browser only has these if the browser reported them.
+            status_code = NOT_REPORTED if details['http_status'] is None else f"{details['http_status']} (OK if 200)"
+            response_time = NOT_REPORTED if details['response_time'] is None else f"{details['response_time']:.3f} seconds"
+            overview_text += (
+                f"Status Code: {status_code}\n"
+                f"Response Time: {response_time}\n"
+                f"Page Size: {details['page_bytes'] / 1024:.1f} KB{TRUNCATED if details['truncated'] else ''}\n"
+            )
+            # A head-only analysis (bulk.py --head-only --history) never read the body to count these.
+            if details.get('word_count') is not None:
+                overview_text += f"Word Count: {details['word_count']} words\n"
+            if details.get('image_count') is not None:
+                overview_text += f"Images: {details['image_count']} images\n"
+            overview_text += f"Favicon: {details['favicon']}\n"
+        else:
+            overview_text += f"Status Code: {page_pending}\n"
+        overview_text += f"Robots.txt: {details.get('robots_txt', PENDING)}\n"
+        sitemap = details.get('sitemap', PENDING)
+        if isinstance(sitemap, dict):
+            overview_text += f"Sitemap: {sitemap['urls']} pages listed in {sitemap['sitemaps']} sitemap file(s){' (stopped early)' if sitemap['truncated'] else ''}\n"
+            if sitemap['lastmod_first']:
+                overview_text += f"Sitemap Updates: {sitemap['lastmod_first']} to {sitemap['lastmod_last']}\n"
+        else:
+            overview_text += f"Sitemap: {sitemap}\n"
+        if 'http_cache' in details:
+            cache = details['http_cache']
+            overview_text += f"Cache: {cache['hits']} from cache, {cache['revalidated']} unchanged since last time, {cache['misses']} downloaded\n"
+        if 'assets' in details:
+            if isinstance(details['assets'], dict):
+                overview_text += "\n" + "\n".join(load_engine().assets.describe(details['assets'], details.get('page_bytes', 0))) + "\n"
+            else:
+                overview_text += f"Page Weight: {details['assets']}\n"
+        if 'timings' in details:
+            overview_text += "\nWhere the Time Went (stages run side by side):\n"
+            for phase, label in load_engine().TIMING_PHASES:
+                if phase in details['timings']:
+                    overview_text += f" - {label}: {details['timings'][phase] * 1000:.0f} ms\n"
+        self.overview_text.setText(overview_text)
+
+        if 'links' in details:
+            links = details['links']
+            links_text = f"Internal Links ({links['internal_count']}):\n"
+            for link in links['internal']:
+                links_text += f" - {link}\n"
+            if links['internal_count'] > len(links['internal']):
+                links_text += f"... and {links['internal_count'] - len(links['internal'])} more\n"
+            links_text += f"\nExternal Links ({links['external_count']}):\n"
+            for link in links['external']:
+                links_text += f" - {link}\n"
+            if links['external_count'] > len(links['external']):
+                links_text += f"... and {links['external_count'] - len(links['external'])} more\n"
+            if links['top_domains']:
+                links_text += "\nMost Linked Websites:\n"
+                for domain, count in links['top_domains']:
+                    links_text += f" - {domain} ({count})\n"
+            links_text += f"\nSkipped: {links['duplicates']} duplicates, {links['fragments']} same-page anchors\n"
+            other_schemes = {scheme: count for scheme, count in links['schemes'].items() if scheme not in ('http', 'https')}
+            if other_schemes:
+                links_text += f"Other Link Types: {', '.join(f'{scheme} ({count})' for scheme, count in sorted(other_schemes.items()))}\n"
+        else:
+            links_text = f"Links: {page_pending}\n"
         self.links_text.setText(links_text)
 
         whois_ssl_text = "Domain Information:\n"
-        if isinstance(result['details']['whois'], dict):
+        whois_details = details.get('whois', PENDING)
+        if isinstance(whois_details, dict):
             whois_ssl_text += (
-                f"Domain Name: {result['details']['whois']['domain_name']}\n"
-                f"Registrar: {result['details']['whois']['registrar']}\n"
-                f"Organization: {result['details']['whois']['organization']}\n"
-                f"Created On: {result['details']['whois']['creation_date']}\n"
-                f"Expires On: {result['details']['whois']['expiration_date']}\n"
+                f"Domain Name: {whois_details['domain_name']}\n"
+                f"Registrar: {whois_details['registrar']}\n"
+                f"Organization: {whois_details['organization']}\n"
+                f"Created On: {whois_details['creation_date']}\n"
+                f"Expires On: {whois_details['expiration_date']}\n"
             )
         else:
-            whois_ssl_text += f"{result['details']['whois']}\n"
+            whois_ssl_text += f"{whois_details}\n"
         whois_ssl_text += "\nSecurity Certificate (SSL):\n"
-        if isinstance(result['details']['ssl_info'], dict):
+        ssl_info = details.get('ssl_info', page_pending if details['scheme'] == 'https' else NO_HTTPS)
+        if isinstance(ssl_info, dict):
             whois_ssl_text += (
-                f"Issuer: {result['details']['ssl_info']['issuer']}\n"
-                f"Valid Until: {result['details']['ssl_info']['notAfter']}\n"
+                f"Issuer: {ssl_info['issuer']}\n"
+                f"Valid Until: {ssl_info['notAfter']}\n"
             )
         else:
-            whois_ssl_text += f"{result['details']['ssl_info']}\n"
+            whois_ssl_text += f"{ssl_info}\n"
         self.whois_ssl_text.setText(whois_ssl_text)
 
 if __name__ == "__main__":
+    # Lets QtWebEngine be imported after the application exists, which the lazy Browser tab needs.
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     app.setApplicationName("Epic Browser & Analyzer")
     window = MainWindow()
@@ -1,14 +1,28 @@
 import tkinter as tk
 from tkinter import messagebox
 import customtkinter as ctk
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-import re
-import socket
-import ssl
-import whois
-from datetime import datetime
+import queue
+import threading
+import history
+
+PENDING = "Loading..."
+NO_HTTPS = "Not checked (the site does not use HTTPS)"
+TRUNCATED = " (only partly read, the page was too large or too slow)"
+NOT_REPORTED = "Not reported by the browser"
+# After the window is up, the analysis modules are imported in the background.
+WARM_UP_DELAY_MS = 200
+
+def load_engine():
+    # requests, urllib3, whois and the probes behind them take longer to import than the window takes
+    # to build, so they load on first use (or in the background once the window shows), not at startup.
+    import engine
+    return engine
+
+def load_service():
+    # Analyses go through the analysis service when one is configured and running; this imports the
+    # engine too. The warm-up thread also finds out whether the service is there.
+    import service
+    return service
 
 class UrlAnalyzerApp:
     def __init__(self, root):
@@ -29,8 +43,15 @@ class UrlAnalyzerApp:
         self.url_entry = ctk.CTkEntry(self.main_frame, width=500, height=40, font=("Helvetica", 14), placeholder_text="https://example.com")
         self.url_entry.pack(pady=5)
 
-        self.analyze_button = ctk.CTkButton(self.main_frame, text="Analyze Website", command=self.analyze_url, height=40, font=("Helvetica", 14), corner_radius=8)
-        self.analyze_button.pack(pady=10)
+        self.button_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
+        self.button_frame.pack(pady=10)
+        self.analyze_button = ctk.CTkButton(self.button_frame, text="Analyze Website", command=self.analyze_url, height=40, font=("Helvetica", 14), corner_radius=8)
+        self.analyze_button.pack(side="left", padx=5)
+        self.cancel_button = ctk.CTkButton(self.button_frame, text="Cancel", command=self.cancel_analysis, height=40, width=100, font=("Helvetica", 14), corner_radius=8, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+        self.audit_assets = tk.BooleanVar(value=False)
+        self.audit_checkbox = ctk.CTkCheckBox(self.button_frame, text="Check page weight", variable=self.audit_assets, font=("Helvetica", 12))
+        self.audit_checkbox.pack(side="left", padx=5)
 
         self.status_label = ctk.CTkLabel(self.main_frame, text="", font=("Helvetica", 12), text_color="gray")
         self.status_label.pack(pady=5)
@@ -40,6 +61,7 @@ class UrlAnalyzerApp:
         self.tab_view.add("Overview")
         self.tab_view.add("Links")
         self.tab_view.add("WHOIS & SSL")
+        self.tab_view.add("History")
 
         self.overview_text = ctk.CTkTextbox(self.tab_view.tab("Overview"), height=400, font=("Helvetica", 12), wrap="word")
         self.overview_text.pack(pady=10, padx=10, fill="both", expand=True)
@@ -53,6 +75,31 @@ class UrlAnalyzerApp:
         self.whois_ssl_text.pack(pady=10, padx=10, fill="both", expand=True)
         self.whois_ssl_text.configure(state="disabled")
 
+        self.history_list = tk.Listbox(self.tab_view.tab("History"), height=10, font=("Helvetica", 12), activestyle="none", selectmode=tk.EXTENDED)
+        self.history_list.pack(pady=(10, 5), padx=10, fill="both", expand=True)
+        self.history_buttons = ctk.CTkFrame(self.tab_view.tab("History"), fg_color="transparent")
+        self.history_buttons.pack(pady=5)
+        self.open_button = ctk.CTkButton(self.history_buttons, text="Open", command=self.open_saved, width=120)
+        self.open_button.pack(side="left", padx=5)
+        self.compare_button = ctk.CTkButton(self.history_buttons, text="Compare with Earlier", command=self.compare_saved, width=160)
+        self.compare_button.pack(side="left", padx=5)
+        self.compare_two_button = ctk.CTkButton(self.history_buttons, text="Compare Two", command=self.compare_two, width=120)
+        self.compare_two_button.pack(side="left", padx=5)
+        self.changes_text = ctk.CTkTextbox(self.tab_view.tab("History"), height=120, font=("Helvetica", 12), wrap="word")
+        self.changes_text.pack(pady=(5, 10), padx=10, fill="both")
+        self.changes_text.configure(state="disabled")
+
+        self.store = history.shared_store()
+        self.saved = []
+        self.refresh_history()
+
+        self.analysis_id = 0
+        self.analysis = None
+        self.result = None
+        self.events = queue.Queue()
+        self.root.after(100, self.poll_events)
+        self.root.after(WARM_UP_DELAY_MS, lambda: threading.Thread(target=lambda: load_service().available(), daemon=True).start())
+
     def analyze_url(self):
         url = self.url_entry.get().strip()
         if not url:
@@ -63,125 +110,123 @@ class UrlAnalyzerApp:
         self.clear_results()
 
         try:
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-
-            result = {
-                'url': url,
-                'timestamp': datetime.now().isoformat(),
-                'details': {}
-            }
-
-            parsed_url = urlparse(url)
-            result['details']['scheme'] = parsed_url.scheme
-            result['details']['hostname'] = parsed_url.hostname
-
-            try:
-                ip_address = socket.gethostbyname(parsed_url.hostname)
-                geo_response = requests.get(f"http://ip-api.com/json/{ip_address}", timeout=5)
-                geo_response.raise_for_status()
-                geo_data = geo_response.json()
-                result['details']['location'] = {
-                    'city': geo_data.get('city', 'N/A'),
-                    'country': geo_data.get('country', 'N/A'),
-                    'isp': geo_data.get('isp', 'N/A')
-                }
-            except Exception as e:
-                result['details']['location'] = f"Unable to determine location: {str(e)}"
-
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-
-            result['details']['http_status'] = response.status_code
-            result['details']['response_time'] = response.elapsed.total_seconds()
-
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            result['details']['title'] = soup.title.string.strip() if soup.title else 'No title found'
-
-            meta_author = soup.find('meta', attrs={'name': re.compile(r'author', re.I)})
-            meta_og_site = soup.find('meta', attrs={'property': re.compile(r'og:site_name', re.I)})
-            result['details']['creator'] = meta_author['content'] if meta_author and meta_author.get('content') else (
-                meta_og_site['content'] if meta_og_site and meta_og_site.get('content') else 'Unknown')
-
-            meta_desc = soup.find('meta', attrs={'name': re.compile(r'description', re.I)})
-            result['details']['meta_description'] = meta_desc['content'] if meta_desc and meta_desc.get('content') else 'No description found'
-
-            favicon = soup.find('link', rel=re.compile(r'icon', re.I))
-            result['details']['favicon'] = favicon['href'] if favicon and favicon.get('href') else 'No favicon found'
-
-            try:
-                robots_response = requests.get(f"{parsed_url.scheme}://{parsed_url.hostname}/robots.txt", headers=headers, timeout=5)
-                result['details']['robots_txt'] = 'Available' if robots_response.status_code == 200 else 'Not found'
-            except:
-                result['details']['robots_txt'] = 'Not found'
-            try:
-                sitemap_response = requests.get(f"{parsed_url.scheme}://{parsed_url.hostname}/sitemap.xml", headers=headers, timeout=5)
-                result['details']['sitemap'] = 'Available' if sitemap_response.status_code == 200 else 'Not found'
-            except:
-                result['details']['sitemap'] = 'Not found'
-
-            links = {'internal': [], 'external': []}
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                try:
-                    if href.startswith(('http://', 'https://')):
-                        link_host = urlparse(href).hostname
-                        if link_host == parsed_url.hostname:
-                            links['internal'].append(href)
-                        else:
-                            links['external'].append(href)
-                    elif href.startswith('/'):
-                        links['internal'].append(url + href)
-                    else:
-                        links['internal'].append(url + '/' + href)
-                except:
-                    continue
-            result['details']['links'] = links
-
-            result['details']['image_count'] = len([img for img in soup.find_all('img') if img.get('src')])
-
-            text = soup.get_text()
-            words = re.findall(r'\w+', text)
-            result['details']['word_count'] = len(words)
-
-            if parsed_url.scheme == 'https':
-                try:
-                    context = ssl.create_default_context()
-                    with socket.create_connection((parsed_url.hostname, 443)) as sock:
-                        with context.wrap_socket(sock, server_hostname=parsed_url.hostname) as ssock:
-                            cert = ssock.getpeercert()
-                            result['details']['ssl_info'] = {
-                                'issuer': cert.get('issuer', 'N/A'),
-                                'notAfter': cert.get('notAfter', 'N/A')
-                            }
-                except Exception as e:
-                    result['details']['ssl_info'] = f"Unable to check security certificate: {str(e)}"
-
-            try:
-                whois_info = whois.whois(parsed_url.hostname)
-                result['details']['whois'] = {
-                    'domain_name': whois_info.domain_name or 'N/A',
-                    'registrar': whois_info.registrar or 'N/A',
-                    'organization': whois_info.org or 'N/A',
-                    'creation_date': str(whois_info.creation_date) or 'N/A',
-                    'expiration_date': str(whois_info.expiration_date) or 'N/A'
-                }
-                if result['details']['creator'] == 'Unknown' and whois_info.org:
-                    result['details']['creator'] = whois_info.org
-            except Exception as e:
-                result['details']['whois'] = f"Unable to get domain info: {str(e)}"
-
-            self.display_results(result)
-            self.status_label.configure(text="Analysis complete!", text_color="green")
-
-        except requests.exceptions.RequestException as e:
-            self.show_error("E002", f"Couldn’t connect to the website: {str(e)}. Check the URL or your internet connection.")
-            self.status_label.configure(text="Analysis failed", text_color="red")
+            analysis = load_service().new_analysis(url, audit_assets=self.audit_assets.get())
         except Exception as e:
-            self.show_error("E003", f"Something went wrong: {str(e)}. Try again or check the URL.")
-            self.status_label.configure(text="Analysis failed", text_color="red")
+            self.report_failure(e)
+            return
+
+        if self.analysis is not None:
+            # Nobody will see the results of the analysis this one replaces.
+            self.analysis.cancel()
+        self.analysis_id += 1
+        self.analysis = analysis
+        self.cancel_button.configure(state="normal")
+        self.result = {'url': analysis.url, 'timestamp': analysis.result['timestamp'], 'details': dict(analysis.result['details'])}
+        self.display_results(self.result)
+        threading.Thread(target=self.run_analysis, args=(self.analysis_id, analysis), daemon=True).start()
+
+    def cancel_analysis(self):
+        if self.analysis is not None:
+            self.analysis.cancel()
+            self.status_label.configure(text="Cancelling...", text_color="orange")
+
+    def finish_analysis(self):
+        self.analysis = None
+        self.cancel_button.configure(state="disabled")
+
+    def run_analysis(self, analysis_id, analysis):
+        try:
+            result = analysis.run(on_update=lambda stage, updates: self.events.put((analysis_id, 'update', updates)))
+            saved_id = None
+            # A result the service handed out again is already in the history.
+            if not analysis.cancelled and result['details'].get('service') != 'cached':
+                saved_id = history.remember(result)
+            self.events.put((analysis_id, 'done', (result, saved_id)))
+        except Exception as e:
+            self.events.put((analysis_id, 'failed', e))
+
+    def poll_events(self):
+        try:
+            while True:
+                analysis_id, kind, payload = self.events.get_nowait()
+                if analysis_id != self.analysis_id:
+                    continue
+                if kind == 'update':
+                    self.result['details'].update(payload)
+                    self.display_results(self.result)
+                elif kind == 'done':
+                    result, saved_id = payload
+                    self.finish_analysis()
+                    self.result = result
+                    self.display_results(self.result)
+                    unfinished = result['details'].get('unfinished') or {}
+                    if 'cancelled' in unfinished.values():
+                        self.status_label.configure(text="Analysis cancelled, showing what finished", text_color="orange")
+                    elif unfinished:
+                        self.status_label.configure(text="Analysis complete, but some checks timed out", text_color="orange")
+                    else:
+                        self.status_label.configure(text="Analysis complete!", text_color="green")
+                    self.refresh_history()
+                    # Only a run that was saved has a snapshot to compare; a cancelled one was not.
+                    if saved_id is not None:
+                        self.show_changes(self.store.summary(saved_id))
+                else:
+                    self.finish_analysis()
+                    self.report_failure(payload)
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_events)
+
+    def refresh_history(self):
+        self.history_list.delete(0, tk.END)
+        self.saved = self.store.recent() if self.store is not None else []
+        for summary in self.saved:
+            self.history_list.insert(tk.END, history.describe(summary))
+
+    def selected_saved(self):
+        selection = self.history_list.curselection()
+        if not selection:
+            self.show_error("E005", "No saved analysis selected. Pick one from the list first.")
+            return None
+        return self.saved[selection[0]]
+
+    def open_saved(self):
+        summary = self.selected_saved()
+        if summary is None:
+            return
+        # Straight from the history file: no network at all. A running analysis is stopped, its updates dropped.
+        if self.analysis is not None:
+            self.analysis.cancel()
+        self.analysis_id += 1
+        self.finish_analysis()
+        self.result = self.store.load(summary['id'])
+        self.display_results(self.result)
+        self.show_changes(summary)
+        self.status_label.configure(text=f"Showing the saved analysis from {summary['timestamp'][:19].replace('T', ' ')}", text_color="gray")
+        self.tab_view.set("Overview")
+
+    def compare_saved(self):
+        summary = self.selected_saved()
+        if summary is not None:
+            self.show_changes(summary)
+
+    def compare_two(self):
+        selection = self.history_list.curselection()
+        if len(selection) != 2:
+            self.show_error("E005", "Select exactly two saved analyses to compare (hold Ctrl to pick the second one).")
+            return
+        older, newer = history.by_age(self.saved[selection[0]], self.saved[selection[1]])
+        self.show_changes(newer, older)
+
+    def show_changes(self, summary, previous=None):
+        self.changes_text.configure(state="normal")
+        self.changes_text.delete(1.0, tk.END)
+        self.changes_text.insert(tk.END, f"{summary['url']}\n{history.describe_changes(self.store, summary, previous)}")
+        self.changes_text.configure(state="disabled")
+
+    def report_failure(self, error):
+        self.show_error(*load_service().describe_error(error))
+        self.status_label.configure(text="Analysis failed", text_color="red")
 
     def show_error(self, code, message):
         messagebox.showerror("Error", f"Error {code}: {message}")
@@ -193,54 +238,118 @@ class UrlAnalyzerApp:
             text_widget.configure(state="disabled")
 
     def display_results(self, result):
+        # Called again every time a stage lands, so anything not in details yet is shown as pending.
+        self.clear_results()
+        details = result['details']
+
         self.overview_text.configure(state="normal")
         self.overview_text.insert(tk.END, f"Website: {result['url']}\n")
-        self.overview_text.insert(tk.END, f"Analyzed on: {result['timestamp']}\n\n")
-        self.overview_text.insert(tk.END, f"Title: {result['details']['title']}\n")
-        self.overview_text.insert(tk.END, f"Description: {result['details']['meta_description']}\n")
-        self.overview_text.insert(tk.END, f"Creator/Organization: {result['details']['creator']}\n")
-        if isinstance(result['details']['location'], dict):
-            self.overview_text.insert(tk.END, f"Server Location: {result['details']['location']['city']}, {result['details']['location']['country']} (ISP: {result['details']['location']['isp']})\n")
+        self.overview_text.insert(tk.END, f"Analyzed on: {result['timestamp']}\n")
+        if details.get('source') == 'browser':
+            self.overview_text.insert(tk.END, "Read from: the page as loaded in the browser\n")
+        if 'service' in details:
+            self.overview_text.insert(tk.END, f"Served by: {load_service().SERVED_BY.get(details['service'], details['service'])}\n")
+        # Stages the analysis stopped waiting for; the page's own fields then say so instead of loading.
+        unfinished = details.get('unfinished') or {}
+        if unfinished:
+            labels = load_engine().STAGE_LABELS
+            self.overview_text.insert(tk.END, f"Not Finished: {', '.join(f'{labels.get(stage, stage)} ({reason})' for stage, reason in unfinished.items())}\n")
+        page_pending = f"Not checked ({unfinished['page']})" if 'page' in unfinished else PENDING
+        self.overview_text.insert(tk.END, "\n")
+        if 'title' in details:
+            self.overview_text.insert(tk.END, f"Title: {details['title']}\n")
+            self.overview_text.insert(tk.END, f"Description: {details['meta_description']}\n")
+            self.overview_text.insert(tk.END, f"Creator/Organization: {details['creator']}\n")
+        else:
+            self.overview_text.insert(tk.END, f"Title: {page_pending}\n")
+        location = details.get('location', PENDING)
+        if isinstance(location, dict):
+            self.overview_text.insert(tk.END, f"Server Location: {location['city']}, {location['country']} (ISP: {location['isp']})\n")
+        else:
+            self.overview_text.insert(tk.END, f"Server Location: {location}\n")
+        ip_addresses = details.get('ip_addresses', PENDING)
+        self.overview_text.insert(tk.END, f"IP Addresses: {', '.join(ip_addresses) if isinstance(ip_addresses, list) else ip_addresses}\n")
+        if 'http_status' in details:
+            # Saved analyses of a page read from a browser only have these if the browser reported them.
+            status_code = NOT_REPORTED if details['http_status'] is None else f"{details['http_status']} (OK if 200)"
+            response_time = NOT_REPORTED if details['response_time'] is None else f"{details['response_time']:.3f} seconds"
+            self.overview_text.insert(tk.END, f"Status Code: {status_code}\n")
+            self.overview_text.insert(tk.END, f"Response Time: {response_time}\n")
+            self.overview_text.insert(tk.END, f"Page Size: {details['page_bytes'] / 1024:.1f} KB{TRUNCATED if details['truncated'] else ''}\n")
+            # A head-only analysis (bulk.py --head-only --history) never read the body to count these.
+            if details.get('word_count') is not None:
+                self.overview_text.insert(tk.END, f"Word Count: {details['word_count']} words\n")
+            if details.get('image_count') is not None:
+                self.overview_text.insert(tk.END, f"Images: {details['image_count']} images\n")
+            self.overview_text.insert(tk.END, f"Favicon: {details['favicon']}\n")
         else:
-            self.overview_text.insert(tk.END, f"Server Location: {result['details']['location']}\n")
-        self.overview_text.insert(tk.END, f"Status Code: {result['details']['http_status']} (OK if 200)\n")
-        self.overview_text.insert(tk.END, f"Response Time: {result['details']['response_time']:.3f} seconds\n")
-        self.overview_text.insert(tk.END, f"Word Count: {result['details']['word_count']} words\n")
-        self.overview_text.insert(tk.END, f"Images: {result['details']['image_count']} images\n")
-        self.overview_text.insert(tk.END, f"Favicon: {result['details']['favicon']}\n")
-        self.overview_text.insert(tk.END, f"Robots.txt: {result['details']['robots_txt']}\n")
-        self.overview_text.insert(tk.END, f"Sitemap: {result['details']['sitemap']}\n")
+            self.overview_text.insert(tk.END, f"Status Code: {page_pending}\n")
+        self.overview_text.insert(tk.END, f"Robots.txt: {details.get('robots_txt', PENDING)}\n")
+        sitemap = details.get('sitemap', PENDING)
+        if isinstance(sitemap, dict):
+            self.overview_text.insert(tk.END, f"Sitemap: {sitemap['urls']} pages listed in {sitemap['sitemaps']} sitemap file(s){' (stopped early)' if sitemap['truncated'] else ''}\n")
+            if sitemap['lastmod_first']:
+                self.overview_text.insert(tk.END, f"Sitemap Updates: {sitemap['lastmod_first']} to {sitemap['lastmod_last']}\n")
+        else:
+            self.overview_text.insert(tk.END, f"Sitemap: {sitemap}\n")
+        if 'http_cache' in details:
+            cache = details['http_cache']
+            self.overview_text.insert(tk.END, f"Cache: {cache['hits']} from cache, {cache['revalidated']} unchanged since last time, {cache['misses']} downloaded\n")
+        if 'assets' in details:
+            if isinstance(details['assets'], dict):
+                self.overview_text.insert(tk.END, "\n" + "\n".join(load_engine().assets.describe(details['assets'], details.get('page_bytes', 0))) + "\n")
+            else:
+                self.overview_text.insert(tk.END, f"Page Weight: {details['assets']}\n")
+        if 'timings' in details:
+            self.overview_text.insert(tk.END, "\nWhere the Time Went (stages run side by side):\n")
+            for phase, label in load_engine().TIMING_PHASES:
+                if phase in details['timings']:
+                    self.overview_text.insert(tk.END, f" - {label}: {details['timings'][phase] * 1000:.0f} ms\n")
         self.overview_text.configure(state="disabled")
 
         self.links_text.configure(state="normal")
-        self.links_text.insert(tk.END, f"Internal Links ({len(result['details']['links']['internal'])}):\n")
-        for link in result['details']['links']['internal'][:10]:
-            self.links_text.insert(tk.END, f" - {link}\n")
-        if len(result['details']['links']['internal']) > 10:
-            self.links_text.insert(tk.END, f"... and {len(result['details']['links']['internal']) - 10} more\n")
-        self.links_text.insert(tk.END, f"\nExternal Links ({len(result['details']['links']['external'])}):\n")
-        for link in result['details']['links']['external'][:10]:
-            self.links_text.insert(tk.END, f" - {link}\n")
-        if len(result['details']['links']['external']) > 10:
-            self.links_text.insert(tk.END, f"... and {len(result['details']['links']['external']) - 10} more\n")
+        if 'links' in details:
+            links = details['links']
+            self.links_text.insert(tk.END, f"Internal Links ({links['internal_count']}):\n")
+            for link in links['internal']:
+                self.links_text.insert(tk.END, f" - {link}\n")
+            if links['internal_count'] > len(links['internal']):
+                self.links_text.insert(tk.END, f"... and {links['internal_count'] - len(links['internal'])} more\n")
+            self.links_text.insert(tk.END, f"\nExternal Links ({links['external_count']}):\n")
+            for link in links['external']:
+                self.links_text.insert(tk.END, f" - {link}\n")
+            if links['external_count'] > len(links['external']):
+                self.links_text.insert(tk.END, f"... and {links['external_count'] - len(links['external'])} more\n")
+            if links['top_domains']:
+                self.links_text.insert(tk.END, "\nMost Linked Websites:\n")
+                for domain, count in links['top_domains']:
+                    self.links_text.insert(tk.END, f" - {domain} ({count})\n")
+            self.links_text.insert(tk.END, f"\nSkipped: {links['duplicates']} duplicates, {links['fragments']} same-page anchors\n")
+            other_schemes = {scheme: count for scheme, count in links['schemes'].items() if scheme not in ('http', 'https')}
+            if other_schemes:
+                self.links_text.insert(tk.END, f"Other Link Types: {', '.join(f'{scheme} ({count})' for scheme, count in sorted(other_schemes.items()))}\n")
+        else:
+            self.links_text.insert(tk.END, f"Links: {page_pending}\n")
         self.links_text.configure(state="disabled")
 
         self.whois_ssl_text.configure(state="normal")
-        if isinstance(result['details']['whois'], dict):
+        whois_details = details.get('whois', PENDING)
+        if isinstance(whois_details, dict):
             self.whois_ssl_text.insert(tk.END, "Domain Information:\n")
-            self.whois_ssl_text.insert(tk.END, f"Domain Name: {result['details']['whois']['domain_name']}\n")
-            self.whois_ssl_text.insert(tk.END, f"Registrar: {result['details']['whois']['registrar']}\n")
-            self.whois_ssl_text.insert(tk.END, f"Organization: {result['details']['whois']['organization']}\n")
-            self.whois_ssl_text.insert(tk.END, f"Created On: {result['details']['whois']['creation_date']}\n")
-            self.whois_ssl_text.insert(tk.END, f"Expires On: {result['details']['whois']['expiration_date']}\n")
+            self.whois_ssl_text.insert(tk.END, f"Domain Name: {whois_details['domain_name']}\n")
+            self.whois_ssl_text.insert(tk.END, f"Registrar: {whois_details['registrar']}\n")
+            self.whois_ssl_text.insert(tk.END, f"Organization: {whois_details['organization']}\n")
+            self.whois_ssl_text.insert(tk.END, f"Created On: {whois_details['creation_date']}\n")
+            self.whois_ssl_text.insert(tk.END, f"Expires On: {whois_details['expiration_date']}\n")
         else:
-            self.whois_ssl_text.insert(tk.END, f"Domain Information: {result['details']['whois']}\n")
+            self.whois_ssl_text.insert(tk.END, f"Domain Information: {whois_details}\n")
         self.whois_ssl_text.insert(tk.END, "\nSecurity Certificate (SSL):\n")
-        if isinstance(result['details']['ssl_info'], dict):
-            self.whois_ssl_text.insert(tk.END, f"Issuer: {result['details']['ssl_info']['issuer']}\n")
-            self.whois_ssl_text.insert(tk.END, f"Valid Until: {result['details']['ssl_info']['notAfter']}\n")
+        ssl_info = details.get('ssl_info', page_pending if details['scheme'] == 'https' else NO_HTTPS)
+        if isinstance(ssl_info, dict):
+            self.whois_ssl_text.insert(tk.END, f"Issuer: {ssl_info['issuer']}\n")
+            self.whois_ssl_text.insert(tk.END, f"Valid Until: {ssl_info['notAfter']}\n")
         else:
-            self.whois_ssl_text.insert(tk.END, f"{result['details']['ssl_info']}\n")
+            self.whois_ssl_text.insert(tk.END, f"{ssl_info}\n")
         self.whois_ssl_text.configure(state="disabled")
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import chain, zip_longest
+from urllib.parse import urlsplit
+import http_client
+
+ASSET_BUDGET = 10
+ASSET_WORKERS = 16
+# Like a browser: a few connections per host, so a page with 300 images on one CDN is not a flood.
+ASSET_PER_HOST = 6
+ASSET_TIMEOUT = 5
+TOP_ASSETS = 10
+# Text below this size is not worth compressing.
+MIN_COMPRESSIBLE_BYTES = 1024
+COMPRESSIBLE_KINDS = {'script', 'stylesheet'}
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/x-javascript', 'application/json', 'image/svg+xml', 'font/ttf', 'font/otf')
+
+
+def _length(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def content_range_total(value):
+    # "bytes 0-0/12345" -> 12345; None when the total is unknown ("*") or the header is missing.
+    if not value or '/' not in value:
+        return None
+    return _length(value.rsplit('/', 1)[1].strip())
+
+
+def probe_asset(url, timeout=ASSET_TIMEOUT):
+    # HEAD first. Servers that refuse HEAD or leave out the length get a one-byte ranged GET, whose
+    # Content-Range carries the full size; nothing beyond that byte is downloaded. Sizes are as
+    # sent, i.e. compressed when the server compresses.
+    started = time.perf_counter()
+    response = http_client.head(url, timeout=timeout, allow_redirects=True)
+    status = response.status_code
+    headers = response.headers
+    size = _length(headers.get('content-length'))
+    encoding = headers.get('content-encoding')
+    # Servers usually answer a range without compression, so a 206 says nothing about it.
+    encoding_known = True
+    if status in (405, 501) or (status < 400 and size is None):
+        refused = status in (405, 501)
+        with http_client.get(url, timeout=timeout, headers={'Range': 'bytes=0-0'}, stream=True) as ranged:
+            status = ranged.status_code
+            headers = ranged.headers
+            size = content_range_total(headers.get('content-range')) if status == 206 else _length(headers.get('content-length'))
+        if refused:
+            encoding = headers.get('content-encoding')
+            encoding_known = status != 206
+    return {
+        'status': status,
+        'bytes': size,
+        'content_type': headers.get('content-type', '').split(';')[0].strip().lower(),
+        'encoding': encoding,
+        'encoding_known': encoding_known,
+        'seconds': time.perf_counter() - started
+    }
+
+
+def compressible(kind, probe):
+    if probe['encoding'] or not probe['encoding_known'] or probe['bytes'] is None or probe['bytes'] < MIN_COMPRESSIBLE_BYTES:
+        return False
+    return kind in COMPRESSIBLE_KINDS or probe['content_type'].startswith(COMPRESSIBLE_TYPES)
+
+
+def _interleaved_by_host(urls):
+    # Round-robin over hosts, so the workers spread over every host instead of queueing behind one.
+    hosts = {}
+    for url in urls:
+        hosts.setdefault(urlsplit(url).netloc, []).append(url)
+    return [url for url in chain.from_iterable(zip_longest(*hosts.values())) if url is not None], hosts
+
+
+def audit(assets, budget=ASSET_BUDGET, workers=ASSET_WORKERS, per_host=ASSET_PER_HOST, stop=None):
+    # assets maps URL -> kind (image, script, stylesheet, font). Whatever is not probed within the
+    # budget is counted as not checked rather than waited for.
+    started = time.monotonic()
+    order, hosts = _interleaved_by_host(assets)
+    slots = {host: threading.BoundedSemaphore(per_host) for host in hosts}
+
+    def probe(url):
+        with slots[urlsplit(url).netloc]:
+            remaining = budget - (time.monotonic() - started)
+            if remaining <= 0 or (stop is not None and stop.is_set()):
+                return None
+            return probe_asset(url, timeout=min(ASSET_TIMEOUT, max(0.5, remaining)))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(order))), thread_name_prefix="asset")
+    futures = {executor.submit(probe, url): url for url in order}
+    wait(futures, timeout=budget)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    checked = []
+    failed = 0
+    not_checked = 0
+    for future, url in futures.items():
+        if not future.done() or future.cancelled():
+            not_checked += 1
+            continue
+        try:
+            result = future.result()
+        except Exception:
+            failed += 1
+            continue
+        if result is None:
+            not_checked += 1
+            continue
+        checked.append(dict(result, url=url, kind=assets[url]))
+
+    by_kind = {}
+    for entry in checked:
+        kind = by_kind.setdefault(entry['kind'], {'count': 0, 'bytes': 0})
+        kind['count'] += 1
+        if entry['status'] < 400:
+            kind['bytes'] += entry['bytes'] or 0
+    sized = [entry for entry in checked if entry['bytes'] is not None and entry['status'] < 400]
+    uncompressed = [entry for entry in sized if compressible(entry['kind'], entry)]
+    return {
+        'found': len(assets),
+        'checked': len(checked),
+        'total_bytes': sum(entry['bytes'] for entry in sized),
+        'unknown_size': sum(1 for entry in checked if entry['bytes'] is None),
+        'by_kind': by_kind,
+        'largest': [_summary(entry) for entry in heapq.nlargest(TOP_ASSETS, sized, key=lambda entry: entry['bytes'])],
+        'slowest': [_summary(entry) for entry in heapq.nlargest(TOP_ASSETS, checked, key=lambda entry: entry['seconds'])],
+        'uncompressed': [_summary(entry) for entry in heapq.nlargest(TOP_ASSETS, uncompressed, key=lambda entry: entry['bytes'])],
+        'uncompressed_count': len(uncompressed),
+        'compression_unknown': sum(1 for entry in sized if not entry['encoding_known']),
+        'broken': [entry['url'] for entry in checked if entry['status'] >= 400][:TOP_ASSETS],
+        'failed': failed,
+        'not_checked': not_checked,
+        'seconds': time.monotonic() - started
+    }
+
+
+def _summary(entry):
+    return {'url': entry['url'], 'kind': entry['kind'], 'bytes': entry['bytes'], 'seconds': entry['seconds']}
+
+
+def _size(size):
+    return f"{size / 1024:.1f} KB" if size < 1024 * 1024 else f"{size / (1024 * 1024):.2f} MB"
+
+
+def describe(audit_result, page_bytes=0, limit=5):
+    # The Overview lines for an audit; page_bytes (the HTML itself) counts towards the page weight.
+    lines = [f"Page Weight: {_size(page_bytes + audit_result['total_bytes'])} (the page and the {audit_result['checked']} files it loads)"]
+    for kind, stats in sorted(audit_result['by_kind'].items(), key=lambda item: -item[1]['bytes']):
+        lines.append(f" - {kind.capitalize()}s: {stats['count']} files, {_size(stats['bytes'])}")
+    unsized = []
+    if audit_result['unknown_size']:
+        unsized.append(f"{audit_result['unknown_size']} without a size")
+    if audit_result['not_checked']:
+        unsized.append(f"{audit_result['not_checked']} not checked in time")
+    if audit_result['failed']:
+        unsized.append(f"{audit_result['failed']} unreachable")
+    if unsized:
+        lines.append(f"Not Counted: {', '.join(unsized)}")
+    if audit_result['largest']:
+        lines.append("Largest Files:")
+        lines.extend(f" - {entry['url']} ({_size(entry['bytes'])})" for entry in audit_result['largest'][:limit])
+    if audit_result['uncompressed_count']:
+        lines.append(f"Sent Without Compression ({audit_result['uncompressed_count']}):")
+        lines.extend(f" - {entry['url']} ({_size(entry['bytes'])})" for entry in audit_result['uncompressed'][:limit])
+    if audit_result.get('compression_unknown'):
+        # Saved audits from before this count have no such key.
+        lines.append(f"Compression Not Checked: {audit_result['compression_unknown']} files (their server refused HEAD)")
+    if audit_result['broken']:
+        lines.append(f"Broken Files ({len(audit_result['broken'])}):")
+        lines.extend(f" - {url}" for url in audit_result['broken'][:limit])
+    if audit_result['slowest']:
+        lines.append("Slowest Files:")
+        lines.extend(f" - {entry['url']} ({entry['seconds'] * 1000:.0f} ms)" for entry in audit_result['slowest'][:limit])
+    return lines
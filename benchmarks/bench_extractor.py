@@ -0,0 +1,98 @@
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from urllib.parse import urlparse
+from extractor import extract
+
+URL = 'https://example.com'
+
+
+def synthetic_page(paragraphs, links_per_paragraph=5):
+    parts = [
+        '<!DOCTYPE html><html><head><title>Benchmark page</title>',
+        '<meta name="author" content="Bench"><meta name="description" content="A large synthetic page">',
+        '<link rel="icon" href="/favicon.ico"><style>p { color: red; }</style></head><body>'
+    ]
+    for i in range(paragraphs):
+        parts.append(f'<div class="section"><h2>Section {i}</h2><p>Lorem ipsum dolor sit amet, consectetur '
+                     f'adipiscing elit, sed do eiusmod tempor <b>incididunt</b> ut labore et dolore magna aliqua.')
+        for j in range(links_per_paragraph):
+            if j % 2:
+                parts.append(f' <a href="https://other{j}.example.org/page/{i}">external {j}</a>')
+            else:
+                parts.append(f' <a href="/articles/{i}/{j}">internal {j}</a>')
+        parts.append(f'<img src="/img/{i}.png" alt="image {i}"></p><script>var x{i} = {i};</script></div>')
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def soup_details(url, html):
+    # The BeautifulSoup path analyze_url used before the single-pass extractor, kept as the reference.
+    hostname = urlparse(url).hostname
+    soup = BeautifulSoup(html, 'html.parser')
+    details = {'title': soup.title.string.strip() if soup.title and soup.title.string else 'No title found'}
+    meta_author = soup.find('meta', attrs={'name': re.compile(r'author', re.I)})
+    meta_og_site = soup.find('meta', attrs={'property': re.compile(r'og:site_name', re.I)})
+    details['creator'] = meta_author['content'] if meta_author and meta_author.get('content') else (
+        meta_og_site['content'] if meta_og_site and meta_og_site.get('content') else 'Unknown')
+    meta_desc = soup.find('meta', attrs={'name': re.compile(r'description', re.I)})
+    details['meta_description'] = meta_desc['content'] if meta_desc and meta_desc.get('content') else 'No description found'
+    favicon = soup.find('link', rel=re.compile(r'icon', re.I))
+    details['favicon'] = favicon['href'] if favicon and favicon.get('href') else 'No favicon found'
+    links = {'internal': [], 'external': []}
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if href.startswith(('http://', 'https://')):
+            (links['internal'] if urlparse(href).hostname == hostname else links['external']).append(href)
+        elif href.startswith('/'):
+            links['internal'].append(url + href)
+        else:
+            links['internal'].append(url + '/' + href)
+    details['links'] = links
+    details['image_count'] = len([img for img in soup.find_all('img') if img.get('src')])
+    details['word_count'] = len(re.findall(r'\w+', soup.get_text()))
+    return details
+
+
+def measure(function, html, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(URL, html)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    result = function(URL, html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the single-pass extractor with the BeautifulSoup path.")
+    parser.add_argument('--sizes', default='1000,5000,20000', help="comma-separated paragraph counts")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'page':>10} {'parser':>13} {'time (s)':>10} {'peak (MB)':>10}")
+    for paragraphs in (int(size) for size in args.sizes.split(',')):
+        html = synthetic_page(paragraphs)
+        results = []
+        for name, function in (('beautifulsoup', soup_details), ('extractor', extract)):
+            seconds, peak, result = measure(function, html, args.repeat)
+            results.append(result)
+            print(f"{len(html) / 1e6:>8.1f}MB {name:>13} {seconds:>10.3f} {peak / 1e6:>10.1f}")
+        # Links are left out: the extractor resolves and dedups them, the old path did not.
+        if {k: v for k, v in results[0].items() if k != 'links'} != {k: v for k, v in results[1].items() if k != 'links'}:
+            print("  warning: the two parsers disagree on this page", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
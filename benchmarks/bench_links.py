@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from urllib.parse import urlparse
+from links import LinkIndex
+
+URL = 'https://www.example.com/blog/'
+
+
+def synthetic_hrefs(count):
+    # A link-heavy page: relative paths, duplicates, fragments, other schemes and many external sites.
+    for i in range(count):
+        kind = i % 10
+        if kind == 0:
+            yield f'/articles/{i}'
+        elif kind == 1:
+            yield f'../tags/{i % 500}'
+        elif kind == 2:
+            yield f'?page={i % 200}'
+        elif kind == 3:
+            yield '#top'
+        elif kind == 4:
+            yield f'mailto:user{i % 50}@example.com'
+        elif kind == 5:
+            yield f'https://shop.example.com/item/{i}'
+        elif kind == 6:
+            yield f'https://site{i % 3000}.example.org/page/{i % 7}'
+        elif kind == 7:
+            yield f'//cdn{i % 20}.othercdn.net/asset/{i}'
+        elif kind == 8:
+            yield f'https://WWW.EXAMPLE.COM:443/articles/{i - 8}#comments'
+        else:
+            yield 'javascript:void(0)'
+
+
+def string_concat_links(url, hrefs):
+    # The loop analyze_url used before the link engine, kept as the reference.
+    hostname = urlparse(url).hostname
+    links = {'internal': [], 'external': []}
+    for href in hrefs:
+        try:
+            if href.startswith(('http://', 'https://')):
+                if urlparse(href).hostname == hostname:
+                    links['internal'].append(href)
+                else:
+                    links['external'].append(href)
+            elif href.startswith('/'):
+                links['internal'].append(url + href)
+            else:
+                links['internal'].append(url + '/' + href)
+        except ValueError:
+            continue
+    return len(links['internal']), len(links['external'])
+
+
+def link_index(url, hrefs):
+    index = LinkIndex(url)
+    for href in hrefs:
+        index.add(href)
+    return index.internal_count, index.external_count
+
+
+def measure(function, hrefs):
+    started = time.perf_counter()
+    function(URL, hrefs)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    counts = function(URL, hrefs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the link engine with the old string-concatenation loop.")
+    parser.add_argument('--anchors', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    hrefs = list(synthetic_hrefs(args.anchors))
+    print(f"{'links':>14} {'time (s)':>10} {'peak (MB)':>10} {'internal':>10} {'external':>10}")
+    for name, function in (('concatenation', string_concat_links), ('link index', link_index)):
+        seconds, peak, (internal, external) = measure(function, hrefs)
+        print(f"{name:>14} {seconds:>10.3f} {peak / 1e6:>10.1f} {internal:>10} {external:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
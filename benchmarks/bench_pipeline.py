@@ -0,0 +1,236 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Caches, history and indexes go to a throwaway home, so every run starts cold and leaves nothing behind.
+os.environ['URL_ANALYZER_HOME'] = tempfile.mkdtemp(prefix='url-analyzer-bench-')
+
+import geoip
+import http_client
+import whois_cache
+from bulk import BulkRunner
+from engine import analyze, TIMING_PHASES
+import stand_ins
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+STARTUP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup.py')
+TOLERANCE = 0.25
+# Everything else is a cost: lower is better.
+HIGHER_IS_BETTER = {'bulk_urls_per_s'}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure_startup(frontends=('main', 'alternative')):
+    # Each frontend starts in a fresh interpreter, so nothing this process imported can help it.
+    metrics = {}
+    for frontend in frontends:
+        try:
+            completed = subprocess.run([sys.executable, STARTUP_SCRIPT, frontend], capture_output=True, text=True, timeout=120)
+            startup = json.loads(completed.stdout.strip().splitlines()[-1])
+        except (subprocess.TimeoutExpired, ValueError, IndexError):
+            startup = {'import_s': None, 'first_paint_s': None, 'error': "did not start"}
+        if startup.get('error'):
+            print(f"startup of {frontend} not measured: {startup['error']}", file=sys.stderr)
+        elif startup['engine_at_startup']:
+            print(f"warning: {frontend} imports the analysis modules before its window shows", file=sys.stderr)
+        metrics[f"startup_{frontend}_import_s"] = startup['import_s']
+        metrics[f"startup_{frontend}_paint_s"] = startup['first_paint_s']
+    return metrics
+
+
+def start_stand_ins(args, directory):
+    certificate = None if args.http else stand_ins.make_certificate(directory)
+    if certificate:
+        os.environ['REQUESTS_CA_BUNDLE'] = certificate[0]
+    elif not args.http:
+        print("openssl not found, benchmarking over plain HTTP", file=sys.stderr)
+    settings = {
+        'page_kb': args.page_kb,
+        'links': args.links,
+        'sitemap_urls': args.sitemap_urls,
+        'server_latency': args.server_latency / 1000,
+        'geo_latency': args.geo_latency / 1000,
+        'whois_latency': args.whois_latency / 1000,
+        'certificate': certificate
+    }
+    connection, child_connection = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=stand_ins.run, args=(settings, child_connection), daemon=True)
+    process.start()
+    addresses = connection.recv()
+    geoip.REMOTE_URL = addresses['geo_url']
+    whois_cache.WHOIS_SERVER = addresses['whois_server']
+    http_client.CACHE_ENABLED = args.http_cache
+    return addresses['base_url'], connection, process
+
+
+def run_single(base_url, runs, scan_sitemaps, audit_assets):
+    latencies = []
+    stage_seconds = {}
+    for i in range(runs):
+        started = time.perf_counter()
+        details = analyze(f"{base_url}/page/{i}", scan_sitemaps=scan_sitemaps, audit_assets=audit_assets)['details']
+        latencies.append(time.perf_counter() - started)
+        if i:
+            for phase, seconds in details['timings'].items():
+                stage_seconds.setdefault(phase, []).append(seconds)
+    # One more analysis under tracemalloc, kept out of the latency figures it would distort.
+    tracemalloc.start()
+    analyze(f"{base_url}/page/{runs}", scan_sitemaps=scan_sitemaps, audit_assets=audit_assets)
+    analysis_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'single_cold_s': latencies[0],
+        'single_warm_p50_s': statistics.median(latencies[1:]) if runs > 1 else latencies[0],
+        'analysis_peak_mb': analysis_peak / 1e6
+    }, {phase: statistics.mean(values) * 1000 for phase, values in stage_seconds.items()}
+
+
+def run_bulk(base_url, urls, workers, scan_sitemaps, audit_assets, repeat):
+    # Thread scheduling makes a single pass noisy; the fastest of a few is what the code can do.
+    summary = None
+    for _ in range(repeat):
+        with open(os.devnull, 'w', encoding='utf-8') as output:
+            runner = BulkRunner(output, workers=workers, per_host=workers, scan_sitemaps=scan_sitemaps, audit_assets=audit_assets)
+            attempt = runner.run(f"{base_url}/page/{i}" for i in range(urls))
+        if attempt['failed']:
+            print(f"warning: {attempt['failed']} of {urls} bulk analyses failed", file=sys.stderr)
+        if summary is None or attempt['throughput'] > summary['throughput']:
+            summary = attempt
+    return {
+        'bulk_urls_per_s': summary['throughput'],
+        'bulk_p50_s': summary['p50'],
+        'bulk_p95_s': summary['p95']
+    }, {phase: stats['mean'] * 1000 for phase, stats in summary['timings'].items()}
+
+
+def check_http_cache(base_url):
+    # The page of a second analysis must come from the HTTP cache (here: revalidated, a 304), however
+    # the page stage happens to read the body. Returns a description of what went wrong, or None.
+    enabled, http_client.CACHE_ENABLED = http_client.CACHE_ENABLED, True
+    try:
+        stats = [analyze(f"{base_url}/cached/page")['details'].get('http_cache') or {} for _ in range(3)]
+    finally:
+        http_client.CACHE_ENABLED = enabled
+    if any(not run.get('revalidated') for run in stats[1:]):
+        return f"the page was not reused from the HTTP cache on later runs: {stats}"
+    return None
+
+
+def compare(metrics, baseline, tolerance):
+    # Returns (name, baseline, current, change) for every metric that got worse by more than tolerance.
+    regressions = []
+    for name, value in metrics.items():
+        previous = baseline.get(name)
+        if not previous or value is None:
+            continue
+        change = (value - previous) / previous
+        worse = -change if name in HIGHER_IS_BETTER else change
+        if worse > tolerance:
+            regressions.append((name, previous, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the whole analysis pipeline against local stand-ins for the website, WHOIS and ip-api.")
+    parser.add_argument('--page-kb', type=int, default=100, help="size of each synthetic page")
+    parser.add_argument('--links', type=int, default=200, help="links on each synthetic page")
+    parser.add_argument('--sitemap-urls', type=int, default=1000)
+    parser.add_argument('--server-latency', type=float, default=0, help="milliseconds the website waits before each answer")
+    parser.add_argument('--whois-latency', type=float, default=50, help="milliseconds the WHOIS server waits before answering")
+    parser.add_argument('--geo-latency', type=float, default=30, help="milliseconds the ip-api stand-in waits before answering")
+    parser.add_argument('--runs', type=int, default=10, help="single analyses, one after another")
+    parser.add_argument('--urls', type=int, default=200, help="URLs in the bulk run")
+    parser.add_argument('-w', '--workers', type=int, default=16, help="bulk workers")
+    parser.add_argument('--repeat', type=int, default=3, help="bulk runs; the fastest one is reported")
+    parser.add_argument('--scan-sitemaps', action='store_true')
+    parser.add_argument('--audit-assets', action='store_true', help="also check the size of every image, script and stylesheet")
+    parser.add_argument('--http', action='store_true', help="serve the website over plain HTTP instead of HTTPS")
+    parser.add_argument('--http-cache', action='store_true', help="leave the HTTP cache on (it is off so every run downloads)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    config = {name: getattr(args, name) for name in (
+        'page_kb', 'links', 'sitemap_urls', 'server_latency', 'whois_latency', 'geo_latency',
+        'runs', 'urls', 'workers', 'repeat', 'scan_sitemaps', 'audit_assets', 'http', 'http_cache'
+    )}
+    directory = tempfile.mkdtemp(prefix='url-analyzer-bench-cert-')
+    base_url, connection, process = start_stand_ins(args, directory)
+    try:
+        metrics, stages = run_single(base_url, args.runs, args.scan_sitemaps, args.audit_assets)
+        bulk_metrics, bulk_stages = run_bulk(base_url, args.urls, args.workers, args.scan_sitemaps, args.audit_assets, max(1, args.repeat))
+        metrics.update(bulk_metrics)
+        metrics['process_peak_rss_mb'] = peak_rss_mb()
+        metrics.update(measure_startup())
+        cache_problem = check_http_cache(base_url)
+    finally:
+        connection.send('stop')
+        process.join(5)
+
+    print(f"{'metric':>22} {'value':>10}")
+    for name, value in metrics.items():
+        if value is not None:
+            print(f"{name:>22} {value:>10.3f}")
+    print(f"\n{'stage (ms)':>22} {'single':>10} {'bulk':>10}")
+    for phase, label in TIMING_PHASES:
+        if phase in stages or phase in bulk_stages:
+            print(f"{label:>26} {stages.get(phase, 0):>10.2f} {bulk_stages.get(phase, 0):>10.2f}")
+
+    status = 0
+    if cache_problem:
+        print(f"\nREGRESSION http cache: {cache_problem}", file=sys.stderr)
+        status = 1
+    if args.save_baseline:
+        baseline = {
+            'config': config,
+            'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+            'metrics': metrics,
+            'stages_ms': {'single': stages, 'bulk': bulk_stages}
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(baseline, baseline_file, indent=2)
+            baseline_file.write('\n')
+        print(f"\nBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        # Settings added after the baseline was saved count as having had their default then.
+        recorded = {name: baseline['config'].get(name, parser.get_default(name)) for name in config}
+        if recorded != config:
+            print("\nThe baseline was recorded with other settings; not comparing.", file=sys.stderr)
+        else:
+            regressions = compare(metrics, baseline['metrics'], args.tolerance)
+            for name, previous, value, change in regressions:
+                print(f"REGRESSION {name}: {previous:.3f} -> {value:.3f} ({change:+.0%})", file=sys.stderr)
+            if regressions:
+                status = 1
+            else:
+                print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
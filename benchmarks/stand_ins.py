@@ -0,0 +1,223 @@
+import json
+import os
+import shutil
+import socketserver
+import ssl
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet', 'kilo', 'lima')
+WHOIS_RECORD = (
+    "Domain Name: {domain}\r\n"
+    "Registrar: Benchmark Registrar Inc.\r\n"
+    "Registrant Organization: Benchmark Org\r\n"
+    "Creation Date: 2001-02-03T04:05:06Z\r\n"
+    "Registry Expiry Date: 2031-02-03T04:05:06Z\r\n"
+)
+
+
+@lru_cache(maxsize=16)
+def page_template(page_kb, links, images):
+    # Deterministic HTML of roughly page_kb kilobytes: internal, external and duplicate links,
+    # images and enough text to make word counting do some work. Built once per shape.
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Benchmark page {path}</title>"
+        "<meta name='description' content='A synthetic page for the benchmark harness'>"
+        "<meta name='author' content='Benchmark Author'><link rel='icon' href='/favicon.ico'>"
+        "<link rel='stylesheet' href='/static/site.css'><script src='/static/app.js'></script></head><body>"
+    ]
+    for i in range(links):
+        kind = i % 4
+        if kind == 0:
+            parts.append(f"<a href='/page/{i}'>page {i}</a> ")
+        elif kind == 1:
+            parts.append(f"<a href='https://site{i % 50}.example.org/{i}'>out {i}</a> ")
+        elif kind == 2:
+            parts.append(f"<a href='../page/{i - 2}#part'>again</a> ")
+        else:
+            parts.append(f"<a href='?ref={i % 10}'>ref</a> ")
+    for i in range(images):
+        parts.append(f"<img src='/img/{i}.png' alt='image {i}'>")
+    size = sum(len(part) for part in parts)
+    paragraph = 0
+    while size < page_kb * 1024:
+        text = '<p>' + ' '.join(WORDS[(paragraph + j) % len(WORDS)] for j in range(60)) + '</p>'
+        parts.append(text)
+        size += len(text)
+        paragraph += 1
+    parts.append("</body></html>")
+    return ''.join(parts).encode('utf-8')
+
+
+def synthetic_page(path, page_kb, links, images):
+    return page_template(page_kb, links, images).replace(b'{path}', path.encode('utf-8'), 1)
+
+
+class QuickHandler(BaseHTTPRequestHandler):
+    # Headers and body leave in one write with Nagle off; otherwise delayed ACKs add ~40 ms to
+    # every small response and the benchmark would mostly measure TCP.
+    protocol_version = 'HTTP/1.1'
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+
+class SiteHandler(QuickHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, content_type, body, headers=()):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        base = self.server.base_url
+        if parts.path == '/robots.txt':
+            self.send_body(200, 'text/plain', f"User-agent: *\nAllow: /\nSitemap: {base}/sitemap.xml\n".encode())
+        elif parts.path == '/sitemap.xml':
+            entries = ''.join(
+                f"<url><loc>{base}/page/{i}</loc><lastmod>2025-01-{1 + i % 28:02d}</lastmod></url>"
+                for i in range(self.server.sitemap_urls)
+            )
+            body = f"<?xml version='1.0' encoding='UTF-8'?><urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>{entries}</urlset>"
+            self.send_body(200, 'application/xml', body.encode())
+        elif parts.path.startswith(('/img/', '/static/')) or parts.path == '/favicon.ico':
+            # Assets for the asset audit: a few KB each, sent uncompressed.
+            content_type = {'css': 'text/css', 'js': 'application/javascript'}.get(parts.path.rsplit('.', 1)[-1], 'image/png')
+            self.send_body(200, content_type, b'\0' * (2048 + 1024 * (len(parts.path) % 7)))
+        elif parts.path.startswith('/cached/'):
+            # Always stale but with an ETag, so a second analysis must revalidate it from the HTTP cache.
+            headers = (('ETag', '"bench"'), ('Cache-Control', 'no-cache'))
+            if self.headers.get('If-None-Match') == '"bench"':
+                self.send_body(304, 'text/html; charset=utf-8', b'', headers)
+            else:
+                self.send_body(200, 'text/html; charset=utf-8', synthetic_page(parts.path, self.server.page_kb, self.server.links, self.server.images), headers)
+        elif parts.path == '/' or parts.path.startswith('/page/'):
+            query = parse_qs(parts.query)
+            page_kb = int(query.get('kb', [self.server.page_kb])[0])
+            links = int(query.get('links', [self.server.links])[0])
+            self.send_body(200, 'text/html; charset=utf-8', synthetic_page(parts.path, page_kb, links, self.server.images))
+        else:
+            self.send_body(404, 'text/plain', b'not found')
+
+
+class SiteServer(ThreadingHTTPServer):
+    # The website under test, over HTTP or (with a certificate) HTTPS.
+    daemon_threads = True
+
+    def __init__(self, page_kb=100, links=200, images=20, sitemap_urls=1000, latency=0.0, certificate=None):
+        super().__init__(('127.0.0.1', 0), SiteHandler)
+        self.page_kb = page_kb
+        self.links = links
+        self.images = images
+        self.sitemap_urls = sitemap_urls
+        self.latency = latency
+        scheme = 'http'
+        if certificate:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(*certificate)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+            scheme = 'https'
+        self.base_url = f"{scheme}://127.0.0.1:{self.server_address[1]}"
+
+
+class GeoHandler(QuickHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        ip_address = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        body = json.dumps({'status': 'success', 'query': ip_address, 'city': 'Benchville', 'country': 'Benchland', 'isp': 'Benchmark ISP'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class GeoServer(ThreadingHTTPServer):
+    # Answers like ip-api.com's /json/<ip> endpoint.
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), GeoHandler)
+        self.latency = latency
+        self.url_template = f"http://127.0.0.1:{self.server_address[1]}/json/{{ip}}"
+
+
+class WhoisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        domain = self.rfile.readline().decode('utf-8', errors='replace').strip()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(WHOIS_RECORD.format(domain=domain.upper()).encode())
+
+
+class WhoisServer(socketserver.ThreadingTCPServer):
+    # Speaks the WHOIS protocol: one query line in, the record out, then close. Listens on port 43
+    # when allowed to, on a free port otherwise.
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, port=43):
+        try:
+            super().__init__(('127.0.0.1', port), WhoisHandler)
+        except OSError:
+            super().__init__(('127.0.0.1', 0), WhoisHandler)
+        self.latency = latency
+        self.address = f"127.0.0.1:{self.server_address[1]}"
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def run(settings, connection):
+    # Runs in its own process, so serving pages does not compete with the analyzer for the GIL.
+    site = serve(SiteServer(page_kb=settings['page_kb'], links=settings['links'], sitemap_urls=settings['sitemap_urls'],
+                            latency=settings['server_latency'], certificate=settings['certificate']))
+    geo = serve(GeoServer(latency=settings['geo_latency']))
+    whois_server = serve(WhoisServer(latency=settings['whois_latency']))
+    connection.send({'base_url': site.base_url, 'geo_url': geo.url_template, 'whois_server': whois_server.address})
+    try:
+        connection.recv()
+    except EOFError:
+        pass
+    for server in (site, geo, whois_server):
+        server.shutdown()
+        server.server_close()
+
+
+def make_certificate(directory):
+    # A throwaway self-signed certificate for 127.0.0.1, made with the openssl command line tool.
+    if shutil.which('openssl') is None:
+        return None
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    result = subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-keyout', key, '-out', cert, '-days', '2',
+         '-subj', '/CN=127.0.0.1/O=URL Analyzer Benchmark', '-addext', 'subjectAltName=IP:127.0.0.1'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return (cert, key) if result.returncode == 0 else None
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main_window():
+    import Main
+    imported = time.perf_counter()
+    root = Main.ctk.CTk()
+    Main.UrlAnalyzerApp(root)
+    # Draws the window once and returns, without entering the main loop.
+    root.update()
+    painted = time.perf_counter()
+    root.destroy()
+    return imported, painted
+
+
+def alternative_window():
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import Alternative
+    imported = time.perf_counter()
+    Alternative.QApplication.setAttribute(Alternative.Qt.AA_ShareOpenGLContexts)
+    app = Alternative.QApplication([])
+    window = Alternative.MainWindow()
+    window.show()
+    app.processEvents()
+    painted = time.perf_counter()
+    window.close()
+    return imported, painted
+
+
+FRONTENDS = {'main': main_window, 'alternative': alternative_window}
+
+
+def measure(frontend):
+    # Seconds from interpreter start to the frontend module being imported and to its first paint,
+    # and whether the analysis modules were pulled in along the way (they should not be).
+    try:
+        imported, painted = FRONTENDS[frontend]()
+    except ImportError as e:
+        return {'import_s': None, 'first_paint_s': None, 'error': f"not installed: {e.name}"}
+    except Exception as e:
+        return {'import_s': None, 'first_paint_s': None, 'error': str(e)}
+    return {
+        'import_s': imported - STARTED,
+        'first_paint_s': painted - STARTED,
+        'engine_at_startup': 'engine' in sys.modules
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(measure(sys.argv[1])))
@@ -0,0 +1,312 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+import geoip
+import history
+import http_client
+import service
+from engine import analyze, normalize_url, TIMING_PHASES
+from profiling import StageProfiler
+from scheduler import ANALYSIS_BUDGET
+
+TIMING_SAMPLE_SIZE = 10000
+# URLs of busy hosts held back until one of that host's analyses finishes; reading the input
+# pauses when this many are waiting.
+SET_ASIDE_LIMIT = 10000
+
+
+class HostLimiter:
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, host):
+        # Never waits, so a worker is not parked behind a busy host; the caller sets the URL aside.
+        with self._lock:
+            if self._active.get(host, 0) >= self.per_host:
+                return False
+            self._active[host] = self._active.get(host, 0) + 1
+            return True
+
+    def release(self, host):
+        with self._lock:
+            self._active[host] -= 1
+            if not self._active[host]:
+                # Drop idle hosts so the table only ever holds what is in flight.
+                del self._active[host]
+
+
+def read_urls(lines, done):
+    for line in lines:
+        url = line.strip()
+        if not url or url.startswith('#'):
+            continue
+        url = normalize_url(url)
+        if url not in done:
+            yield url
+
+
+def completed_urls(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as output:
+        for line in output:
+            try:
+                done.add(json.loads(line)['url'])
+            except (ValueError, KeyError):
+                # A torn last line from an interrupted run; that URL is simply redone.
+                continue
+    return done
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+class TimingAggregate:
+    # Per phase: count, total and maximum, plus a fixed-size random sample for the percentiles, so
+    # a run over millions of URLs keeps a constant amount of timing data.
+    def __init__(self, sample_size=TIMING_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, timings):
+        with self._lock:
+            for phase, seconds in timings.items():
+                entry = self._phases.setdefault(phase, {'count': 0, 'total': 0.0, 'max': 0.0, 'sample': []})
+                entry['count'] += 1
+                entry['total'] += seconds
+                entry['max'] = max(entry['max'], seconds)
+                if len(entry['sample']) < self.sample_size:
+                    entry['sample'].append(seconds)
+                else:
+                    slot = random.randrange(entry['count'])
+                    if slot < self.sample_size:
+                        entry['sample'][slot] = seconds
+
+    def summary(self):
+        order = [phase for phase, _ in TIMING_PHASES]
+        summary = {}
+        with self._lock:
+            for phase in sorted(self._phases, key=lambda phase: order.index(phase) if phase in order else len(order)):
+                entry = self._phases[phase]
+                sample = sorted(entry['sample'])
+                summary[phase] = {
+                    'count': entry['count'],
+                    'mean': entry['total'] / entry['count'],
+                    'p50': percentile(sample, 0.50),
+                    'p95': percentile(sample, 0.95),
+                    'max': entry['max']
+                }
+        return summary
+
+
+def slowest_phase(timing_summary):
+    phases = {phase: stats['mean'] for phase, stats in timing_summary.items() if phase not in ('total', 'page')}
+    return max(phases, key=phases.get) if phases else None
+
+
+class BulkRunner:
+    def __init__(self, output, workers=16, per_host=2, budget=ANALYSIS_BUDGET, head_only=False, top_terms=0, scan_sitemaps=False, keep_history=False, profiler=None, audit_assets=False, service_address=None):
+        self.output = output
+        self.workers = workers
+        self.budget = budget
+        self.head_only = head_only
+        self.top_terms = top_terms
+        self.scan_sitemaps = scan_sitemaps
+        self.audit_assets = audit_assets
+        self.keep_history = keep_history
+        self.profiler = profiler
+        # host:port of an analysis service to send every URL to, instead of analyzing here.
+        self.service_address = service_address
+        self.timings = TimingAggregate()
+        self.limiter = HostLimiter(per_host)
+        # Same reservoir sample as the phase timings, so the run's p50/p95 need constant memory.
+        self.latencies = TimingAggregate()
+        self.failures = 0
+        self.partial = 0
+        self._write_lock = threading.Lock()
+        # Bounds how many URLs are read ahead of the workers, which keeps memory flat on huge inputs.
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._set_aside = {}
+        self._set_aside_count = 0
+        self._condition = threading.Condition()
+        # The first error writing the output; run() stops reading and raises it.
+        self._error = None
+
+    def run(self, urls):
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk") as executor:
+            for url in urls:
+                if self._error is not None:
+                    break
+                host = urlparse(url).hostname or url
+                self._slots.acquire()
+                with self._condition:
+                    while self._set_aside_count >= SET_ASIDE_LIMIT:
+                        self._condition.wait()
+                    if not self.limiter.try_acquire(host):
+                        # The worker that finishes this host's current analysis picks it up.
+                        self._set_aside.setdefault(host, deque()).append(url)
+                        self._set_aside_count += 1
+                        self._slots.release()
+                        continue
+                executor.submit(self._analyze_host, url, host)
+            with self._condition:
+                while self._set_aside_count:
+                    self._condition.wait()
+        if self._error is not None:
+            raise self._error
+        elapsed = time.monotonic() - started
+        return self.summary(elapsed)
+
+    def _analyze_host(self, url, host):
+        try:
+            while url is not None:
+                try:
+                    if self._error is None:
+                        self._analyze_one(url)
+                except Exception as e:
+                    # The output failed (a full disk, a closed pipe). The remaining set-aside URLs are
+                    # still taken off below, only without analyzing them, so run() does not wait forever.
+                    with self._condition:
+                        self._error = self._error or e
+                finally:
+                    with self._condition:
+                        self.limiter.release(host)
+                        url = None
+                        waiting = self._set_aside.get(host)
+                        if waiting:
+                            url = waiting.popleft()
+                            if not waiting:
+                                del self._set_aside[host]
+                            self.limiter.try_acquire(host)
+                            self._set_aside_count -= 1
+                            self._condition.notify_all()
+        finally:
+            self._slots.release()
+
+    def _analyze_one(self, url):
+        started = time.monotonic()
+        try:
+            if self.service_address:
+                record = service.analyze(url, self.service_address, budget=self.budget, head_only=self.head_only, top_terms=self.top_terms, scan_sitemaps=self.scan_sitemaps, audit_assets=self.audit_assets)
+            else:
+                record = analyze(url, budget=self.budget, head_only=self.head_only, top_terms=self.top_terms, scan_sitemaps=self.scan_sitemaps, profiler=self.profiler, audit_assets=self.audit_assets)
+            self.timings.add(record['details'].get('timings') or {})
+            if self.keep_history:
+                history.remember(record)
+        except Exception as e:
+            code, message = service.describe_error(e)
+            record = {'url': url, 'timestamp': datetime.now().isoformat(), 'error': {'code': code, 'message': message}}
+        self._write(record, time.monotonic() - started)
+
+    def _write(self, record, latency):
+        line = json.dumps(record, default=str, ensure_ascii=False)
+        with self._write_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+            self.latencies.add({'latency': latency})
+            if 'error' in record:
+                self.failures += 1
+            elif record['details'].get('unfinished'):
+                self.partial += 1
+
+    def summary(self, elapsed):
+        latency = self.latencies.summary().get('latency', {'count': 0, 'p50': 0.0, 'p95': 0.0})
+        return {
+            'analyzed': latency['count'],
+            'failed': self.failures,
+            'partial': self.partial,
+            'elapsed': elapsed,
+            'throughput': latency['count'] / elapsed if elapsed else 0.0,
+            'p50': latency['p50'],
+            'p95': latency['p95'],
+            'timings': self.timings.summary()
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze many URLs without the GUI and write one JSON result per line.")
+    parser.add_argument('input', nargs='?', default='-', help="file with one URL per line, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file, or - for stdout")
+    parser.add_argument('-w', '--workers', type=int, default=16, help="analyses running at the same time")
+    parser.add_argument('--per-host', type=int, default=2, help="analyses running at the same time against one host")
+    parser.add_argument('--budget', type=float, default=ANALYSIS_BUDGET, help="seconds allowed for each analysis")
+    parser.add_argument('--head-only', action='store_true', help="stop reading each page after </head> (title, meta and favicon only)")
+    parser.add_argument('--top-terms', type=int, default=0, help="also report the N most frequent words of each page")
+    parser.add_argument('--scan-sitemaps', action='store_true', help="count the pages listed in each site's sitemaps instead of only checking one exists")
+    parser.add_argument('--audit-assets', action='store_true', help="also check the size and speed of every image, script, stylesheet and font on each page")
+    parser.add_argument('--no-remote-geo', action='store_true', help="only use the local GeoIP database, never ip-api.com")
+    parser.add_argument('--no-http-cache', action='store_true', help="always download pages instead of reusing cached copies")
+    parser.add_argument('--history', action='store_true', help="also save every result to the history the apps show")
+    parser.add_argument('--timings', help="write per-phase timing statistics (mean, p50, p95, max) of the run to this JSON file")
+    parser.add_argument('--profile', help="profile every stage and write one merged <stage>.prof per stage to this directory (runs one analysis at a time)")
+    parser.add_argument('--service', nargs='?', const=service.SERVICE_ADDRESS or service.DEFAULT_ADDRESS, help="send every URL to the analysis service (at host:port, or URL_ANALYZER_SERVICE, or the default address) so its cache and other clients share the work")
+    parser.add_argument('--resume', action='store_true', help="skip URLs already present in the output file and append to it")
+    args = parser.parse_args(argv)
+
+    if args.resume and args.output == '-':
+        parser.error("--resume needs an output file")
+    if args.service and args.profile:
+        parser.error("--profile needs the analyses to run here, not with --service")
+    if args.profile and args.workers != 1:
+        # Profiled stages take turns across the whole process (see profiling._profiling); with more
+        # workers the analyses would spend their budgets waiting and the profiles would show timeouts.
+        print(f"--profile runs one analysis at a time (instead of --workers {args.workers})", file=sys.stderr)
+        args.workers = 1
+    if args.no_remote_geo:
+        geoip.REMOTE_FALLBACK = False
+    if args.no_http_cache:
+        http_client.CACHE_ENABLED = False
+
+    done = completed_urls(args.output) if args.resume else set()
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output == '-' else open(args.output, 'a' if args.resume else 'w', encoding='utf-8')
+    if args.resume and output.tell():
+        with open(args.output, 'rb') as previous:
+            previous.seek(-1, os.SEEK_END)
+            if previous.read(1) != b'\n':
+                output.write('\n')
+    profiler = StageProfiler() if args.profile else None
+    try:
+        runner = BulkRunner(output, workers=args.workers, per_host=args.per_host, budget=args.budget, head_only=args.head_only, top_terms=args.top_terms, scan_sitemaps=args.scan_sitemaps, keep_history=args.history, profiler=profiler, audit_assets=args.audit_assets, service_address=args.service)
+        summary = runner.run(read_urls(source, done))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    print(
+        f"Analyzed {summary['analyzed']} URLs ({summary['failed']} failed, {summary['partial']} with stages timed out, {len(done)} already done) in {summary['elapsed']:.1f} s: "
+        f"{summary['throughput']:.2f} URLs/s, p50 {summary['p50']:.3f} s, p95 {summary['p95']:.3f} s",
+        file=sys.stderr
+    )
+    slowest = slowest_phase(summary['timings'])
+    if slowest:
+        print(f"Slowest stage on average: {slowest} ({summary['timings'][slowest]['mean'] * 1000:.0f} ms)", file=sys.stderr)
+    if args.timings:
+        with open(args.timings, 'w', encoding='utf-8') as timings_file:
+            json.dump(summary['timings'], timings_file, indent=2)
+    if profiler is not None:
+        profiler.dump(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import argparse
+import heapq
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import requests
+import http_client
+import probes
+import sitemaps
+from domains import registrable_domain
+from engine import normalize_url as with_scheme
+from links import normalize_url
+
+# robots.txt rules are matched against the User-Agent the requests actually carry (RobotFileParser
+# compares its product token, "Mozilla"), not a name the sites never see.
+ROBOTS_AGENT = http_client.HEADERS['User-Agent']
+DEFAULT_DELAY = 0.25
+MAX_PAGES = 100
+MAX_DEPTH = 3
+SLOWEST_PAGES = 10
+BROKEN_SAMPLES = 50
+
+
+class HostRateLimiter:
+    # Spaces out requests to each host by its crawl delay, while different hosts proceed in parallel.
+    def __init__(self):
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host, delay):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class RobotsRules:
+    def __init__(self, scheme):
+        self.scheme = scheme
+        self._parsers = {}
+        self._lock = threading.Lock()
+
+    def parser(self, host):
+        with self._lock:
+            if host in self._parsers:
+                return self._parsers[host]
+        parser = RobotFileParser()
+        # The same capped read as the analysis, so a huge or endless robots.txt cannot exhaust memory.
+        robots = probes.RobotsFile(self.scheme, host).fetch()
+        if robots.status in (401, 403):
+            parser.disallow_all = True
+        elif robots.status is None or robots.status >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(robots.text.splitlines())
+        with self._lock:
+            return self._parsers.setdefault(host, parser)
+
+    def allowed(self, url):
+        return self.parser(urlsplit(url).netloc).can_fetch(ROBOTS_AGENT, url)
+
+    def delay(self, url):
+        return self.parser(urlsplit(url).netloc).crawl_delay(ROBOTS_AGENT)
+
+
+class Crawler:
+    def __init__(self, start_url, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, workers=8,
+                 default_delay=DEFAULT_DELAY, use_sitemap=True, on_page=None):
+        self.start_url = normalize_url(with_scheme(start_url))
+        parts = urlsplit(self.start_url)
+        self.scheme = parts.scheme
+        self.site = registrable_domain(parts.hostname)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.workers = workers
+        self.default_delay = default_delay
+        self.use_sitemap = use_sitemap
+        self.on_page = on_page
+        self.robots = RobotsRules(self.scheme)
+        self.limiter = HostRateLimiter()
+        self.stats = {
+            'pages': 0,
+            'words': 0,
+            'images': 0,
+            'bytes': 0,
+            'broken_count': 0,
+            'broken': [],
+            'blocked_by_robots': 0,
+            'depth_reached': 0
+        }
+        self._slowest = []
+        # Hashes of normalized URLs: enough to dedup a large site without keeping every URL string.
+        self._seen = set()
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def _enqueue(self, url, frontier):
+        key = hash(url)
+        with self._lock:
+            if key in self._seen or self._queued >= self.max_pages:
+                return
+            self._seen.add(key)
+            self._queued += 1
+        frontier.append(url)
+
+    def crawl(self):
+        started = time.monotonic()
+        frontier = []
+        self._enqueue(self.start_url, frontier)
+        if self.use_sitemap:
+            host = urlsplit(self.start_url).netloc
+
+            def seed(url):
+                try:
+                    url = normalize_url(url)
+                except ValueError:
+                    return
+                if registrable_domain(urlsplit(url).hostname or '') == self.site:
+                    self._enqueue(url, frontier)
+
+            # Sitemaps named in robots.txt first; /sitemap.xml only when it names none.
+            urls = self.robots.parser(host).site_maps() or sitemaps.discover(self.scheme, host)
+            sitemaps.scan(urls, on_url=seed, max_urls=self.max_pages)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crawl") as executor:
+            depth = 0
+            while frontier and depth <= self.max_depth:
+                self.stats['depth_reached'] = depth
+                next_frontier = []
+                follow = depth < self.max_depth
+                # Breadth-first: a whole level is fetched before any link it found is followed.
+                for discovered in executor.map(lambda url: self._visit(url, follow), frontier):
+                    for url in discovered:
+                        self._enqueue(url, next_frontier)
+                frontier = next_frontier
+                depth += 1
+
+        self.stats['elapsed'] = time.monotonic() - started
+        self.stats['slowest'] = [{'url': url, 'response_time': seconds} for seconds, url in sorted(self._slowest, reverse=True)]
+        return self.stats
+
+    def _visit(self, url, follow):
+        if not self.robots.allowed(url):
+            with self._lock:
+                self.stats['blocked_by_robots'] += 1
+            return []
+        delay = self.robots.delay(url)
+        self.limiter.wait(urlsplit(url).netloc, delay if delay is not None else self.default_delay)
+
+        discovered = []
+        collect = discovered.append if follow else None
+        try:
+            details = probes.probe_page(url, on_internal_link=collect)
+        except requests.exceptions.HTTPError as e:
+            self._broken(url, e.response.status_code if e.response is not None else str(e))
+            return []
+        except requests.exceptions.RequestException as e:
+            self._broken(url, str(e))
+            return []
+
+        with self._lock:
+            self.stats['pages'] += 1
+            self.stats['words'] += details['word_count']
+            self.stats['images'] += details['image_count']
+            self.stats['bytes'] += details['page_bytes']
+            entry = (details['response_time'], url)
+            if len(self._slowest) < SLOWEST_PAGES:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+        if self.on_page:
+            self.on_page(url, details)
+        return discovered[:self.max_pages]
+
+    def _broken(self, url, reason):
+        with self._lock:
+            self.stats['broken_count'] += 1
+            if len(self.stats['broken']) < BROKEN_SAMPLES:
+                self.stats['broken'].append({'url': url, 'error': reason})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl a website breadth-first and report site-wide statistics.")
+    parser.add_argument('url')
+    parser.add_argument('--max-pages', type=int, default=MAX_PAGES)
+    parser.add_argument('--max-depth', type=int, default=MAX_DEPTH)
+    parser.add_argument('-w', '--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=DEFAULT_DELAY, help="seconds between requests to one host when robots.txt sets no Crawl-delay")
+    parser.add_argument('--no-sitemap', action='store_true', help="do not seed the crawl from the site's sitemaps")
+    parser.add_argument('--pages', help="also write one JSON line per crawled page to this file")
+    args = parser.parse_args(argv)
+
+    pages = open(args.pages, 'w', encoding='utf-8') if args.pages else None
+    write_lock = threading.Lock()
+
+    def write_page(url, details):
+        with write_lock:
+            pages.write(json.dumps({'url': url, 'details': details}, default=str, ensure_ascii=False) + '\n')
+
+    try:
+        crawler = Crawler(args.url, max_pages=args.max_pages, max_depth=args.max_depth, workers=args.workers,
+                          default_delay=args.delay, use_sitemap=not args.no_sitemap,
+                          on_page=write_page if pages else None)
+        stats = crawler.crawl()
+    finally:
+        if pages:
+            pages.close()
+    print(json.dumps(stats, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
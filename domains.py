@@ -0,0 +1,69 @@
+import ipaddress
+from functools import lru_cache
+
+try:
+    import tldextract
+    # suffix_list_urls=() uses the snapshot bundled with tldextract instead of fetching the list.
+    _extract = tldextract.TLDExtract(suffix_list_urls=())
+except ImportError:
+    _extract = None
+
+# Multi-label public suffixes used when tldextract is not installed. Covers the common second-level
+# registries; anything else falls back to the last two labels.
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'ltd.uk', 'plc.uk', 'me.uk', 'net.uk', 'sch.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au', 'asn.au', 'id.au',
+    'co.nz', 'org.nz', 'net.nz', 'govt.nz', 'ac.nz',
+    'co.jp', 'ne.jp', 'or.jp', 'ac.jp', 'go.jp',
+    'co.kr', 'or.kr', 'ac.kr', 'go.kr',
+    'com.br', 'net.br', 'org.br', 'gov.br', 'edu.br',
+    'com.cn', 'net.cn', 'org.cn', 'gov.cn', 'edu.cn',
+    'com.hk', 'org.hk', 'net.hk', 'edu.hk', 'gov.hk',
+    'com.tw', 'org.tw', 'net.tw', 'edu.tw', 'gov.tw',
+    'com.sg', 'org.sg', 'net.sg', 'edu.sg', 'gov.sg',
+    'com.mx', 'org.mx', 'gob.mx', 'edu.mx',
+    'com.ar', 'org.ar', 'gob.ar', 'edu.ar',
+    'co.in', 'net.in', 'org.in', 'gov.in', 'ac.in', 'edu.in',
+    'co.za', 'org.za', 'gov.za', 'ac.za',
+    'com.tr', 'org.tr', 'gov.tr', 'edu.tr',
+    'co.il', 'org.il', 'ac.il', 'gov.il',
+    'com.my', 'org.my', 'gov.my', 'edu.my',
+    'co.id', 'or.id', 'go.id', 'ac.id',
+    'com.ph', 'org.ph', 'gov.ph', 'edu.ph',
+    'com.pl', 'org.pl', 'net.pl',
+    'com.ua', 'org.ua', 'gov.ua',
+    'com.ru', 'org.ru', 'net.ru',
+    'co.th', 'or.th', 'ac.th', 'go.th',
+    'com.vn', 'org.vn', 'gov.vn', 'edu.vn',
+    'com.eg', 'com.sa', 'com.pk', 'com.ng', 'com.co', 'com.pe', 'com.ve', 'com.ec',
+    'github.io', 'gitlab.io', 'herokuapp.com', 'blogspot.com', 'netlify.app', 'vercel.app',
+    'pages.dev', 'workers.dev', 'azurewebsites.net', 'cloudfront.net', 'appspot.com', 'web.app',
+    'firebaseapp.com', 's3.amazonaws.com'
+}
+
+
+@lru_cache(maxsize=4096)
+def registrable_domain(hostname):
+    if not hostname:
+        return hostname
+    hostname = hostname.rstrip('.').lower()
+    try:
+        ipaddress.ip_address(hostname)
+        return hostname
+    except ValueError:
+        pass
+
+    if _extract is not None:
+        parts = _extract(hostname)
+        if parts.domain and parts.suffix:
+            return f"{parts.domain}.{parts.suffix}"
+        return hostname
+
+    labels = hostname.split('.')
+    if len(labels) <= 2:
+        return hostname
+    for size in (3, 2):
+        # Longest matching suffix wins, e.g. s3.amazonaws.com before amazonaws.com.
+        if len(labels) > size and '.'.join(labels[-size:]) in MULTI_LABEL_SUFFIXES:
+            return '.'.join(labels[-size - 1:])
+    return '.'.join(labels[-2:])
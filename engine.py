@@ -0,0 +1,221 @@
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+import requests
+import assets
+import http_cache
+import http_client
+import probes
+from scheduler import ProbeScheduler, ProbeCancelled, ProbeTimeout, ANALYSIS_BUDGET
+
+# Every analysis runs these; 'assets' is added when the page's files are checked too.
+STAGES = ('ip_addresses', 'location', 'page', 'robots_txt', 'sitemap', 'whois')
+FALLBACKS = {
+    'ip_addresses': lambda e: f"Unable to resolve the hostname: {str(e)}",
+    'location': lambda e: f"Unable to determine location: {str(e)}",
+    'robots_txt': lambda e: 'Not found',
+    'sitemap': lambda e: 'Not found',
+    'whois': lambda e: f"Unable to get domain info: {str(e)}",
+    'assets': lambda e: f"Unable to check the page's files: {str(e)}"
+}
+# Seconds each stage may run before the analysis stops waiting for it. Each is a little above the
+# network timeouts inside the stage, so these only catch what those miss.
+STAGE_TIMEOUTS = {
+    'ip_addresses': 6,
+    'location': 8,
+    'page': 20,
+    'robots_txt': 8,
+    'sitemap': 15,
+    'whois': 12,
+    'assets': assets.ASSET_BUDGET + 2
+}
+STAGE_LABELS = {
+    'ip_addresses': "IP addresses",
+    'location': "Server location",
+    'page': "Page",
+    'robots_txt': "Robots.txt",
+    'sitemap': "Sitemap",
+    'whois': "WHOIS",
+    'assets': "Page weight"
+}
+STAGE_TIMINGS = {
+    'ip_addresses': 'dns',
+    'location': 'geo',
+    'page': 'page',
+    'robots_txt': 'robots',
+    'sitemap': 'sitemap',
+    'whois': 'whois',
+    'assets': 'assets'
+}
+# Display order and labels of details['timings']; 'page' is the sum of its phases and not listed.
+TIMING_PHASES = [
+    ('dns', "DNS lookup"),
+    ('connect', "Connecting"),
+    ('tls', "TLS handshake"),
+    ('ttfb', "Waiting for the first byte"),
+    ('download', "Downloading"),
+    ('load', "Page load in the browser"),
+    ('parse', "Reading the HTML"),
+    ('links', "Sorting out links"),
+    ('ssl', "Certificate check"),
+    ('robots', "Robots.txt"),
+    ('sitemap', "Sitemap"),
+    ('whois', "WHOIS"),
+    ('geo', "Server location"),
+    ('assets', "Checking the page's files"),
+    ('total', "Total")
+]
+
+
+def normalize_url(url):
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
+class Analysis:
+    def __init__(self, url, budget=ANALYSIS_BUDGET, head_only=False, top_terms=0, scan_sitemaps=True, profiler=None, html=None, navigation=None, audit_assets=False):
+        self.url = normalize_url(url)
+        self.parsed_url = urlparse(self.url)
+        self.budget = budget
+        self.head_only = head_only
+        self.top_terms = top_terms
+        self.scan_sitemaps = scan_sitemaps
+        self.profiler = profiler
+        self.audit_assets = audit_assets
+        # HTML (and Navigation Timing entry) of a page a browser already loaded, analyzed instead of
+        # downloading the page again.
+        self.html = html
+        self.navigation = navigation
+        self.result = {
+            'url': self.url,
+            'timestamp': datetime.now().isoformat(),
+            'details': {
+                'scheme': self.parsed_url.scheme,
+                'hostname': self.parsed_url.hostname
+            }
+        }
+        # The certificate comes with the 'page' stage, read off the connection that served the page.
+        self.stages = list(STAGES)
+        if audit_assets:
+            self.stages.append('assets')
+        self._lock = threading.Lock()
+        self._closed = False
+        self._on_update = None
+        self._scheduler = None
+        # Set on cancel and once the analysis stops waiting, so downloads still running give up.
+        self._stop = threading.Event()
+        self.cancelled = False
+
+    def cancel(self):
+        # Safe from any thread. run() then returns at once with whatever finished; the rest is
+        # listed in details['unfinished'].
+        with self._lock:
+            self.cancelled = True
+            self._stop.set()
+            scheduler = self._scheduler
+        if scheduler is not None:
+            scheduler.cancel()
+
+    def run(self, on_update=None):
+        # on_update(stage, updates) is called from probe threads as each stage lands.
+        self._on_update = on_update
+        hostname = self.parsed_url.hostname
+        scheme = self.parsed_url.scheme
+        scheduler = ProbeScheduler(self.budget, on_done=self._stage_done, profiler=self.profiler, timeouts=STAGE_TIMEOUTS)
+        with self._lock:
+            self._scheduler = scheduler
+            if self.cancelled:
+                scheduler.cancel()
+        cache_stats = http_cache.new_stats()
+        stats_token = http_cache.current_stats.set(cache_stats)
+        try:
+            # Every other stage resolves through the same cache, so the name is looked up once.
+            scheduler.submit('ip_addresses', probes.probe_dns, hostname)
+            scheduler.submit('location', probes.probe_location, hostname)
+            scheduler.submit('page', self._probe_page, scheduler)
+            robots = probes.RobotsFile(scheme, self.parsed_url.netloc)
+            scheduler.submit('robots_txt', probes.probe_robots, robots)
+            scheduler.submit('sitemap', probes.probe_sitemap, robots, scan=self.scan_sitemaps, stop=self._stop)
+            scheduler.submit('whois', probes.probe_whois, hostname)
+            scheduler.join(required=('page',))
+            self._stop.set()
+
+            try:
+                scheduler.result('page')
+            except (ProbeTimeout, ProbeCancelled):
+                # Not a failure: everything that did finish is still worth showing.
+                pass
+            for name in self.stages:
+                if name in scheduler.unfinished and name in FALLBACKS:
+                    self._merge(name, {name: f"Not checked ({scheduler.unfinished[name]})"})
+                elif name == 'assets' and not scheduler.submitted(name):
+                    # The page never finished, so there was no list of files to check.
+                    continue
+                elif name in FALLBACKS and name not in self.result['details']:
+                    self._merge(name, {name: scheduler.result_or(name, FALLBACKS[name])})
+            if scheduler.unfinished:
+                self._merge('unfinished', {'unfinished': dict(scheduler.unfinished)})
+            if http_client.CACHE_ENABLED:
+                self._merge('http_cache', {'http_cache': dict(cache_stats)})
+            # Stages run side by side, so their times add up to more than the total.
+            timings = dict(self.result['details'].get('timings') or {})
+            for name, seconds in list(scheduler.durations.items()):
+                timings[STAGE_TIMINGS[name]] = seconds
+            timings['total'] = scheduler.elapsed()
+            self._merge('timings', {'timings': timings})
+            if self.profiler is not None:
+                self._merge('profile', {'profile': dict(scheduler.profiles)})
+            return self.result
+        finally:
+            http_cache.current_stats.reset(stats_token)
+            with self._lock:
+                self._closed = True
+
+    def _probe_page(self, scheduler):
+        if self.html is None:
+            details = probes.probe_page(self.url, head_only=self.head_only, top_terms=self.top_terms, stop=self._stop, collect_assets=self.audit_assets)
+        else:
+            details = probes.probe_loaded_page(self.url, self.html, self.navigation, top_terms=self.top_terms, collect_assets=self.audit_assets)
+        found = details.pop('assets', None)
+        if found is not None:
+            # Submitted before the page stage returns, so join() waits for it too.
+            scheduler.submit('assets', assets.audit, found, stop=self._stop)
+        return details
+
+    def _stage_done(self, name, future):
+        if future.cancelled():
+            return
+        try:
+            value = future.result()
+        except Exception as e:
+            if name == 'page':
+                return
+            value = FALLBACKS[name](e)
+        self._merge(name, value if name == 'page' else {name: value})
+
+    def _merge(self, name, updates):
+        with self._lock:
+            if self._closed:
+                return
+            details = self.result['details']
+            details.update(updates)
+            whois_details = details.get('whois')
+            if details.get('creator') == 'Unknown' and isinstance(whois_details, dict) and whois_details['organization'] != 'N/A':
+                details['creator'] = whois_details['organization']
+                updates = dict(updates, creator=details['creator'])
+        if self._on_update:
+            self._on_update(name, updates)
+
+
+def describe_error(error):
+    if isinstance(error, requests.exceptions.RequestException):
+        return "E002", f"Couldn’t connect to the website: {str(error)}. Check the URL or your internet connection."
+    if isinstance(error, ProbeTimeout):
+        return "E004", f"The website took too long to answer: {str(error)}. Try again later."
+    return "E003", f"Something went wrong: {str(error)}. Try again or check the URL."
+
+
+def analyze(url, budget=ANALYSIS_BUDGET, on_update=None, head_only=False, top_terms=0, scan_sitemaps=True, profiler=None, audit_assets=False):
+    return Analysis(url, budget, head_only=head_only, top_terms=top_terms, scan_sitemaps=scan_sitemaps, profiler=profiler, audit_assets=audit_assets).run(on_update=on_update)
@@ -0,0 +1,155 @@
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from links import LinkIndex, normalize_url
+from textstats import TextStats
+
+AUTHOR = re.compile(r'author', re.I)
+SITE_NAME = re.compile(r'og:site_name', re.I)
+DESCRIPTION = re.compile(r'description', re.I)
+ICON = re.compile(r'icon', re.I)
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+HEAD_TAGS = {'html', 'head', 'title', 'meta', 'link', 'base', 'script', 'style', 'noscript', 'template'}
+STYLESHEET = re.compile(r'\bstylesheet\b', re.I)
+PRELOAD = re.compile(r'\b(preload|prefetch)\b', re.I)
+PRELOAD_KINDS = {'font': 'font', 'style': 'stylesheet', 'script': 'script', 'image': 'image'}
+FONT_FACE_URL = re.compile(r'@font-face\s*{[^}]*?url\(\s*[\'"]?([^\'")]+)', re.I)
+MAX_ASSETS = 1000
+
+
+class PageExtractor(HTMLParser):
+    # Collects everything the Overview and Links tabs need from parser events as the HTML is fed,
+    # without building a document tree.
+    def __init__(self, url, top_terms=0, on_internal_link=None, collect_assets=False):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.title = None
+        self.author = None
+        self.site_name = None
+        self.description = None
+        self.favicon = None
+        self.links = LinkIndex(url, on_internal=on_internal_link)
+        # Time spent resolving and classifying links, so it can be told apart from parsing.
+        self.link_seconds = 0.0
+        self.image_count = 0
+        self.text_stats = TextStats(top_terms)
+        self.head_done = False
+        # Images, scripts, stylesheets and fonts the page loads, in page order, for the asset audit.
+        self.assets = {} if collect_assets else None
+        self._in_style = False
+        self._in_title = False
+        self._title_parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in HEAD_TAGS:
+            self.head_done = True
+        if tag in NON_TEXT_TAGS:
+            self._skip_depth += 1
+            if self.assets is not None:
+                if tag == 'script':
+                    self.add_asset(dict(attrs).get('src'), 'script')
+                elif tag == 'style':
+                    self._in_style = True
+            return
+        if tag == 'title' and self.title is None and not self._in_title:
+            self._in_title = True
+            return
+        attrs = dict(attrs)
+        if tag == 'a':
+            if attrs.get('href') is not None:
+                started = time.perf_counter()
+                self.links.add(attrs['href'])
+                self.link_seconds += time.perf_counter() - started
+        elif tag == 'base':
+            self.links.set_base(attrs.get('href'))
+        elif tag == 'img':
+            if attrs.get('src'):
+                self.image_count += 1
+                self.add_asset(attrs['src'], 'image')
+        elif tag == 'meta':
+            # Like BeautifulSoup's find(), only the first matching tag counts, even if it has no content.
+            if self.author is None and AUTHOR.search(attrs.get('name') or ''):
+                self.author = attrs.get('content') or ''
+            if self.site_name is None and SITE_NAME.search(attrs.get('property') or ''):
+                self.site_name = attrs.get('content') or ''
+            if self.description is None and DESCRIPTION.search(attrs.get('name') or ''):
+                self.description = attrs.get('content') or ''
+        elif tag == 'link':
+            rel = attrs.get('rel') or ''
+            if self.favicon is None and ICON.search(rel):
+                self.favicon = attrs.get('href') or ''
+            if self.assets is not None:
+                if STYLESHEET.search(rel):
+                    self.add_asset(attrs.get('href'), 'stylesheet')
+                elif ICON.search(rel):
+                    self.add_asset(attrs.get('href'), 'image')
+                elif PRELOAD.search(rel) and (attrs.get('as') or '').lower() in PRELOAD_KINDS:
+                    self.add_asset(attrs.get('href'), PRELOAD_KINDS[attrs['as'].lower()])
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in NON_TEXT_TAGS and tag != 'title':
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.head_done = True
+        if tag in NON_TEXT_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            if tag == 'style':
+                self._in_style = False
+        elif tag == 'title' and self._in_title:
+            self._in_title = False
+            self.title = ''.join(self._title_parts)
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            if self._in_style and self.assets is not None:
+                for url in FONT_FACE_URL.findall(data):
+                    self.add_asset(url, 'font')
+            return
+        if self._in_title:
+            self._title_parts.append(data)
+        self.text_stats.feed(data)
+
+    def add_asset(self, url, kind):
+        if self.assets is None or not url or len(self.assets) >= MAX_ASSETS:
+            return
+        url = url.strip()
+        if url.startswith('data:'):
+            return
+        try:
+            url = normalize_url(urljoin(self.links.base_url, url))
+        except ValueError:
+            return
+        if url.startswith(('http://', 'https://')):
+            self.assets.setdefault(url, kind)
+
+    def close(self):
+        super().close()
+        self.text_stats.close()
+
+    def details(self, head_only=False):
+        title = self.title if self.title is not None else ''.join(self._title_parts) if self._in_title else None
+        creator = self.author or self.site_name or 'Unknown'
+        details = {
+            'title': title.strip() if title and title.strip() else 'No title found',
+            'creator': creator,
+            'meta_description': self.description or 'No description found',
+            'favicon': self.favicon or 'No favicon found'
+        }
+        if not head_only:
+            details['links'] = self.links.summary()
+            details['image_count'] = self.image_count
+            details['word_count'] = self.text_stats.word_count
+            if self.text_stats.top_terms:
+                details['top_terms'] = self.text_stats.terms()
+        return details
+
+
+def extract(url, html, top_terms=0):
+    extractor = PageExtractor(url, top_terms)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.details()
@@ -0,0 +1,255 @@
+import argparse
+import csv
+import ipaddress
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from settings import DATA_DIR
+
+GEOIP_MMDB_PATH = os.path.join(DATA_DIR, 'geoip.mmdb')
+GEOIP_CSV_PATH = os.path.join(DATA_DIR, 'geoip.csv')
+REMOTE_FALLBACK = True
+REMOTE_URL = os.environ.get('URL_ANALYZER_GEO_API', 'http://ip-api.com/json/{ip}')
+
+MAGIC = b'UAGEO\x01'
+HEADER = struct.Struct('<6s2sIIII')
+BYTE_ORDER = b'LE' if sys.byteorder == 'little' else b'BE'
+SEPARATOR = '\x1f'
+
+COLUMN_NAMES = {
+    'start': ('start', 'ip_start', 'range_start', 'start_ip', 'first'),
+    'end': ('end', 'ip_end', 'range_end', 'end_ip', 'last'),
+    'country': ('country', 'country_name'),
+    'city': ('city', 'city_name'),
+    'isp': ('isp', 'org', 'organization', 'as_org', 'asn_org', 'as_name')
+}
+
+
+def _parse_ip(value):
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return ipaddress.IPv4Address(number) if number <= 0xFFFFFFFF else ipaddress.IPv6Address(number)
+    return ipaddress.ip_address(value)
+
+
+def _columns(header):
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for field, aliases in COLUMN_NAMES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    if 'start' not in columns or 'end' not in columns:
+        raise ValueError("GeoIP CSV header needs start and end columns")
+    return columns
+
+
+def build_index(csv_path, index_path):
+    # Compiles start,end,country,city,isp rows (header optional, IPs as text or integers) into the
+    # flat sorted arrays GeoIPIndex memory-maps.
+    records = {}
+    ranges_v4 = []
+    ranges_v6 = []
+    columns = {'start': 0, 'end': 1, 'country': 2, 'city': 3, 'isp': 4}
+    first_row = True
+    with open(csv_path, newline='', encoding='utf-8') as source:
+        for row_number, row in enumerate(csv.reader(source), 1):
+            if not row or row[0].startswith('#'):
+                continue
+            try:
+                start, end = _parse_ip(row[columns['start']]), _parse_ip(row[columns['end']])
+            except (ValueError, IndexError):
+                if first_row:
+                    columns = _columns(row)
+                    first_row = False
+                    continue
+                raise ValueError(f"Bad IP range on line {row_number} of {csv_path}")
+            first_row = False
+            fields = []
+            for field in ('city', 'country', 'isp'):
+                index = columns.get(field)
+                fields.append(row[index].strip() if index is not None and index < len(row) and row[index].strip() else 'N/A')
+            record_id = records.setdefault(SEPARATOR.join(fields), len(records))
+            if start.version == 4 and end.version == 4:
+                ranges_v4.append((int(start), int(end), record_id))
+            else:
+                if start.version == 4:
+                    start = ipaddress.IPv6Address('::ffff:' + str(start))
+                if end.version == 4:
+                    end = ipaddress.IPv6Address('::ffff:' + str(end))
+                ranges_v6.append((start.packed, end.packed, record_id))
+    ranges_v4.sort()
+    ranges_v6.sort()
+
+    blob = bytearray()
+    offsets = array('I', [0])
+    for text in sorted(records, key=records.get):
+        blob += text.encode('utf-8')
+        offsets.append(len(blob))
+    blob += b'\0' * (-len(blob) % 4)
+
+    temporary_path = index_path + '.tmp'
+    with open(temporary_path, 'wb') as index:
+        index.write(HEADER.pack(MAGIC, BYTE_ORDER, len(ranges_v4), len(ranges_v6), len(records), len(blob)))
+        index.write(array('I', (r[0] for r in ranges_v4)).tobytes())
+        index.write(array('I', (r[1] for r in ranges_v4)).tobytes())
+        index.write(array('I', (r[2] for r in ranges_v4)).tobytes())
+        index.write(b''.join(r[0] for r in ranges_v6))
+        index.write(b''.join(r[1] for r in ranges_v6))
+        index.write(array('I', (r[2] for r in ranges_v6)).tobytes())
+        index.write(offsets.tobytes())
+        index.write(bytes(blob))
+    os.replace(temporary_path, index_path)
+
+
+class _PackedKeys:
+    # Exposes a run of fixed-width big-endian keys as a sequence so bisect can search it in place.
+    def __init__(self, buffer, offset, count, width):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.width = width
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        start = self.offset + index * self.width
+        return self.buffer[start:start + self.width]
+
+
+class GeoIPIndex:
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byte_order, v4_count, v6_count, record_count, blob_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or byte_order != BYTE_ORDER:
+            self.close()
+            raise ValueError(f"{path} is not a GeoIP index built on this machine; rebuild it from the CSV")
+        view = memoryview(self._map)
+        offset = HEADER.size
+        self._v4_starts = view[offset:offset + 4 * v4_count].cast('I')
+        offset += 4 * v4_count
+        self._v4_ends = view[offset:offset + 4 * v4_count].cast('I')
+        offset += 4 * v4_count
+        self._v4_records = view[offset:offset + 4 * v4_count].cast('I')
+        offset += 4 * v4_count
+        self._v6_starts = _PackedKeys(self._map, offset, v6_count, 16)
+        offset += 16 * v6_count
+        self._v6_ends = _PackedKeys(self._map, offset, v6_count, 16)
+        offset += 16 * v6_count
+        self._v6_records = view[offset:offset + 4 * v6_count].cast('I')
+        offset += 4 * v6_count
+        self._offsets = view[offset:offset + 4 * (record_count + 1)].cast('I')
+        offset += 4 * (record_count + 1)
+        self._blob_offset = offset
+
+    def lookup(self, ip):
+        address = ipaddress.ip_address(ip)
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if address.version == 4:
+            key = int(address)
+            i = bisect_right(self._v4_starts, key) - 1
+            if i < 0 or key > self._v4_ends[i]:
+                return None
+            record_id = self._v4_records[i]
+        else:
+            key = address.packed
+            i = bisect_right(self._v6_starts, key) - 1
+            if i < 0 or key > self._v6_ends[i]:
+                return None
+            record_id = self._v6_records[i]
+        start = self._blob_offset + self._offsets[record_id]
+        end = self._blob_offset + self._offsets[record_id + 1]
+        city, country, isp = self._map[start:end].decode('utf-8').split(SEPARATOR)
+        return {'city': city, 'country': country, 'isp': isp}
+
+    def close(self):
+        for name in ('_v4_starts', '_v4_ends', '_v4_records', '_v6_records', '_offsets'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._map.close()
+        self._file.close()
+
+
+class MaxMindIndex:
+    def __init__(self, path):
+        import maxminddb
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def lookup(self, ip):
+        record = self._reader.get(ip)
+        if not record:
+            return None
+        city = record.get('city', {}).get('names', {}).get('en', 'N/A')
+        country = record.get('country', {}).get('names', {}).get('en', 'N/A')
+        isp = record.get('isp') or record.get('organization') or record.get('autonomous_system_organization') or 'N/A'
+        return {'city': city, 'country': country, 'isp': isp}
+
+    def close(self):
+        self._reader.close()
+
+
+def open_index(mmdb_path=GEOIP_MMDB_PATH, csv_path=GEOIP_CSV_PATH):
+    if os.path.exists(mmdb_path):
+        try:
+            return MaxMindIndex(mmdb_path)
+        except ImportError:
+            pass
+    if os.path.exists(csv_path):
+        index_path = csv_path + '.idx'
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(csv_path):
+            build_index(csv_path, index_path)
+        return GeoIPIndex(index_path)
+    return None
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def shared_index():
+    global _index, _index_loaded
+    with _index_lock:
+        if not _index_loaded:
+            _index_loaded = True
+            try:
+                _index = open_index()
+            except (OSError, ValueError):
+                _index = None
+        return _index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the offline GeoIP index.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="compile a start,end,country,city,isp CSV into an index")
+    build.add_argument('csv')
+    build.add_argument('index', nargs='?')
+    lookup = commands.add_parser('lookup', help="look addresses up in the installed database")
+    lookup.add_argument('ips', nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_index(args.csv, args.index or args.csv + '.idx')
+        return 0
+    index = shared_index()
+    if index is None:
+        print(f"No GeoIP database found at {GEOIP_MMDB_PATH} or {GEOIP_CSV_PATH}", file=sys.stderr)
+        return 1
+    for ip in args.ips:
+        print(ip, index.lookup(ip) or 'not found')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
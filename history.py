@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+from settings import DATA_DIR
+
+HISTORY_PATH = os.path.join(DATA_DIR, 'history.sqlite3')
+RECENT_LIMIT = 100
+DIFF_FIELDS = (
+    ('title', "Title"),
+    ('http_status', "Status Code"),
+    ('ssl_expires', "Certificate Valid Until"),
+    ('internal_links', "Internal Links"),
+    ('external_links', "External Links")
+)
+
+
+def snapshot_fields(result):
+    # The handful of values kept in their own columns, so listing and diffing never unpack a result.
+    details = result['details']
+    ssl_info = details.get('ssl_info')
+    links = details.get('links') or {}
+    return {
+        'title': details.get('title'),
+        'http_status': details.get('http_status'),
+        'ssl_expires': ssl_info.get('notAfter') if isinstance(ssl_info, dict) else None,
+        'internal_links': links.get('internal_count'),
+        'external_links': links.get('external_count')
+    }
+
+
+def diff(old, new):
+    # Takes two summaries (or snapshot_fields of two results); returns (label, before, after) per change.
+    # A status the browser did not report (a page read from the browser) is unknown, not a change.
+    return [
+        (label, old[field], new[field]) for field, label in DIFF_FIELDS
+        if old[field] != new[field] and not (field == 'http_status' and None in (old[field], new[field]))
+    ]
+
+
+class HistoryStore:
+    def __init__(self, path=HISTORY_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "id INTEGER PRIMARY KEY, hostname TEXT NOT NULL, url TEXT NOT NULL, timestamp TEXT NOT NULL, "
+            "title TEXT, http_status INTEGER, ssl_expires TEXT, internal_links INTEGER, external_links INTEGER, "
+            "result BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS analyses_host ON analyses (hostname, timestamp)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS analyses_time ON analyses (timestamp)")
+        self._db.commit()
+
+    def save(self, result):
+        fields = snapshot_fields(result)
+        blob = zlib.compress(json.dumps(result, default=str, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO analyses (hostname, url, timestamp, title, http_status, ssl_expires, internal_links, external_links, result) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (result['details']['hostname'] or '', result['url'], result['timestamp'], fields['title'], fields['http_status'],
+                 fields['ssl_expires'], fields['internal_links'], fields['external_links'], blob)
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def _summaries(self, where, args, limit):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, hostname, url, timestamp, title, http_status, ssl_expires, internal_links, external_links "
+                f"FROM analyses {where} ORDER BY timestamp DESC, id DESC LIMIT ?", (*args, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, limit=RECENT_LIMIT):
+        return self._summaries("", (), limit)
+
+    def for_host(self, hostname, limit=RECENT_LIMIT):
+        return self._summaries("WHERE hostname = ?", (hostname,), limit)
+
+    def summary(self, analysis_id):
+        rows = self._summaries("WHERE id = ?", (analysis_id,), 1)
+        if not rows:
+            raise KeyError(analysis_id)
+        return rows[0]
+
+    def previous(self, summary):
+        # The snapshot of the same host taken just before this one, if any.
+        rows = self._summaries(
+            "WHERE hostname = ? AND (timestamp < ? OR (timestamp = ? AND id < ?))",
+            (summary['hostname'], summary['timestamp'], summary['timestamp'], summary['id']), 1
+        )
+        return rows[0] if rows else None
+
+    def load(self, analysis_id):
+        with self._lock:
+            row = self._db.execute("SELECT result FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+        if row is None:
+            raise KeyError(analysis_id)
+        return json.loads(zlib.decompress(row['result']))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def shared_store():
+    # None when the history file cannot be opened; callers then simply do not keep history.
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = HistoryStore()
+            except (OSError, sqlite3.Error):
+                _store = False
+        return _store or None
+
+
+def remember(result):
+    # Keeping history is best effort: a full disk must not turn a finished analysis into a failure.
+    store = shared_store()
+    if store is None:
+        return None
+    try:
+        return store.save(result)
+    except sqlite3.Error:
+        return None
+
+
+def describe(summary):
+    return f"#{summary['id']}  {summary['timestamp'][:19].replace('T', ' ')}  {summary['url']}  ({summary['title'] or 'no title'})"
+
+
+def by_age(first, second):
+    # The older and the newer of two summaries, in that order.
+    return sorted((first, second), key=lambda summary: (summary['timestamp'], summary['id']))
+
+
+def describe_changes(store, summary, previous=None):
+    # Without a snapshot to compare with, the one of the same host taken just before is used.
+    if previous is None:
+        previous = store.previous(summary)
+        if previous is None:
+            return f"No earlier analysis of {summary['hostname']} to compare with.\n"
+        text = f"Changes since {previous['timestamp'][:19].replace('T', ' ')}:\n"
+    else:
+        text = f"Changes since #{previous['id']} {previous['url']} ({previous['timestamp'][:19].replace('T', ' ')}):\n"
+    changes = diff(previous, summary)
+    if not changes:
+        return text + "Nothing changed.\n"
+    for label, before, after in changes:
+        text += f" - {label}: {before} -> {after}\n"
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Browse and compare saved analyses.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    list_command = commands.add_parser('list', help="show recent analyses, optionally of one host")
+    list_command.add_argument('hostname', nargs='?')
+    list_command.add_argument('-n', '--limit', type=int, default=20)
+    show_command = commands.add_parser('show', help="print a saved analysis as JSON")
+    show_command.add_argument('id', type=int)
+    diff_command = commands.add_parser('diff', help="compare an analysis with the previous one of the same host, or with another saved analysis")
+    diff_command.add_argument('id', type=int)
+    diff_command.add_argument('other', type=int, nargs='?')
+    args = parser.parse_args(argv)
+
+    store = HistoryStore()
+    try:
+        if args.command == 'list':
+            summaries = store.for_host(args.hostname, args.limit) if args.hostname else store.recent(args.limit)
+            for summary in summaries:
+                print(describe(summary))
+        elif args.command == 'show':
+            print(json.dumps(store.load(args.id), indent=2, ensure_ascii=False))
+        elif args.other is not None:
+            older, newer = by_age(store.summary(args.id), store.summary(args.other))
+            print(describe_changes(store, newer, older), end='')
+        else:
+            print(describe_changes(store, store.summary(args.id)), end='')
+    except KeyError as e:
+        parser.error(f"no saved analysis #{e.args[0]}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import contextvars
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+from settings import DATA_DIR
+
+HTTP_CACHE_PATH = os.path.join(DATA_DIR, 'http.sqlite3')
+HTTP_CACHE_BYTES = 256 * 1024 * 1024
+MAX_ENTRY_BYTES = 10 * 1024 * 1024
+# RFC 9111 heuristic freshness: a tenth of the time since Last-Modified, capped at a day.
+HEURISTIC_FRACTION = 0.1
+MAX_HEURISTIC_LIFETIME = 24 * 60 * 60
+CACHEABLE_STATUSES = (200, 203, 300, 301, 308, 404, 410)
+HOP_BY_HOP_HEADERS = ('connection', 'keep-alive', 'transfer-encoding', 'proxy-connection', 'trailer', 'upgrade')
+CONDITIONAL_HEADERS = ('range', 'if-none-match', 'if-modified-since', 'if-match', 'if-unmodified-since', 'authorization')
+
+# Per-analysis hit/miss counters; set by the caller and copied into each probe thread's context.
+current_stats = contextvars.ContextVar('http_cache_stats', default=None)
+_stats_lock = threading.Lock()
+
+
+def new_stats():
+    return {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+
+def record(outcome):
+    stats = current_stats.get()
+    if stats is not None:
+        with _stats_lock:
+            stats[outcome] += 1
+
+
+def cache_directives(headers):
+    directives = {}
+    for part in headers.get('cache-control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def freshness_lifetime(headers, directives, now):
+    if 'no-cache' in directives:
+        return 0
+    if 'max-age' in directives:
+        try:
+            return max(0, int(directives['max-age']))
+        except ValueError:
+            return 0
+    date = _http_date(headers.get('date')) or now
+    if 'expires' in headers:
+        expires = _http_date(headers['expires'])
+        return max(0, expires - date) if expires else 0
+    last_modified = _http_date(headers.get('last-modified'))
+    if last_modified and last_modified < date:
+        return min((date - last_modified) * HEURISTIC_FRACTION, MAX_HEURISTIC_LIFETIME)
+    return 0
+
+
+def fresh_until(headers, now):
+    directives = cache_directives(headers)
+    try:
+        age = max(0, int(headers.get('age', 0)))
+    except ValueError:
+        age = 0
+    return now + freshness_lifetime(headers, directives, now) - age
+
+
+def cacheable_request(request):
+    return request.method == 'GET' and not any(name in request.headers for name in CONDITIONAL_HEADERS)
+
+
+def storable(status, headers):
+    directives = cache_directives(headers)
+    if status not in CACHEABLE_STATUSES or 'no-store' in directives or headers.get('vary', '').strip() == '*':
+        return False
+    try:
+        if int(headers.get('content-length', 0)) > MAX_ENTRY_BYTES:
+            return False
+    except ValueError:
+        return False
+    # Without a lifetime or a validator the entry could never be used.
+    return 'etag' in headers or 'last-modified' in headers or freshness_lifetime(headers, directives, time.time()) > 0
+
+
+def _vary_key(vary, request_headers):
+    names = sorted({name.strip().lower() for name in vary.split(',') if name.strip()})
+    return json.dumps([[name, request_headers.get(name, '')] for name in names])
+
+
+def _as_tuples(value):
+    # getpeercert() returns nested tuples; JSON gives them back as lists.
+    if isinstance(value, dict):
+        return {key: _as_tuples(item) for key, item in value.items()}
+    return tuple(_as_tuples(item) for item in value) if isinstance(value, list) else value
+
+
+class CachedConnection:
+    # Stands in for the connection of a response replayed from the cache.
+    def __init__(self, peer_cert):
+        self.peer_cert = peer_cert
+
+    def close(self):
+        pass
+
+
+class TeeReader:
+    # Wraps the socket file of a live response and copies what the caller reads. The copy is only
+    # handed to on_complete if the body was read to the end; a caller that stops early (a page
+    # over the size cap, a head-only analysis) leaves nothing half-written in the cache.
+    def __init__(self, fp, on_complete, limit=MAX_ENTRY_BYTES):
+        self._fp = fp
+        self._on_complete = on_complete
+        self._limit = limit
+        self._buffer = bytearray()
+
+    def _tee(self, data):
+        if self._buffer is not None:
+            self._buffer += data
+            if len(self._buffer) > self._limit:
+                self._buffer = None
+            elif not data or self._fp.isclosed():
+                self._store()
+        return data
+
+    def _store(self):
+        body, self._buffer = bytes(self._buffer), None
+        try:
+            self._on_complete(body)
+        except sqlite3.Error:
+            # Losing a cache write must not fail the download that fed it.
+            pass
+
+    def read(self, amt=None):
+        return self._tee(self._fp.read() if amt is None else self._fp.read(amt))
+
+    def read1(self, amt=-1):
+        return self._tee(self._fp.read1(amt))
+
+    def isclosed(self):
+        return self._fp.isclosed()
+
+    @property
+    def closed(self):
+        return self._fp.closed
+
+    def close(self):
+        # urllib3 closes the file itself once read1 has returned the last byte of a Content-Length
+        # body, before any empty read; http.client's length is what is left of the body.
+        if self._buffer is not None and getattr(self._fp, 'length', None) == 0:
+            self._store()
+        self._buffer = None
+        self._fp.close()
+
+    def fileno(self):
+        return self._fp.fileno()
+
+    def flush(self):
+        return self._fp.flush()
+
+
+class HttpCache:
+    def __init__(self, path=HTTP_CACHE_PATH, max_bytes=HTTP_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, vary TEXT NOT NULL, status INTEGER NOT NULL, reason TEXT NOT NULL, "
+            "headers TEXT NOT NULL, body BLOB NOT NULL, peer_cert TEXT, fresh_until REAL NOT NULL, "
+            "size INTEGER NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url, request_headers):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT vary, status, reason, headers, body, peer_cert, fresh_until FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            headers = HTTPHeaderDict(json.loads(row[3]))
+            if row[0] != _vary_key(headers.get('vary', ''), request_headers):
+                return None
+            self._db.execute("UPDATE responses SET used = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        return {
+            'url': url,
+            'status': row[1],
+            'reason': row[2],
+            'headers': headers,
+            'body': row[4],
+            'peer_cert': _as_tuples(json.loads(row[5])) if row[5] else None,
+            'fresh_until': row[6]
+        }
+
+    def put(self, url, request_headers, status, reason, headers, body, peer_cert):
+        headers = HTTPHeaderDict((name, value) for name, value in headers.items() if name.lower() not in HOP_BY_HOP_HEADERS)
+        now = time.time()
+        size = len(body) + len(url)
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, vary, status, reason, headers, body, peer_cert, fresh_until, size, used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, _vary_key(headers.get('vary', ''), request_headers), status, reason or '',
+                 json.dumps(list(headers.items())), body, json.dumps(peer_cert) if peer_cert else None,
+                 fresh_until(headers, now), size, now)
+            )
+            self._bytes += size - (previous[0] if previous else 0)
+            if self._bytes > self.max_bytes:
+                self._evict(self.max_bytes * 0.9)
+            self._db.commit()
+
+    def refresh(self, url, entry, not_modified_headers, peer_cert):
+        # A 304 carries the updated caching headers; the stored body is still the current one.
+        headers = entry['headers'].copy()
+        for name, value in not_modified_headers.items():
+            if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != 'content-length':
+                headers[name] = value
+        now = time.time()
+        entry = dict(entry, headers=headers, fresh_until=fresh_until(headers, now), peer_cert=peer_cert or entry['peer_cert'])
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET headers = ?, peer_cert = ?, fresh_until = ?, used = ? WHERE url = ?",
+                (json.dumps(list(headers.items())), json.dumps(entry['peer_cert']) if entry['peer_cert'] else None,
+                 entry['fresh_until'], now, url)
+            )
+            self._db.commit()
+        return entry
+
+    def _evict(self, target):
+        # Least recently used first, in batches, until the cache is back under its budget.
+        while self._bytes > target:
+            rows = self._db.execute("SELECT url, size FROM responses ORDER BY used LIMIT 100").fetchall()
+            if not rows:
+                break
+            self._db.executemany("DELETE FROM responses WHERE url = ?", [(row[0],) for row in rows])
+            self._bytes -= sum(row[1] for row in rows)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def replay(entry):
+    return HTTPResponse(
+        body=io.BytesIO(entry['body']),
+        headers=entry['headers'],
+        status=entry['status'],
+        reason=entry['reason'],
+        preload_content=False,
+        decode_content=True,
+        connection=CachedConnection(entry['peer_cert']),
+        request_url=entry['url']
+    )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def shared_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = HttpCache()
+            except (OSError, sqlite3.Error):
+                _cache = False
+        return _cache or None
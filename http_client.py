@@ -0,0 +1,170 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_ACCEPT_ENCODING
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+import http_cache
+import resolver
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    # gzip and deflate always; br and zstd too when brotli/zstandard are installed.
+    'Accept-Encoding': DEFAULT_ACCEPT_ENCODING,
+    'Connection': 'keep-alive'
+}
+POOL_HOSTS = 64
+POOL_CONNECTIONS_PER_HOST = 8
+MAX_CONNECT_ATTEMPTS = 3
+CACHE_ENABLED = True
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ResolvingConnectionMixin:
+    # Connects to addresses from the shared resolver cache instead of asking the system resolver on
+    # every new connection. TLS still verifies and sends SNI for the original hostname.
+    setup_timings = None
+
+    def _new_conn(self):
+        hostname = self._dns_host
+        started = time.perf_counter()
+        try:
+            addresses = resolver.resolve(hostname)
+        except OSError:
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        error = None
+        try:
+            for address in addresses[:MAX_CONNECT_ATTEMPTS]:
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    self.setup_timings = {'resolve': resolved - started, 'connect': time.perf_counter() - resolved}
+                    return sock
+                except (ConnectTimeoutError, NewConnectionError) as e:
+                    # Refused or unreachable counts like a timeout: the next address may still answer.
+                    # (urllib3 only subclasses one from the other for compatibility, and deprecates it.)
+                    error = e
+        finally:
+            self._dns_host = hostname
+        raise error
+
+
+class ResolvingHTTPConnection(ResolvingConnectionMixin, HTTPConnection):
+    pass
+
+
+class ResolvingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = ResolvingHTTPConnection
+
+
+class CertCapturingHTTPSConnection(ResolvingConnectionMixin, HTTPSConnection):
+    # Keeps the peer certificate on the connection object, so it is still readable after the server
+    # closes the socket and on every request that reuses the connection from the pool.
+    peer_cert = None
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        if self.setup_timings is not None:
+            # Everything connect() did beyond opening the TCP socket is the TLS handshake.
+            self.setup_timings['tls'] = max(0.0, time.perf_counter() - started - sum(self.setup_timings.values()))
+        try:
+            self.peer_cert = self.sock.getpeercert() or None
+        except Exception:
+            self.peer_cert = None
+
+
+class CertCapturingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CertCapturingHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': ResolvingHTTPConnectionPool, 'https': CertCapturingHTTPSConnectionPool}
+
+    def send(self, request, **kwargs):
+        cache = http_cache.shared_cache() if CACHE_ENABLED else None
+        if cache is None or not http_cache.cacheable_request(request):
+            return super().send(request, **kwargs)
+        entry = cache.get(request.url, request.headers)
+        if entry is not None and entry['fresh_until'] > time.time():
+            http_cache.record('hits')
+            return self.build_response(request, http_cache.replay(entry))
+
+        if entry is not None:
+            # Stale: ask the server whether the stored copy still holds, which costs a 304 at most.
+            request = request.copy()
+            if 'etag' in entry['headers']:
+                request.headers['If-None-Match'] = entry['headers']['etag']
+            if 'last-modified' in entry['headers']:
+                request.headers['If-Modified-Since'] = entry['headers']['last-modified']
+        response = super().send(request, **kwargs)
+        if entry is not None and response.status_code == 304:
+            entry = cache.refresh(request.url, entry, response.headers, peer_certificate(response))
+            response.close()
+            http_cache.record('revalidated')
+            return self.build_response(request, http_cache.replay(entry))
+
+        http_cache.record('misses')
+        raw = response.raw
+        if http_cache.storable(response.status_code, response.headers) and getattr(raw, '_fp', None) is not None:
+            cert = peer_certificate(response)
+
+            def store(body):
+                cache.put(request.url, request.headers, response.status_code, response.reason, raw.headers, body, cert)
+            raw._fp = http_cache.TeeReader(raw._fp, store)
+        return response
+
+
+def session():
+    # One process-wide session, so analyses and bulk runs share kept-alive connections per host.
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(HEADERS)
+            adapter = PooledAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_CONNECTIONS_PER_HOST)
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def get(url, **kwargs):
+    return session().get(url, **kwargs)
+
+
+def head(url, **kwargs):
+    return session().head(url, **kwargs)
+
+
+def _connection(response):
+    raw = response.raw
+    return getattr(raw, 'connection', None) or getattr(raw, '_connection', None)
+
+
+def set_read_timeout(response, seconds):
+    # Bounds the next read of a streamed response's body, whatever timeout the request was sent with.
+    sock = getattr(_connection(response), 'sock', None)
+    if sock is not None:
+        sock.settimeout(max(0.01, seconds))
+
+
+def peer_certificate(response):
+    # Only valid while a streamed response still holds its connection, i.e. before the body is read.
+    return getattr(_connection(response), 'peer_cert', None)
+
+
+def take_setup_timings(response):
+    # Resolve/connect/TLS seconds of the connection that served this response, reported once: a
+    # kept-alive connection reused for later requests gives None, since it cost them nothing.
+    connection = _connection(response)
+    timings = getattr(connection, 'setup_timings', None)
+    if timings is not None:
+        connection.setup_timings = None
+    return timings
@@ -0,0 +1,136 @@
+from collections import Counter
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from domains import registrable_domain
+
+LINK_SAMPLE_SIZE = 10
+MAX_TRACKED_DOMAINS = 1000
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+WEB_SCHEMES = ('http', 'https')
+
+
+def remove_dot_segments(path):
+    if '.' not in path:
+        return path
+    output = []
+    for segment in path.split('/'):
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+        elif segment != '.':
+            output.append(segment)
+    if path.endswith(('/.', '/..')):
+        output.append('')
+    return '/'.join(output)
+
+
+def normalize_url(url):
+    return _normalize(urlsplit(url))[0]
+
+
+def _normalize(parts):
+    # Lowercases scheme and host, drops default ports, dot segments and the fragment, so the same
+    # target written differently dedups to one entry. Returns the URL and its bare hostname.
+    scheme = parts.scheme.lower()
+    hostname = host = (parts.hostname or '').rstrip('.')
+    if ':' in host:
+        host = f"[{host}]"
+    port = parts.port
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username or parts.password:
+        credentials = parts.username or ''
+        if parts.password:
+            credentials += ':' + parts.password
+        host = f"{credentials}@{host}"
+    path = remove_dot_segments(parts.path) or '/'
+    return urlunsplit((scheme, host, path, parts.query, '')), hostname
+
+
+class LinkIndex:
+    def __init__(self, page_url, sample_size=LINK_SAMPLE_SIZE, on_internal=None):
+        self.page_url = page_url
+        self.base_url = page_url
+        self.site = registrable_domain(urlsplit(page_url).hostname or '')
+        self.sample_size = sample_size
+        self.on_internal = on_internal
+        self.internal_count = 0
+        self.external_count = 0
+        self.duplicates = 0
+        self.fragments = 0
+        self.invalid = 0
+        self.schemes = Counter()
+        self.domains = Counter()
+        self.other_domains = 0
+        self.samples = {'internal': [], 'external': []}
+        self._base_seen = False
+        # Hashes instead of the URLs themselves keep the dedup index small on link-heavy pages. The
+        # raw href index lets repeated menu and footer links skip URL parsing altogether.
+        self._seen = set()
+        self._seen_hrefs = set()
+
+    def set_base(self, href):
+        # Only the first <base href> counts, as in browsers.
+        if self._base_seen or not href:
+            return
+        self._base_seen = True
+        self._seen_hrefs.clear()
+        try:
+            self.base_url = urljoin(self.page_url, href.strip())
+        except ValueError:
+            pass
+
+    def add(self, href):
+        href = href.strip()
+        if not href or href.startswith('#'):
+            self.fragments += 1
+            return
+        href_key = hash(href)
+        if href_key in self._seen_hrefs:
+            self.duplicates += 1
+            return
+        self._seen_hrefs.add(href_key)
+        try:
+            parts = urlsplit(urljoin(self.base_url, href))
+            scheme = parts.scheme.lower()
+            self.schemes[scheme] += 1
+            if scheme not in WEB_SCHEMES:
+                return
+            url, hostname = _normalize(parts)
+        except ValueError:
+            self.invalid += 1
+            return
+
+        key = hash(url)
+        if key in self._seen:
+            self.duplicates += 1
+            return
+        self._seen.add(key)
+
+        domain = registrable_domain(hostname)
+        if domain == self.site:
+            self.internal_count += 1
+            kind = 'internal'
+            if self.on_internal:
+                self.on_internal(url)
+        else:
+            self.external_count += 1
+            kind = 'external'
+            if domain in self.domains or len(self.domains) < MAX_TRACKED_DOMAINS:
+                self.domains[domain] += 1
+            else:
+                self.other_domains += 1
+        if len(self.samples[kind]) < self.sample_size:
+            self.samples[kind].append(url)
+
+    def summary(self):
+        return {
+            'internal': self.samples['internal'],
+            'external': self.samples['external'],
+            'internal_count': self.internal_count,
+            'external_count': self.external_count,
+            'duplicates': self.duplicates,
+            'fragments': self.fragments,
+            'invalid': self.invalid,
+            'schemes': dict(self.schemes),
+            'top_domains': self.domains.most_common(LINK_SAMPLE_SIZE)
+        }
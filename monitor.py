@@ -0,0 +1,458 @@
+import argparse
+import heapq
+import json
+import os
+import random
+import re
+import sqlite3
+import ssl
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+import requests
+import http_client
+import probes
+from bulk import percentile, read_urls
+from engine import normalize_url
+from settings import DATA_DIR
+from whois_cache import WHOIS_TTL
+
+MONITOR_PATH = os.path.join(DATA_DIR, 'monitor.sqlite3')
+# Status, response time and the certificate come from one cheap request and can change any minute.
+# WHOIS data changes a few times a year and registries throttle, so it is asked once a day.
+STATUS_INTERVAL = 5 * 60
+WHOIS_INTERVAL = WHOIS_TTL
+# Each next check lands up to this fraction early or late, so targets added together drift apart
+# instead of all being checked in the same second forever.
+JITTER = 0.1
+# Targets new to the watchlist get their first check somewhere within this many seconds.
+FIRST_CHECK_SPREAD = 60
+STATUS_WORKERS = 32
+WHOIS_WORKERS = 4
+STATUS_TIMEOUT = 10
+CERT_WARN_DAYS = 14
+DOMAIN_WARN_DAYS = 30
+# Expiry warnings are repeated at most this often.
+ALERT_REPEAT = 24 * 60 * 60
+# Failed checks in a row before a site counts as down, so one dropped connection is not an alert.
+DOWN_AFTER = 2
+# Slower than SLOW_FACTOR times the median of its last SLOW_WINDOW checks (and at least
+# SLOW_MIN_SECONDS) counts as a slowdown.
+SLOW_FACTOR = 3
+SLOW_MIN_SECONDS = 1.0
+SLOW_WINDOW = 20
+SAMPLE_RETENTION = 30 * 24 * 60 * 60
+PRUNE_INTERVAL = 60 * 60
+EXPIRY_DATE = re.compile(r'(\d{4})-(\d{2})-(\d{2})|datetime\.datetime\((\d{4}), (\d{1,2}), (\d{1,2})')
+
+
+def certificate_expiry(not_after):
+    try:
+        return datetime.fromtimestamp(ssl.cert_time_to_seconds(not_after), timezone.utc)
+    except (ValueError, TypeError):
+        return None
+
+
+def domain_expiry(value):
+    # WHOIS gives one date, or a list of them when the registry and registrar disagree; the earliest counts.
+    dates = []
+    for match in EXPIRY_DATE.finditer(value or ''):
+        try:
+            dates.append(datetime(*(int(part) for part in match.groups() if part), tzinfo=timezone.utc))
+        except ValueError:
+            continue
+    return min(dates) if dates else None
+
+
+def days_left(moment, now):
+    return (moment.timestamp() - now) / (24 * 60 * 60)
+
+
+def check_status(url, timeout=STATUS_TIMEOUT):
+    # Status, time to the response headers and the certificate, all off one request; the body is
+    # never downloaded.
+    hostname = urlparse(url).hostname
+    cert = None
+    try:
+        with http_client.get(url, timeout=timeout, stream=True) as response:
+            sample = {'http_status': response.status_code, 'response_time': response.elapsed.total_seconds(), 'error': None}
+            if urlparse(response.url).scheme == 'https' and urlparse(response.url).hostname == hostname:
+                cert = http_client.peer_certificate(response)
+    except requests.exceptions.RequestException as e:
+        return {'http_status': None, 'response_time': None, 'error': str(e)}
+    if urlparse(url).scheme == 'https':
+        # Redirected to another host: the monitored host's own certificate costs one handshake.
+        ssl_info = probes.ssl_details(cert) if cert else probes.probe_ssl(hostname)
+        sample['ssl_expires'] = ssl_info['notAfter'] if isinstance(ssl_info, dict) else None
+    return sample
+
+
+class MonitorStore:
+    def __init__(self, path=MONITOR_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS targets ("
+            "url TEXT PRIMARY KEY, hostname TEXT NOT NULL, status_due REAL NOT NULL, whois_due REAL NOT NULL, "
+            "checked REAL, http_status INTEGER, response_time REAL, error TEXT, failures INTEGER NOT NULL DEFAULT 0, "
+            "slow INTEGER NOT NULL DEFAULT 0, ssl_expires TEXT, whois_checked REAL, domain_expires TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS samples (url TEXT NOT NULL, at REAL NOT NULL, http_status INTEGER, response_time REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS samples_url ON samples (url, at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS alerts (id INTEGER PRIMARY KEY, url TEXT NOT NULL, at REAL NOT NULL, kind TEXT NOT NULL, message TEXT NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS alerts_url ON alerts (url, kind, at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS alerts_time ON alerts (at)")
+        self._db.commit()
+
+    def add_targets(self, urls, spread=FIRST_CHECK_SPREAD):
+        # Targets already known keep their schedule, so a restart does not check everything at once.
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO targets (url, hostname, status_due, whois_due) VALUES (?, ?, ?, ?)",
+                [(url, urlparse(url).hostname or '', now + random.uniform(0, spread), now + random.uniform(0, spread)) for url in urls]
+            )
+            self._db.commit()
+
+    def targets(self, urls=None):
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM targets ORDER BY url").fetchall()
+        wanted = set(urls) if urls is not None else None
+        return {row['url']: dict(row) for row in rows if wanted is None or row['url'] in wanted}
+
+    def update(self, url, fields):
+        with self._lock:
+            self._db.execute(f"UPDATE targets SET {', '.join(f'{name} = ?' for name in fields)} WHERE url = ?", (*fields.values(), url))
+            self._db.commit()
+
+    def add_sample(self, url, at, http_status, response_time):
+        with self._lock:
+            self._db.execute("INSERT INTO samples (url, at, http_status, response_time) VALUES (?, ?, ?, ?)", (url, at, http_status, response_time))
+            self._db.commit()
+
+    def recent_times(self, url, limit=SLOW_WINDOW):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT response_time FROM samples WHERE url = ? AND response_time IS NOT NULL ORDER BY at DESC LIMIT ?", (url, limit)
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def series(self, url, since):
+        with self._lock:
+            rows = self._db.execute("SELECT at, http_status, response_time FROM samples WHERE url = ? AND at >= ? ORDER BY at", (url, since)).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_alert(self, url, at, kind, message):
+        with self._lock:
+            self._db.execute("INSERT INTO alerts (url, at, kind, message) VALUES (?, ?, ?, ?)", (url, at, kind, message))
+            self._db.commit()
+
+    def last_alerts(self):
+        # (url, kind) -> when that alert was last raised.
+        with self._lock:
+            rows = self._db.execute("SELECT url, kind, MAX(at) FROM alerts GROUP BY url, kind").fetchall()
+        return {(row[0], row[1]): row[2] for row in rows}
+
+    def alerts(self, limit=50):
+        with self._lock:
+            rows = self._db.execute("SELECT url, at, kind, message FROM alerts ORDER BY at DESC, id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune(self, before):
+        with self._lock:
+            self._db.execute("DELETE FROM samples WHERE at < ?", (before,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Lane:
+    # One kind of check: its own queue ordered by due time, and its own limit on checks at once.
+    def __init__(self, kind, check, interval, workers):
+        self.kind = kind
+        self.check = check
+        self.interval = interval
+        self.queue = []
+        self.active = 0
+        self.slots = threading.BoundedSemaphore(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"monitor-{kind}")
+
+
+class Monitor:
+    def __init__(self, store, urls, status_interval=STATUS_INTERVAL, whois_interval=WHOIS_INTERVAL, status_workers=STATUS_WORKERS, whois_workers=WHOIS_WORKERS, once=False, on_alert=None):
+        # once: only the checks that are due right now, then run() returns; for running from cron.
+        self.store = store
+        self.once = once
+        self.on_alert = on_alert
+        store.add_targets(urls, spread=0 if once else FIRST_CHECK_SPREAD)
+        self.targets = store.targets(urls)
+        self.lanes = [
+            Lane('status', self.check_status, status_interval, status_workers),
+            Lane('whois', self.check_whois, whois_interval, whois_workers)
+        ]
+        now = time.time()
+        for lane in self.lanes:
+            for url, target in self.targets.items():
+                if not once or target[f"{lane.kind}_due"] <= now:
+                    lane.queue.append((target[f"{lane.kind}_due"], url))
+            heapq.heapify(lane.queue)
+        self.checks = {lane.kind: 0 for lane in self.lanes}
+        self.alert_count = 0
+        self._alerted = store.last_alerts()
+        self._recent = {}
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+
+    def run(self):
+        dispatchers = [threading.Thread(target=self._dispatch, args=(lane,), name=f"monitor-{lane.kind}", daemon=True) for lane in self.lanes]
+        for dispatcher in dispatchers:
+            dispatcher.start()
+        try:
+            next_prune = 0
+            while any(dispatcher.is_alive() for dispatcher in dispatchers):
+                if time.time() >= next_prune:
+                    self.store.prune(time.time() - SAMPLE_RETENTION)
+                    next_prune = time.time() + PRUNE_INTERVAL
+                for dispatcher in dispatchers:
+                    dispatcher.join(1)
+        finally:
+            self.stop()
+            for lane in self.lanes:
+                lane.executor.shutdown(wait=True)
+
+    def stop(self):
+        with self._condition:
+            self._stop.set()
+            self._condition.notify_all()
+
+    def _dispatch(self, lane):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stop.is_set():
+                        return
+                    if lane.queue:
+                        wait = lane.queue[0][0] - time.time()
+                        if wait <= 0:
+                            break
+                    elif self.once and not lane.active:
+                        return
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                _, url = heapq.heappop(lane.queue)
+                lane.active += 1
+            # Waits for a free worker outside the lock, so finishing checks can requeue meanwhile.
+            lane.slots.acquire()
+            if self._stop.is_set():
+                lane.slots.release()
+                return
+            lane.executor.submit(self._check, lane, url)
+
+    def _check(self, lane, url):
+        try:
+            lane.check(url)
+        except Exception as e:
+            # One broken check must not stop the monitoring of everything else.
+            print(f"{url}: {lane.kind} check failed: {e}", file=sys.stderr)
+        finally:
+            due = time.time() + lane.interval * random.uniform(1 - JITTER, 1 + JITTER)
+            self.store.update(url, {f"{lane.kind}_due": due})
+            with self._condition:
+                lane.active -= 1
+                self.checks[lane.kind] += 1
+                if not self.once:
+                    heapq.heappush(lane.queue, (due, url))
+                self._condition.notify_all()
+            lane.slots.release()
+
+    def check_status(self, url):
+        now = time.time()
+        sample = check_status(url)
+        status = sample['http_status']
+        seconds = sample['response_time']
+        alerts = []
+        with self._lock:
+            target = self.targets[url]
+            if url not in self._recent:
+                self._recent[url] = deque(self.store.recent_times(url), maxlen=SLOW_WINDOW)
+            recent = self._recent[url]
+            if status is not None and status < 400:
+                if target['failures'] >= DOWN_AFTER:
+                    alerts.append(('recovered', f"back up (status {status}) after {target['failures']} failed checks"))
+                failures = 0
+                # Too few checks yet to know what normal is.
+                if len(recent) >= SLOW_WINDOW // 2:
+                    usual = statistics.median(recent)
+                    slow = seconds >= SLOW_MIN_SECONDS and seconds > SLOW_FACTOR * usual
+                    if slow and not target['slow']:
+                        alerts.append(('slow', f"answering slowly: {seconds:.2f} s, usually {usual:.2f} s"))
+                    elif target['slow'] and not slow and target['failures'] < DOWN_AFTER:
+                        alerts.append(('recovered', f"answering at its usual speed again ({seconds:.2f} s)"))
+                else:
+                    slow = False
+                recent.append(seconds)
+            else:
+                failures = target['failures'] + 1
+                slow = target['slow']
+                if failures == DOWN_AFTER:
+                    alerts.append(('down', f"answering with status {status}" if status is not None else f"not answering: {sample['error']}"))
+            fields = {
+                'checked': now,
+                'http_status': status,
+                'response_time': seconds,
+                'error': sample['error'],
+                'failures': failures,
+                'slow': int(slow)
+            }
+            if sample.get('ssl_expires'):
+                fields['ssl_expires'] = sample['ssl_expires']
+            target.update(fields)
+        self.store.add_sample(url, now, status, seconds)
+        self.store.update(url, fields)
+        expires = certificate_expiry(fields.get('ssl_expires'))
+        if expires is not None and days_left(expires, now) < CERT_WARN_DAYS:
+            alerts.append(('certificate_expiring', self._expiry_message("certificate", expires, now)))
+        for kind, message in alerts:
+            self.alert(url, kind, message, now)
+
+    def check_whois(self, url):
+        now = time.time()
+        # Straight from the registry: the day-long WHOIS cache would report changes late.
+        whois_details = probes.probe_whois(self.targets[url]['hostname'], fresh=True)
+        # A failed lookup keeps the expiry date already known.
+        expires = domain_expiry(whois_details.get('expiration_date')) if isinstance(whois_details, dict) else None
+        fields = {'whois_checked': now}
+        if expires is not None:
+            fields['domain_expires'] = expires.date().isoformat()
+        with self._lock:
+            self.targets[url].update(fields)
+        self.store.update(url, fields)
+        if expires is not None and days_left(expires, now) < DOMAIN_WARN_DAYS:
+            self.alert(url, 'domain_expiring', self._expiry_message("domain", expires, now), now)
+
+    def _expiry_message(self, what, expires, now):
+        days = days_left(expires, now)
+        if days < 0:
+            return f"{what} expired on {expires.date().isoformat()}"
+        return f"{what} expires in {int(days)} day{'' if int(days) == 1 else 's'} ({expires.date().isoformat()})"
+
+    def alert(self, url, kind, message, now):
+        with self._lock:
+            if kind.endswith('_expiring') and now - self._alerted.get((url, kind), 0) < ALERT_REPEAT:
+                return
+            self._alerted[(url, kind)] = now
+            self.alert_count += 1
+        self.store.add_alert(url, now, kind, message)
+        if self.on_alert:
+            self.on_alert({'url': url, 'at': now, 'kind': kind, 'message': message})
+
+
+def timestamp(at):
+    return datetime.fromtimestamp(at).isoformat(sep=' ', timespec='seconds')
+
+
+def describe_target(target, now):
+    status = target['http_status'] if target['http_status'] is not None else ('not checked yet' if target['checked'] is None else 'unreachable')
+    parts = [target['url'], f"status {status}"]
+    if target['response_time'] is not None:
+        parts.append(f"{target['response_time'] * 1000:.0f} ms")
+    if target['slow']:
+        parts.append("slow")
+    cert_expires = certificate_expiry(target['ssl_expires'])
+    if cert_expires is not None:
+        parts.append(f"certificate {int(days_left(cert_expires, now))} days")
+    if target['domain_expires']:
+        domain_expires = domain_expiry(target['domain_expires'])
+        parts.append(f"domain {int(days_left(domain_expires, now))} days")
+    if target['checked'] is not None:
+        parts.append(f"checked {timestamp(target['checked'])}")
+    return "  ".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep an eye on a watchlist of websites: status, response time, certificate and domain expiry.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_command = commands.add_parser('run', help="check the watchlist on a schedule and report alerts")
+    run_command.add_argument('watchlist', help="file with one URL per line, or - for stdin")
+    run_command.add_argument('--every', type=float, default=STATUS_INTERVAL, help="seconds between status and certificate checks of each site")
+    run_command.add_argument('--whois-every', type=float, default=WHOIS_INTERVAL, help="seconds between WHOIS checks of each site")
+    run_command.add_argument('-w', '--workers', type=int, default=STATUS_WORKERS, help="status checks running at the same time")
+    run_command.add_argument('--whois-workers', type=int, default=WHOIS_WORKERS, help="WHOIS lookups running at the same time")
+    run_command.add_argument('--alerts', help="also append every alert to this JSONL file")
+    run_command.add_argument('--once', action='store_true', help="only run the checks that are due now, then exit (for cron)")
+    status_command = commands.add_parser('status', help="show the latest state of every site, or of one")
+    status_command.add_argument('url', nargs='?')
+    series_command = commands.add_parser('series', help="print the status and response time history of one site")
+    series_command.add_argument('url')
+    series_command.add_argument('--hours', type=float, default=24)
+    alerts_command = commands.add_parser('alerts', help="show the latest alerts")
+    alerts_command.add_argument('-n', '--limit', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    store = MonitorStore()
+    try:
+        if args.command == 'run':
+            # Every check has to reach the site itself, never the HTTP cache.
+            http_client.CACHE_ENABLED = False
+            source = sys.stdin if args.watchlist == '-' else open(args.watchlist, encoding='utf-8')
+            try:
+                urls = list(dict.fromkeys(read_urls(source, set())))
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            alerts_file = open(args.alerts, 'a', encoding='utf-8') if args.alerts else None
+
+            def report(alert):
+                print(f"{timestamp(alert['at'])}  {alert['url']}  {alert['kind']}: {alert['message']}", flush=True)
+                if alerts_file is not None:
+                    alerts_file.write(json.dumps(alert, ensure_ascii=False) + '\n')
+                    alerts_file.flush()
+
+            monitor = Monitor(store, urls, args.every, args.whois_every, args.workers, args.whois_workers, once=args.once, on_alert=report)
+            print(f"Watching {len(urls)} sites", file=sys.stderr)
+            try:
+                monitor.run()
+            except KeyboardInterrupt:
+                monitor.stop()
+            finally:
+                if alerts_file is not None:
+                    alerts_file.close()
+            print(f"{monitor.checks['status']} status checks, {monitor.checks['whois']} WHOIS checks, {monitor.alert_count} alerts", file=sys.stderr)
+        elif args.command == 'status':
+            now = time.time()
+            targets = store.targets([normalize_url(args.url)] if args.url else None)
+            for target in targets.values():
+                print(describe_target(target, now))
+        elif args.command == 'series':
+            samples = store.series(normalize_url(args.url), time.time() - args.hours * 60 * 60)
+            for sample in samples:
+                seconds = f"{sample['response_time'] * 1000:.0f} ms" if sample['response_time'] is not None else "-"
+                print(f"{timestamp(sample['at'])}  {sample['http_status'] or 'unreachable'}  {seconds}")
+            if samples:
+                up = sum(1 for sample in samples if sample['http_status'] is not None and sample['http_status'] < 400)
+                times = sorted(sample['response_time'] for sample in samples if sample['response_time'] is not None)
+                speed = f", p50 {percentile(times, 0.50) * 1000:.0f} ms, p95 {percentile(times, 0.95) * 1000:.0f} ms" if times else ""
+                print(f"Up {up / len(samples):.1%} of {len(samples)} checks{speed}")
+        else:
+            for alert in store.alerts(args.limit):
+                print(f"{timestamp(alert['at'])}  {alert['url']}  {alert['kind']}: {alert['message']}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+import codecs
+import re
+import socket
+import ssl
+import threading
+import time
+from email.message import Message
+from urllib.parse import urlparse
+import requests
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+import geoip
+from extractor import PageExtractor
+import http_client
+import resolver
+import sitemaps
+from whois_cache import shared_lookup
+
+MAX_PAGE_BYTES = 10 * 1024 * 1024
+DOWNLOAD_DEADLINE = 15
+READ_TIMEOUT = 10
+CHUNK_SIZE = 64 * 1024
+MAX_ROBOTS_BYTES = 512 * 1024
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+
+
+def probe_dns(hostname):
+    try:
+        return resolver.resolve(hostname)
+    except Exception as e:
+        return f"Unable to resolve the hostname: {str(e)}"
+
+
+def probe_location(hostname):
+    try:
+        ip_address = resolver.resolve(hostname)[0]
+        index = geoip.shared_index()
+        location = index.lookup(ip_address) if index else None
+        if location:
+            return location
+        if not geoip.REMOTE_FALLBACK:
+            return "Unable to determine location: address not in the local GeoIP database"
+        geo_response = http_client.get(geoip.REMOTE_URL.format(ip=ip_address), timeout=5)
+        geo_response.raise_for_status()
+        geo_data = geo_response.json()
+        return {
+            'city': geo_data.get('city', 'N/A'),
+            'country': geo_data.get('country', 'N/A'),
+            'isp': geo_data.get('isp', 'N/A')
+        }
+    except Exception as e:
+        return f"Unable to determine location: {str(e)}"
+
+
+def page_encoding(response, first_chunk):
+    # requests would assume ISO-8859-1 for text/html without a charset; browsers sniff instead.
+    message = Message()
+    message['content-type'] = response.headers.get('content-type', '')
+    candidates = [message.get_content_charset()]
+    if first_chunk.startswith(codecs.BOM_UTF8):
+        candidates.insert(0, 'utf-8-sig')
+    match = META_CHARSET.search(first_chunk[:4096])
+    if match:
+        candidates.append(match.group(1).decode('ascii'))
+    for candidate in candidates:
+        if candidate:
+            try:
+                return codecs.lookup(candidate).name
+            except LookupError:
+                continue
+    return 'utf-8'
+
+
+def probe_page(url, max_bytes=MAX_PAGE_BYTES, deadline=DOWNLOAD_DEADLINE, head_only=False, top_terms=0, on_internal_link=None, stop=None, collect_assets=False):
+    # With collect_assets, details['assets'] maps every image, script, stylesheet and font URL to its kind.
+    started = time.monotonic()
+    received = 0
+    truncated = False
+    parse_seconds = 0.0
+    with http_client.get(url, timeout=10, stream=True) as response:
+        response.raise_for_status()
+        # Links resolve and classify against where the redirects ended (http -> https, apex -> www,
+        # /a -> /a/), not the URL that was asked for.
+        extractor = PageExtractor(response.url, top_terms, on_internal_link, collect_assets=collect_assets)
+        setup = http_client.take_setup_timings(response) or {}
+        hostname = urlparse(url).hostname
+        cert = None
+        if urlparse(response.url).scheme == 'https' and urlparse(response.url).hostname == hostname:
+            cert = http_client.peer_certificate(response)
+
+        # The body is parsed as it arrives and never held in memory as a whole. read1 hands over
+        # whatever has arrived instead of waiting for a full chunk, and each read may only block for
+        # what is left of the deadline, so a server trickling bytes cannot keep the download going.
+        body_started = time.perf_counter()
+        decoder = None
+        while True:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0 or (stop is not None and stop.is_set()):
+                truncated = True
+                break
+            http_client.set_read_timeout(response, min(READ_TIMEOUT, remaining))
+            try:
+                chunk = response.raw.read1(CHUNK_SIZE, decode_content=True)
+            except ProtocolError as e:
+                # Raised as requests would have, so errors read the same as before.
+                raise requests.exceptions.ChunkedEncodingError(e)
+            except DecodeError as e:
+                raise requests.exceptions.ContentDecodingError(e)
+            except ReadTimeoutError as e:
+                if time.monotonic() - started < deadline:
+                    raise requests.exceptions.ConnectionError(e)
+                # Out of time mid-read: what arrived so far is the page.
+                truncated = True
+                break
+            if not chunk:
+                break
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(page_encoding(response, chunk))(errors='replace')
+            if received + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - received]
+                truncated = True
+            received += len(chunk)
+            parse_started = time.perf_counter()
+            extractor.feed(decoder.decode(chunk))
+            parse_seconds += time.perf_counter() - parse_started
+            if truncated or (head_only and extractor.head_done):
+                break
+        parse_started = time.perf_counter()
+        if decoder is not None:
+            extractor.feed(decoder.decode(b'', final=True))
+        extractor.close()
+        parse_seconds += time.perf_counter() - parse_started
+        body_seconds = time.perf_counter() - body_started
+
+    # Setup phases are zero when a kept-alive connection (or the HTTP cache) served the page.
+    elapsed = response.elapsed.total_seconds()
+    timings = {
+        'connect': setup.get('resolve', 0.0) + setup.get('connect', 0.0),
+        'tls': setup.get('tls', 0.0),
+        'ttfb': max(0.0, elapsed - sum(setup.values())),
+        'download': max(0.0, body_seconds - parse_seconds),
+        'parse': parse_seconds - extractor.link_seconds,
+        'links': extractor.link_seconds
+    }
+    details = {
+        'http_status': response.status_code,
+        'response_time': elapsed,
+        'page_bytes': received,
+        'truncated': truncated
+    }
+    if urlparse(url).scheme == 'https':
+        # Reuse the certificate of the connection that served the page; only a redirect to another
+        # host (or an unusual TLS backend) costs the separate handshake.
+        if cert:
+            details['ssl_info'] = ssl_details(cert)
+        else:
+            ssl_started = time.perf_counter()
+            details['ssl_info'] = probe_ssl(hostname)
+            timings['ssl'] = time.perf_counter() - ssl_started
+
+    details.update(extractor.details(head_only=head_only))
+    details['timings'] = timings
+    if collect_assets:
+        details['assets'] = extractor.assets
+    return details
+
+
+def navigation_timings(entry):
+    # A Navigation Timing entry from the browser: marks in milliseconds since the navigation started,
+    # 0 for steps that did not happen (a kept-alive connection, no TLS).
+    if not entry:
+        return {}
+    marks = {name: (entry.get(name) or 0.0) / 1000 for name in (
+        'connectStart', 'secureConnectionStart', 'connectEnd', 'requestStart', 'responseStart', 'responseEnd', 'loadEventEnd'
+    )}
+    tls_started = marks['secureConnectionStart'] or marks['connectEnd']
+    return {
+        'connect': max(0.0, tls_started - marks['connectStart']),
+        'tls': max(0.0, marks['connectEnd'] - tls_started),
+        'ttfb': max(0.0, marks['responseStart'] - marks['requestStart']),
+        'download': max(0.0, marks['responseEnd'] - marks['responseStart']),
+        'load': marks['loadEventEnd']
+    }
+
+
+def probe_loaded_page(url, html, navigation=None, max_bytes=MAX_PAGE_BYTES, top_terms=0, collect_assets=False):
+    # The page as the embedded browser has it, including whatever its scripts added: nothing is
+    # downloaded again. Status and response time are only known if the browser reported them.
+    navigation = navigation or {}
+    truncated = len(html) > max_bytes
+    # The navigation entry is named after the document the browser ended up on.
+    extractor = PageExtractor(navigation.get('name') or url, top_terms, collect_assets=collect_assets)
+    parse_started = time.perf_counter()
+    extractor.feed(html[:max_bytes])
+    extractor.close()
+    parse_seconds = time.perf_counter() - parse_started
+
+    timings = navigation_timings(navigation)
+    timings['parse'] = parse_seconds - extractor.link_seconds
+    timings['links'] = extractor.link_seconds
+    details = {
+        'http_status': navigation.get('responseStatus') or None,
+        'response_time': navigation['responseStart'] / 1000 if navigation.get('responseStart') else None,
+        'page_bytes': navigation.get('decodedBodySize') or len(html.encode('utf-8')),
+        'truncated': truncated,
+        'source': 'browser'
+    }
+    if urlparse(url).scheme == 'https':
+        # The browser does not hand out the certificate, so this is the one connection it costs.
+        ssl_started = time.perf_counter()
+        details['ssl_info'] = probe_ssl(urlparse(url).hostname)
+        timings['ssl'] = time.perf_counter() - ssl_started
+
+    details.update(extractor.details())
+    details['timings'] = timings
+    if collect_assets:
+        details['assets'] = extractor.assets
+    return details
+
+
+class RobotsFile:
+    # robots.txt fetched at most once per analysis: the robots and sitemap stages both need it.
+    def __init__(self, scheme, hostname):
+        self.scheme = scheme
+        self.hostname = hostname
+        self.status = None
+        self.text = ''
+        self._fetched = False
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        with self._lock:
+            if not self._fetched:
+                self._fetched = True
+                try:
+                    with http_client.get(f"{self.scheme}://{self.hostname}/robots.txt", timeout=5, stream=True) as response:
+                        self.status = response.status_code
+                        if response.status_code == 200:
+                            body = bytearray()
+                            for chunk in response.iter_content(CHUNK_SIZE):
+                                body += chunk
+                                if len(body) >= MAX_ROBOTS_BYTES:
+                                    break
+                            self.text = bytes(body[:MAX_ROBOTS_BYTES]).decode('utf-8', errors='replace')
+                except Exception:
+                    self.status = None
+            return self
+
+
+def probe_robots(robots):
+    return 'Available' if robots.fetch().status == 200 else 'Not found'
+
+
+def probe_sitemap(robots, scan=True, stop=None):
+    try:
+        urls = sitemaps.discover(robots.scheme, robots.hostname, robots.fetch().text)
+        if not scan:
+            return 'Available' if sitemaps.check_available(urls[0]) else 'Not found'
+        stats = sitemaps.scan(urls, stop=stop)
+        return stats if stats['urls'] or stats['sitemaps'] > stats['errors'] else 'Not found'
+    except Exception:
+        return 'Not found'
+
+
+def ssl_details(cert):
+    return {
+        'issuer': cert.get('issuer', 'N/A'),
+        'notAfter': cert.get('notAfter', 'N/A')
+    }
+
+
+def probe_ssl(hostname):
+    try:
+        context = ssl.create_default_context()
+        with socket.create_connection((resolver.resolve(hostname)[0], 443), timeout=10) as sock:
+            with context.wrap_socket(sock, server_hostname=hostname) as ssock:
+                return ssl_details(ssock.getpeercert())
+    except Exception as e:
+        return f"Unable to check security certificate: {str(e)}"
+
+
+def probe_whois(hostname, fresh=False):
+    try:
+        return shared_lookup().lookup(hostname, fresh=fresh)
+    except Exception as e:
+        return f"Unable to get domain info: {str(e)}"
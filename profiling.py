@@ -0,0 +1,108 @@
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+TOP_FUNCTIONS = 10
+# Held while a stage is profiled, by every profiler in the process: from Python 3.12 only one
+# cProfile can be active at a time, and tracemalloc counts every thread anyway.
+_profiling = threading.Lock()
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    # Ranked by time spent in the function itself, which points at the hot spot rather than the callers.
+    ranked = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            'function': f"{function} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'own_seconds': own,
+            'total_seconds': total
+        }
+        for (filename, line, function), (_, calls, own, total, _) in ranked
+    ]
+
+
+class StageProfiler:
+    # Opt-in per-stage profiling. Profiled stages run one at a time across the whole process (see
+    # _profiling), so each profile and memory figure belongs to exactly one stage. One profiler can be
+    # shared by many analyses; their profiles add up per stage.
+    def __init__(self, cpu=True, memory=False):
+        self.cpu = cpu
+        self.memory = memory
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._started_tracing = memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    def wrap(self, name, fn, reports):
+        def profiled(*args, **kwargs):
+            with _profiling:
+                return self._run(name, fn, reports, args, kwargs)
+        return profiled
+
+    def _run(self, name, fn, reports, args, kwargs):
+        profile = cProfile.Profile() if self.cpu else None
+        if self.memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        if profile:
+            profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            report = {}
+            if profile:
+                profile.disable()
+                stats = pstats.Stats(profile)
+                report['top_functions'] = top_functions(stats)
+                with self._lock:
+                    if name in self._stats:
+                        self._stats[name].add(stats)
+                    else:
+                        self._stats[name] = stats
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                report['peak_bytes'] = peak - before
+                report['retained_bytes'] = current - before
+            reports[name] = report
+
+    def dump(self, directory):
+        # One <stage>.prof per stage, for pstats, snakeviz and friends.
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            for name, stats in self._stats.items():
+                stats.dump_stats(os.path.join(directory, f"{name}.prof"))
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze one website with every stage profiled.")
+    parser.add_argument('url')
+    parser.add_argument('--memory', action='store_true', help="also measure each stage's memory")
+    parser.add_argument('-o', '--output', help="directory for one <stage>.prof file per stage")
+    args = parser.parse_args(argv)
+
+    from engine import analyze
+    profiler = StageProfiler(memory=args.memory)
+    try:
+        details = analyze(args.url, profiler=profiler)['details']
+    finally:
+        profiler.close()
+    if args.output:
+        profiler.dump(args.output)
+    print(json.dumps({'timings': details.get('timings'), 'profile': details.get('profile')}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
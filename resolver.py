@@ -0,0 +1,122 @@
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+try:
+    import dns.resolver
+except ImportError:
+    dns = None
+
+DNS_TIMEOUT = 5
+DNS_DEFAULT_TTL = 300
+DNS_NEGATIVE_TTL = 30
+DNS_CACHE_SIZE = 4096
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="dns")
+
+
+def _getaddrinfo(hostname, family):
+    # The system resolver does not expose TTLs, so its answers live for DNS_DEFAULT_TTL.
+    infos = socket.getaddrinfo(hostname, None, family, socket.SOCK_STREAM)
+    addresses = []
+    for info in infos:
+        if info[4][0] not in addresses:
+            addresses.append(info[4][0])
+    return addresses, DNS_DEFAULT_TTL
+
+
+def _dnspython(hostname, family, timeout):
+    record_type = 'A' if family == socket.AF_INET else 'AAAA'
+    try:
+        answer = dns.resolver.resolve(hostname, record_type, lifetime=timeout)
+    except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+        return [], DNS_NEGATIVE_TTL
+    return [record.address for record in answer], answer.rrset.ttl
+
+
+class Resolver:
+    def __init__(self, timeout=DNS_TIMEOUT, max_entries=DNS_CACHE_SIZE):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, hostname):
+        # Returns IPv4 addresses first, then IPv6; raises socket.gaierror when neither family resolves.
+        hostname = hostname.rstrip('.').lower()
+        try:
+            ipaddress.ip_address(hostname)
+            return [hostname]
+        except ValueError:
+            pass
+
+        with self._lock:
+            entry = self._cache.get(hostname)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(hostname)
+                return self._answer(hostname, entry[1])
+            future = self._in_flight.get(hostname)
+            leader = future is None
+            if leader:
+                future = self._in_flight[hostname] = Future()
+        if not leader:
+            return self._answer(hostname, future.result())
+
+        try:
+            addresses, ttl = self._query(hostname)
+            with self._lock:
+                self._cache[hostname] = (time.monotonic() + ttl, addresses)
+                self._cache.move_to_end(hostname)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            future.set_result(addresses)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[hostname]
+        return self._answer(hostname, addresses)
+
+    def _answer(self, hostname, addresses):
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, f"{hostname} has no A or AAAA records")
+        return list(addresses)
+
+    def _query(self, hostname):
+        if dns is not None:
+            lookups = [_executor.submit(_dnspython, hostname, family, self.timeout) for family in (socket.AF_INET, socket.AF_INET6)]
+        else:
+            lookups = [_executor.submit(_getaddrinfo, hostname, family) for family in (socket.AF_INET, socket.AF_INET6)]
+        wait(lookups, timeout=self.timeout)
+
+        addresses = []
+        ttls = []
+        errors = []
+        for lookup in lookups:
+            if not lookup.done():
+                errors.append(socket.timeout(f"DNS lookup for {hostname} timed out after {self.timeout} seconds"))
+                continue
+            try:
+                family_addresses, ttl = lookup.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            if family_addresses:
+                addresses.extend(family_addresses)
+                ttls.append(ttl)
+        if not addresses and errors:
+            # Failures and timeouts are raised rather than cached, so the next analysis tries again.
+            raise errors[0]
+        return addresses, min(ttls) if ttls else DNS_NEGATIVE_TTL
+
+
+_resolver = Resolver()
+
+
+def resolve(hostname):
+    return _resolver.resolve(hostname)
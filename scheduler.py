@@ -0,0 +1,127 @@
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, InvalidStateError, ThreadPoolExecutor, wait
+
+ANALYSIS_BUDGET = 20
+
+
+class ProbeTimeout(Exception):
+    pass
+
+
+class ProbeCancelled(Exception):
+    pass
+
+
+class ProbeScheduler:
+    # timeouts maps stage names to seconds, counted from when the stage starts running. A stage that
+    # runs past its limit, the budget or a cancel is given up on: join() stops waiting for it, its
+    # late result is dropped and unfinished says why. Threads cannot be killed, so the probes
+    # themselves still need socket timeouts to ever let go of their worker.
+    def __init__(self, budget=ANALYSIS_BUDGET, max_workers=6, on_done=None, profiler=None, timeouts=None):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.on_done = on_done
+        self.profiler = profiler
+        self.timeouts = timeouts or {}
+        self.durations = {}
+        self.profiles = {}
+        self.unfinished = {}
+        if profiler is not None:
+            # Profiled stages take turns anyway (see profiling._profiling).
+            max_workers = 1
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="probe")
+        self._futures = {}
+        self._running_since = {}
+        # Completed by cancel(), so a cancel wakes join() like a finished probe would.
+        self._cancelled = Future()
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining(self):
+        return max(0.0, self.budget - self.elapsed())
+
+    def cancel(self):
+        try:
+            self._cancelled.set_result(None)
+        except InvalidStateError:
+            pass
+
+    @property
+    def cancelled(self):
+        return self._cancelled.done()
+
+    def submit(self, name, fn, *args, **kwargs):
+        def timed():
+            self._running_since[name] = time.monotonic()
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                # Recorded before the future completes, so on_done already sees it.
+                self.durations[name] = time.perf_counter() - started
+
+        task = timed
+        if self.profiler is not None:
+            # Wrapped outside timed(), so waiting for another analysis's profiled stage does not count
+            # towards this stage's time limit.
+            task = self.profiler.wrap(name, timed, self.profiles)
+        # Probes run in the caller's context, so per-analysis context variables reach them.
+        future = self._executor.submit(contextvars.copy_context().run, task)
+        self._futures[name] = future
+        if self.on_done:
+            future.add_done_callback(lambda f: name in self.unfinished or self.on_done(name, f))
+
+    def _deadline(self, name):
+        if name in self.timeouts and name in self._running_since:
+            return self._running_since[name] + self.timeouts[name]
+        return None
+
+    def submitted(self, name):
+        return name in self._futures
+
+    def join(self, required=()):
+        # Returns early when one of the required probes fails, since the rest are then pointless.
+        # Stages submitted by a running stage (before it returns) are waited for as well.
+        while not self.cancelled:
+            # Checked before waiting, so a required stage that failed before join() is noticed too.
+            if any(self._futures[name].done() and self._futures[name].exception() is not None for name in required):
+                break
+            now = time.monotonic()
+            wake_at = self.started + self.budget
+            pending = set()
+            for name, future in list(self._futures.items()):
+                if future.done() or name in self.unfinished:
+                    continue
+                deadline = self._deadline(name)
+                if deadline is not None and deadline <= now:
+                    self.unfinished[name] = f"timed out after {self.timeouts[name]:g} s"
+                    continue
+                pending.add(future)
+                if deadline is not None:
+                    wake_at = min(wake_at, deadline)
+            if not pending or now >= self.started + self.budget:
+                break
+            # A stage that starts during the wait does so because another one finished, which wakes
+            # this loop in time to pick up its deadline.
+            wait(pending | {self._cancelled}, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+        reason = "cancelled" if self.cancelled else f"did not finish within the {self.budget:g} second budget"
+        for name, future in list(self._futures.items()):
+            if not future.done() and name not in self.unfinished:
+                self.unfinished[name] = reason
+        # Stragglers keep running in their worker threads, but nobody waits for them.
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def result(self, name):
+        future = self._futures[name]
+        if name in self.unfinished or not future.done():
+            reason = self.unfinished.get(name, "did not finish")
+            raise (ProbeCancelled if reason == "cancelled" else ProbeTimeout)(f"'{name}' {reason}")
+        return future.result()
+
+    def result_or(self, name, fallback):
+        try:
+            return self.result(name)
+        except (ProbeTimeout, ProbeCancelled) as e:
+            return fallback(e)
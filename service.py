@@ -0,0 +1,490 @@
+import argparse
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import engine
+import geoip
+import http_client
+from scheduler import ANALYSIS_BUDGET
+from settings import DATA_DIR
+
+# host:port of the analysis service the apps should use. Unset, they never look for one: whatever
+# answers there sees every page analyzed, including HTML taken from the browser.
+SERVICE_ADDRESS = os.environ.get('URL_ANALYZER_SERVICE')
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+# Written by the running service, readable by its user only; every request has to present it.
+TOKEN_PATH = os.path.join(DATA_DIR, 'service.token')
+SERVICE_WORKERS = 8
+# How long a finished analysis is handed out again instead of starting a new one.
+RESULT_TTL = 120
+RESULT_CACHE_SIZE = 500
+# Idle streams get an empty line this often, which is also how the service notices a client that left.
+HEARTBEAT = 1.0
+CONNECT_TIMEOUT = 0.5
+# A stream silent for this long, heartbeats included, means the service is gone.
+READ_TIMEOUT = 30
+MAX_REQUEST_BYTES = 32 * 1024 * 1024
+OPTIONS = {
+    'budget': (float, ANALYSIS_BUDGET),
+    'head_only': (bool, False),
+    'top_terms': (int, 0),
+    'scan_sitemaps': (bool, True),
+    'audit_assets': (bool, False)
+}
+SERVED_BY = {
+    'fresh': "the analysis service",
+    'joined': "the analysis service, shared with another app asking about the same page",
+    'cached': "the analysis service's recent results (nothing fetched again)"
+}
+
+
+class ServiceError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def describe_error(error):
+    if isinstance(error, ServiceError):
+        return error.code, error.message
+    return engine.describe_error(error)
+
+
+def new_token(path=TOKEN_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as token_file:
+        token_file.write(token)
+    return token
+
+
+def read_token(path=TOKEN_PATH):
+    try:
+        with open(path, encoding='utf-8') as token_file:
+            return token_file.read().strip() or None
+    except OSError:
+        return None
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class Job:
+    # One analysis and everything it reported so far, replayed to every client that follows it.
+    def __init__(self, key, analysis):
+        self.key = key
+        self.analysis = analysis
+        self.events = []
+        self.done = False
+        self.finished_at = None
+        self.followers = 0
+        self._condition = threading.Condition()
+
+    def run(self):
+        try:
+            result = self.analysis.run(on_update=lambda stage, updates: self.add({'stage': stage, 'updates': updates}))
+            event = {'result': result}
+        except Exception as e:
+            code, message = engine.describe_error(e)
+            event = {'error': {'code': code, 'message': message}}
+        self.add(event, last=True)
+        return event
+
+    def add(self, event, last=False):
+        with self._condition:
+            self.events.append(event)
+            if last:
+                self.done = True
+                self.finished_at = time.monotonic()
+            self._condition.notify_all()
+
+    def follow(self, heartbeat=HEARTBEAT):
+        # Every event from the first one on; None whenever nothing happened for a heartbeat.
+        index = 0
+        while True:
+            with self._condition:
+                if index == len(self.events) and not self.done:
+                    self._condition.wait(heartbeat)
+                events = self.events[index:]
+                done = self.done
+            if not events and not done:
+                yield None
+            for event in events:
+                yield event
+            index += len(events)
+            if done:
+                return
+
+    def wait(self):
+        with self._condition:
+            while not self.done:
+                self._condition.wait()
+            return self.events[-1]
+
+
+class AnalysisService:
+    def __init__(self, workers=SERVICE_WORKERS, ttl=RESULT_TTL, cache_size=RESULT_CACHE_SIZE):
+        self.workers = workers
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.counts = {'fresh': 0, 'joined': 0, 'cached': 0}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+        self._running = {}
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def attach(self, url, options, html=None, navigation=None, fresh=False):
+        # Returns (job, served): a recent result, the same analysis already running for someone else, or
+        # a new one. Every job that is not 'cached' must be handed back to detach().
+        url = engine.normalize_url(url)
+        # A page a browser already loaded is only the same request with the very same HTML.
+        digest = hashlib.sha1(html.encode('utf-8')).hexdigest() if html is not None else None
+        key = (url, digest, tuple(sorted(options.items())))
+        with self._lock:
+            recent = self._recent.get(key)
+            if recent is not None and not fresh and time.monotonic() - recent.finished_at < self.ttl:
+                self._recent.move_to_end(key)
+                self.counts['cached'] += 1
+                return recent, 'cached'
+            job = self._running.get(key)
+            if job is None:
+                job = Job(key, engine.Analysis(url, html=html, navigation=navigation, **options))
+                self._running[key] = job
+                self._executor.submit(self._run, job)
+                served = 'fresh'
+            else:
+                served = 'joined'
+            job.followers += 1
+            self.counts[served] += 1
+            return job, served
+
+    def detach(self, job):
+        # The last client gone before the end: nobody is left to see the result, so it stops.
+        with self._lock:
+            job.followers -= 1
+            if job.followers or job.done:
+                return
+            if self._running.get(job.key) is job:
+                del self._running[job.key]
+        job.analysis.cancel()
+
+    def _run(self, job):
+        event = job.run()
+        with self._lock:
+            if self._running.get(job.key) is job:
+                del self._running[job.key]
+            # Failures and partial results (cancelled, timed out) are not handed out again.
+            if 'result' not in event or event['result']['details'].get('unfinished'):
+                return
+            recent = Job(job.key, None)
+            recent.add(event, last=True)
+            self._recent[job.key] = recent
+            self._recent.move_to_end(job.key)
+            while len(self._recent) > self.cache_size:
+                self._recent.popitem(last=False)
+
+    def status(self):
+        with self._lock:
+            return dict(self.counts, running=len(self._running), recent=len(self._recent), workers=self.workers)
+
+
+def read_options(request):
+    # Only real JSON values: bool("false") would be True.
+    options = {}
+    for name, (kind, default) in OPTIONS.items():
+        value = request.get(name)
+        if value is None:
+            value = default
+        elif kind is bool and not isinstance(value, bool):
+            raise TypeError(f"{name} must be true or false")
+        elif kind is not bool and (isinstance(value, bool) or not isinstance(value, (int, float)) or (kind is int and not isinstance(value, int))):
+            raise TypeError(f"{name} must be a number")
+        options[name] = kind(value)
+    return options
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    def _authorized(self):
+        if hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {self.server.token}"):
+            return True
+        self._reply(401, {'error': {'code': "E007", 'message': f"The analysis service only answers requests with the token from {TOKEN_PATH}."}})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == '/status':
+            self._reply(200, self.server.service.status())
+        else:
+            self._reply(404, {'error': {'code': "E007", 'message': f"Unknown address {self.path}"}})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path != '/analyze':
+            self._reply(404, {'error': {'code': "E007", 'message': f"Unknown address {self.path}"}})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._reply(413, {'error': {'code': "E007", 'message': "The request is too large."}})
+            return
+        try:
+            request = json.loads(self.rfile.read(length))
+            url = request.get('url') or ''
+            if not isinstance(url, str):
+                raise TypeError("url must be a string")
+            if not isinstance(request.get('html'), (str, type(None))) or not isinstance(request.get('navigation'), (dict, type(None))):
+                raise TypeError("html must be a string and navigation an object")
+            options = read_options(request)
+        except (ValueError, TypeError, AttributeError) as e:
+            self._reply(400, {'error': {'code': "E007", 'message': f"The analysis service did not understand the request: {str(e)}"}})
+            return
+        if not url.strip():
+            self._reply(400, {'error': {'code': "E001", 'message': "No URL entered. Please type a website address, like example.com."}})
+            return
+
+        service = self.server.service
+        try:
+            job, served = service.attach(url, options, html=request.get('html'), navigation=request.get('navigation'), fresh=request.get('fresh') is True)
+        except Exception as e:
+            code, message = engine.describe_error(e)
+            self._reply(400, {'error': {'code': code, 'message': message}})
+            return
+        try:
+            if request.get('stream') is True:
+                self._stream(job, served)
+            else:
+                event = job.wait()
+                self._reply(200 if 'result' in event else 502, dict(event, served=served))
+        except (BrokenPipeError, ConnectionResetError):
+            # The client left; detach() decides whether anybody still wants the analysis.
+            pass
+        finally:
+            if served != 'cached':
+                service.detach(job)
+
+    def _stream(self, job, served):
+        # One JSON object per line: {"stage", "updates"} as stages land, then {"result"} or {"error"}.
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for event in job.follow():
+            if event is None:
+                self.wfile.write(b'\n')
+            else:
+                if 'stage' not in event:
+                    event = dict(event, served=served)
+                self.wfile.write(json.dumps(event, default=str, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+    def _reply(self, status, body):
+        data = json.dumps(body, default=str, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(address=DEFAULT_ADDRESS, workers=SERVICE_WORKERS, ttl=RESULT_TTL, token_path=TOKEN_PATH):
+    server = ThreadingHTTPServer(parse_address(address), ServiceHandler)
+    server.service = AnalysisService(workers=workers, ttl=ttl)
+    server.token = new_token(token_path)
+    return server
+
+
+_available = None
+_available_lock = threading.Lock()
+
+
+def available():
+    # Whether the configured service is there, found out once per process: the apps ask from their
+    # warm-up thread, so analyses never wait on a connect. A service lost later is forgotten by
+    # RemoteAnalysis.run().
+    global _available
+    with _available_lock:
+        if _available is None:
+            _available = bool(SERVICE_ADDRESS) and read_token() is not None and _answers(SERVICE_ADDRESS)
+        return _available
+
+
+def _answers(address):
+    try:
+        socket.create_connection(parse_address(address), timeout=CONNECT_TIMEOUT).close()
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def _forget_service():
+    global _available
+    with _available_lock:
+        _available = False
+
+
+def _headers():
+    return {'Content-Type': 'application/json', 'Authorization': f"Bearer {read_token() or ''}"}
+
+
+class RemoteAnalysis:
+    # Stands in for engine.Analysis: the same result, run(on_update) and cancel(), with the work done by
+    # the analysis service.
+    def __init__(self, url, address=None, html=None, navigation=None, **options):
+        self.url = engine.normalize_url(url)
+        self.address = address or SERVICE_ADDRESS or DEFAULT_ADDRESS
+        self.request = dict(options, url=self.url, html=html, navigation=navigation, stream=True)
+        parsed_url = urlparse(self.url)
+        self.result = {
+            'url': self.url,
+            'timestamp': datetime.now().isoformat(),
+            'details': {
+                'scheme': parsed_url.scheme,
+                'hostname': parsed_url.hostname
+            }
+        }
+        self.stages = list(engine.STAGES)
+        if options.get('audit_assets'):
+            self.stages.append('assets')
+        self.cancelled = False
+        self._landed = set()
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        # Only this client stops listening; the service stops the analysis once nobody else follows it.
+        with self._lock:
+            self.cancelled = True
+            sock = self._socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def run(self, on_update=None):
+        connection = http.client.HTTPConnection(*parse_address(self.address), timeout=READ_TIMEOUT)
+        try:
+            connection.connect()
+            with self._lock:
+                self._socket = connection.sock
+                if self.cancelled:
+                    return self._partial()
+            connection.request('POST', '/analyze', body=json.dumps(self.request, default=str).encode('utf-8'), headers=_headers())
+            response = connection.getresponse()
+            if response.status != 200:
+                error = json.loads(response.read())['error']
+                raise ServiceError(error['code'], error['message'])
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if 'stage' in event:
+                    self._landed.add(event['stage'])
+                    self.result['details'].update(event['updates'])
+                    if on_update:
+                        on_update(event['stage'], event['updates'])
+                elif 'result' in event:
+                    self.result = event['result']
+                    self.result['details']['service'] = event['served']
+                    return self.result
+                else:
+                    raise ServiceError(event['error']['code'], event['error']['message'])
+        except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+            if not self.cancelled:
+                # The next analysis runs here instead of trying the lost service again.
+                _forget_service()
+                raise ServiceError("E006", f"Lost the connection to the analysis service: {str(e)}. Try again, or stop the service to analyze without it.") from e
+        finally:
+            connection.close()
+        if self.cancelled:
+            return self._partial()
+        raise ServiceError("E006", "The analysis service stopped before the analysis finished. Try again, or stop the service to analyze without it.")
+
+    def _partial(self):
+        # What arrived before the cancel, marked the way engine.Analysis marks a cancelled run.
+        details = self.result['details']
+        unfinished = {stage: 'cancelled' for stage in self.stages if stage not in self._landed}
+        if 'page' in unfinished:
+            # No page, so its files were never going to be checked.
+            unfinished.pop('assets', None)
+        for stage in unfinished:
+            if stage in engine.FALLBACKS:
+                details[stage] = "Not checked (cancelled)"
+        if unfinished:
+            details['unfinished'] = unfinished
+        return self.result
+
+
+def new_analysis(url, **options):
+    # Through the analysis service when one is running, so every app and script shares its work and
+    # recent results; otherwise right here.
+    if available():
+        return RemoteAnalysis(url, **options)
+    return engine.Analysis(url, **options)
+
+
+def analyze(url, address=None, **options):
+    # For scripts: the service's result for url; raises ServiceError when it cannot be had.
+    return RemoteAnalysis(url, address, **options).run()
+
+
+def fetch_status(address=DEFAULT_ADDRESS):
+    connection = http.client.HTTPConnection(*parse_address(address), timeout=CONNECT_TIMEOUT * 10)
+    try:
+        connection.request('GET', '/status', headers=_headers())
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the analysis service the apps and scripts share, or ask a running one how it is doing.")
+    parser.add_argument('--address', default=SERVICE_ADDRESS or DEFAULT_ADDRESS, help=f"host:port to listen on; keep it local (the apps use it when URL_ANALYZER_SERVICE is set to it, with the token in {TOKEN_PATH})")
+    parser.add_argument('-w', '--workers', type=int, default=SERVICE_WORKERS, help="analyses running at the same time")
+    parser.add_argument('--ttl', type=float, default=RESULT_TTL, help="seconds a finished analysis is handed out again")
+    parser.add_argument('--no-remote-geo', action='store_true', help="only use the local GeoIP database, never ip-api.com")
+    parser.add_argument('--no-http-cache', action='store_true', help="always download pages instead of reusing cached copies")
+    parser.add_argument('--status', action='store_true', help="print the status of the running service and exit")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        try:
+            print(json.dumps(fetch_status(args.address), indent=2))
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            print(f"No analysis service at {args.address}: {e}", file=sys.stderr)
+            return 1
+        return 0
+    if args.no_remote_geo:
+        geoip.REMOTE_FALLBACK = False
+    if args.no_http_cache:
+        http_client.CACHE_ENABLED = False
+
+    server = serve(args.address, workers=args.workers, ttl=args.ttl)
+    print(f"Analysis service listening on {args.address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
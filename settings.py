@@ -0,0 +1,3 @@
+import os
+
+DATA_DIR = os.environ.get('URL_ANALYZER_HOME', os.path.join(os.path.expanduser('~'), '.url_analyzer'))
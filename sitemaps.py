@@ -0,0 +1,150 @@
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from collections import deque
+import requests
+from urllib3.exceptions import HTTPError, ReadTimeoutError
+import http_client
+
+MAX_SITEMAPS = 20
+SITEMAP_DEADLINE = 10
+GZIP_MAGIC = b'\x1f\x8b'
+CHUNK_SIZE = 64 * 1024
+READ_TIMEOUT = 10
+
+
+def discover(scheme, hostname, robots_text=''):
+    # Sitemaps announced in robots.txt win; /sitemap.xml is only the conventional fallback.
+    urls = []
+    for line in robots_text.splitlines():
+        field, _, value = line.partition(':')
+        if field.strip().lower() == 'sitemap' and value.strip():
+            urls.append(value.strip())
+    return urls or [f"{scheme}://{hostname}/sitemap.xml"]
+
+
+def check_available(url):
+    # Availability only needs a status line: HEAD, or a one-byte ranged GET for servers that refuse HEAD.
+    try:
+        response = http_client.head(url, timeout=5, allow_redirects=True)
+        if response.status_code in (405, 501):
+            with http_client.get(url, timeout=5, headers={'Range': 'bytes=0-0'}, stream=True) as response:
+                pass
+        return response.status_code in (200, 206)
+    except requests.exceptions.RequestException:
+        return False
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _inflate(inflate, data):
+    # At most CHUNK_SIZE of output per step, so a small gzipped body does not expand all at once.
+    while data:
+        yield inflate.decompress(data, CHUNK_SIZE)
+        data = inflate.unconsumed_tail
+
+
+def iter_entries(url, stop_at=None, stop=None):
+    # Yields ('sitemap' | 'url', loc, lastmod) while the document streams in. Each finished entry is
+    # dropped from the tree right away, so a 50k-URL (or gzipped) sitemap parses in constant memory.
+    # Like probe_page, every read may only block for what is left until stop_at, and stop is checked
+    # between reads; either one simply ends the entries early.
+    with http_client.get(url, timeout=READ_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        inflate = None
+        first = True
+        root = None
+        while True:
+            remaining = READ_TIMEOUT if stop_at is None else stop_at - time.monotonic()
+            if remaining <= 0 or (stop is not None and stop.is_set()):
+                return
+            http_client.set_read_timeout(response, min(READ_TIMEOUT, remaining))
+            try:
+                chunk = response.raw.read1(CHUNK_SIZE, decode_content=True)
+            except ReadTimeoutError:
+                if stop_at is not None and time.monotonic() >= stop_at:
+                    return
+                raise
+            if first and chunk[:2] == GZIP_MAGIC:
+                # A .xml.gz served as a plain file rather than with Content-Encoding.
+                inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            first = False
+            if chunk:
+                pieces = _inflate(inflate, chunk) if inflate is not None else (chunk,)
+            else:
+                pieces = (inflate.flush(),) if inflate is not None else ()
+            for piece in pieces:
+                parser.feed(piece)
+                for event, element in parser.read_events():
+                    if event == 'start':
+                        if root is None:
+                            root = element
+                        continue
+                    kind = _local_name(element.tag)
+                    if kind not in ('url', 'sitemap'):
+                        continue
+                    loc = lastmod = None
+                    for child in element:
+                        name = _local_name(child.tag)
+                        if name == 'loc' and child.text:
+                            loc = child.text.strip()
+                        elif name == 'lastmod' and child.text:
+                            lastmod = child.text.strip()
+                    root.clear()
+                    if loc:
+                        yield kind, loc, lastmod
+            if not chunk:
+                # Raises ParseError on a document cut short.
+                parser.close()
+                return
+
+
+def scan(sitemap_urls, max_sitemaps=MAX_SITEMAPS, deadline=SITEMAP_DEADLINE, on_url=None, max_urls=None, stop=None):
+    stats = {
+        'sitemaps': 0,
+        'urls': 0,
+        'lastmod_first': None,
+        'lastmod_last': None,
+        'errors': 0,
+        'truncated': False
+    }
+    queue = deque(sitemap_urls)
+    seen = set()
+    stop_at = time.monotonic() + deadline
+    while queue:
+        url = queue.popleft()
+        if url in seen:
+            continue
+        if stats['sitemaps'] >= max_sitemaps or time.monotonic() > stop_at or (stop is not None and stop.is_set()):
+            stats['truncated'] = True
+            break
+        seen.add(url)
+        stats['sitemaps'] += 1
+        try:
+            for kind, loc, lastmod in iter_entries(url, stop_at, stop):
+                if kind == 'sitemap':
+                    if len(queue) < max_sitemaps:
+                        queue.append(loc)
+                    continue
+                stats['urls'] += 1
+                if lastmod:
+                    day = lastmod[:10]
+                    if stats['lastmod_first'] is None or day < stats['lastmod_first']:
+                        stats['lastmod_first'] = day
+                    if stats['lastmod_last'] is None or day > stats['lastmod_last']:
+                        stats['lastmod_last'] = day
+                if on_url:
+                    on_url(loc)
+                if (max_urls and stats['urls'] >= max_urls) or time.monotonic() > stop_at or (stop is not None and stop.is_set()):
+                    stats['truncated'] = True
+                    return stats
+            if time.monotonic() > stop_at or (stop is not None and stop.is_set()):
+                # iter_entries gave up on this sitemap part way.
+                stats['truncated'] = True
+                return stats
+        except (requests.exceptions.RequestException, HTTPError, ET.ParseError, OSError, zlib.error):
+            stats['errors'] += 1
+    return stats
@@ -0,0 +1,68 @@
+import re
+
+WORD = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MIN_TERM_LENGTH = 3
+STOPWORDS = {
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'any', 'can', 'had', 'her', 'was', 'one',
+    'our', 'out', 'has', 'his', 'how', 'its', 'may', 'new', 'now', 'see', 'who', 'did', 'get', 'let',
+    'she', 'too', 'use', 'that', 'with', 'have', 'this', 'will', 'your', 'from', 'they', 'been', 'were',
+    'what', 'when', 'which', 'their', 'there', 'than', 'them', 'then', 'these', 'into', 'more', 'some',
+    'would', 'could', 'about', 'other', 'also', 'only', 'just', 'over', 'such', 'each', 'very', 'here'
+}
+
+
+class TextStats:
+    # Counts words over text arriving in arbitrary pieces. A word cut in half by a chunk boundary
+    # (or by markup, as get_text() would join it) is counted once. Memory stays bounded: one
+    # partial word plus, when top_terms is set, a fixed number of Misra-Gries counters.
+    def __init__(self, top_terms=0):
+        self.word_count = 0
+        self.top_terms = top_terms
+        self.capacity = max(top_terms * 10, 100) if top_terms else 0
+        self._counters = {}
+        self._partial = None
+
+    def feed(self, text):
+        if not text:
+            return
+        if self._partial is not None and not WORD.match(text):
+            self._finish(self._partial)
+            self._partial = None
+        for match in WORD.finditer(text):
+            word = match.group()
+            if self._partial is not None:
+                word = (self._partial + word)[:MAX_TERM_LENGTH]
+                self._partial = None
+            if match.end() == len(text):
+                self._partial = word[:MAX_TERM_LENGTH]
+            else:
+                self._finish(word)
+
+    def close(self):
+        if self._partial is not None:
+            self._finish(self._partial)
+            self._partial = None
+
+    def _finish(self, word):
+        self.word_count += 1
+        if not self.capacity:
+            return
+        term = word.lower()
+        if len(term) < MIN_TERM_LENGTH or term.isdigit() or term in STOPWORDS:
+            return
+        counters = self._counters
+        if term in counters:
+            counters[term] += 1
+        elif len(counters) < self.capacity:
+            counters[term] = 1
+        else:
+            # Misra-Gries: a new term decrements everything instead of growing the table.
+            for key in list(counters):
+                counters[key] -= 1
+                if not counters[key]:
+                    del counters[key]
+
+    def terms(self):
+        ranked = sorted(self._counters.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:self.top_terms]
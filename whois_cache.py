@@ -0,0 +1,156 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+import whois
+from whois.parser import WhoisEntry
+from domains import registrable_domain
+from settings import DATA_DIR
+
+WHOIS_CACHE_PATH = os.path.join(DATA_DIR, 'whois.sqlite3')
+WHOIS_TTL = 24 * 60 * 60
+WHOIS_CACHE_SIZE = 50000
+WHOIS_TIMEOUT = 10
+# host[:port] of one WHOIS server to ask about every domain (a mirror, or a local stand-in for
+# benchmarks) instead of looking up each registry's own server.
+WHOIS_SERVER = os.environ.get('URL_ANALYZER_WHOIS_SERVER')
+
+
+def query_server(server, domain, timeout=WHOIS_TIMEOUT):
+    host, _, port = server.rpartition(':') if server.count(':') == 1 else (server, '', '')
+    response = b''
+    with socket.create_connection((host, int(port or 43)), timeout=timeout) as sock:
+        sock.sendall(domain.encode('idna') + b'\r\n')
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            response += data
+    return response.decode('utf-8', errors='replace')
+
+
+class WhoisCache:
+    def __init__(self, path=WHOIS_CACHE_PATH, ttl=WHOIS_TTL, max_entries=WHOIS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS whois ("
+            "domain TEXT PRIMARY KEY, data TEXT NOT NULL, fetched REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS whois_used ON whois (used)")
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM whois").fetchone()[0]
+
+    def get(self, domain):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT data, fetched FROM whois WHERE domain = ?", (domain,)).fetchone()
+            if row is None or row[1] + self.ttl < now:
+                return None
+            self._db.execute("UPDATE whois SET used = ? WHERE domain = ?", (now, domain))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, domain, data):
+        now = time.time()
+        with self._lock:
+            existed = self._db.execute("SELECT 1 FROM whois WHERE domain = ?", (domain,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO whois (domain, data, fetched, used) VALUES (?, ?, ?, ?)",
+                (domain, json.dumps(data, default=str), now, now)
+            )
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                # Evict a tenth at a time so a full cache does not pay for a delete on every insert.
+                excess = self._count - self.max_entries + max(1, self.max_entries // 10)
+                self._db.execute(
+                    "DELETE FROM whois WHERE domain IN (SELECT domain FROM whois ORDER BY used LIMIT ?)", (excess,)
+                )
+                self._count = self._db.execute("SELECT COUNT(*) FROM whois").fetchone()[0]
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class WhoisLookup:
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, hostname, fresh=False):
+        # fresh skips the cached answer (the monitor checks more often than WHOIS_TTL); what it
+        # gets back still refreshes the cache.
+        domain = registrable_domain(hostname)
+        if self.cache is not None and not fresh:
+            cached = self.cache.get(domain)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            future = self._in_flight.get(domain)
+            leader = future is None
+            if leader:
+                future = self._in_flight[domain] = Future()
+        if not leader:
+            # Another analysis is already asking the registry about this domain; share its answer.
+            return future.result(timeout=WHOIS_TIMEOUT)
+
+        try:
+            data = self._query(domain)
+            if self.cache is not None:
+                self.cache.put(domain, data)
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[domain]
+
+    def _query(self, domain):
+        if WHOIS_SERVER:
+            whois_info = WhoisEntry.load(domain, query_server(WHOIS_SERVER, domain))
+        else:
+            # Without ignore_socket_errors a registry that does not answer raises instead of coming
+            # back as a record with nothing in it.
+            whois_info = whois.whois(domain, timeout=WHOIS_TIMEOUT, ignore_socket_errors=False)
+        if not whois_info.domain_name:
+            # An empty answer (a throttled or unreachable registry) is a failure, and failures are not cached.
+            raise LookupError(f"no WHOIS record for {domain}")
+        return {
+            'domain_name': whois_info.domain_name or 'N/A',
+            'registrar': whois_info.registrar or 'N/A',
+            'organization': whois_info.org or 'N/A',
+            'creation_date': str(whois_info.creation_date) or 'N/A',
+            'expiration_date': str(whois_info.expiration_date) or 'N/A'
+        }
+
+
+_lookup = None
+_lookup_lock = threading.Lock()
+
+
+def shared_lookup():
+    global _lookup
+    with _lookup_lock:
+        if _lookup is None:
+            try:
+                cache = WhoisCache()
+            except (OSError, sqlite3.Error):
+                # A read-only home directory should cost the cache, not the WHOIS stage.
+                cache = None
+            _lookup = WhoisLookup(cache)
+        return _lookup